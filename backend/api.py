@@ -3,8 +3,9 @@ import asyncio
 import os
 import sys
 from core.scanner import Scanner
-from core.report import generate_json_report, save_to_supabase
-from supabase import create_client
+from core.cache import default_cache_path
+from core.report import open_report, REPORT_FORMATS
+from core.db import get_client, with_retry
 
 # Configurações
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -16,9 +17,9 @@ def resolve_owner(api_key):
         return None
     
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        supabase = get_client(SUPABASE_URL, SUPABASE_KEY)
         # Procura a chave na tabela api_keys
-        response = supabase.table("api_keys").select("user_id").eq("key_value", api_key).execute()
+        response = with_retry(supabase.table("api_keys").select("user_id").eq("key_value", api_key).execute)
         if response.data and len(response.data) > 0:
             return response.data[0]['user_id']
     except Exception as e:
@@ -29,6 +30,10 @@ async def main():
     parser = argparse.ArgumentParser(description="SentinelScan CLI")
     parser.add_argument("directory", help="Diretório para analisar")
     parser.add_argument("--output", help="Ficheiro de saída (JSON)", default="security_report.json")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="json", help="Formato do relatório (ndjson = um issue por linha, sarif = GitHub code scanning)")
+    parser.add_argument("--indent", type=int, default=4, help="Indentação do JSON (0 = compacto)")
+    parser.add_argument("--jobs", type=int, default=1, help="Processos em paralelo (0 = um por CPU)")
+    parser.add_argument("--cache", nargs="?", const=True, default=None, help="Cache incremental SQLite (por omissão ao lado do relatório)")
     parser.add_argument("--api-key", help="Chave de API do Sentinel Dashboard", default=os.getenv("SENTINEL_API_KEY"))
     
     args = parser.parse_args()
@@ -46,12 +51,18 @@ async def main():
 
     # 1. Executar Scan
     scanner = Scanner()
-    issues = await scanner.scan_directory(args.directory)
+    cache = None
+    if args.cache:
+        cache_path = args.cache if isinstance(args.cache, str) else default_cache_path(args.output)
+        cache = scanner.open_cache(cache_path)
+    issues = await scanner.scan_directory(args.directory, jobs=args.jobs, cache=cache)
+    if cache: cache.close()
     
     # 2. Gerar Relatório Local
-    report = generate_json_report(issues)
-    with open(args.output, "w") as f:
-        f.write(report)
+    # Escrito em streaming; o sumário por severidade é contado na mesma passagem
+    with open_report(args.output, args.format, args.indent or None, scanner.rule_engine.rules, args.directory) as writer:
+        writer.write_many(issues)
+        report_meta = writer.close(scanner.skipped)
     
     # 3. Enviar para a Cloud (Se houver API Key)
     user_id = resolve_owner(args.api_key)
@@ -60,17 +71,14 @@ async def main():
         print("☁️  A sincronizar com Sentinel Cloud...")
         # Adiciona o user_id ao relatório antes de enviar
         scan_data = {
-            "total_issues": len(issues),
+            **report_meta,
             "issues": [i.dict() for i in issues],
-            "summary": {"critical": len([i for i in issues if i.severity == 'CRITICO']), 
-                        "high": len([i for i in issues if i.severity == 'ALTO']), 
-                        "medium": len([i for i in issues if i.severity == 'MEDIO'])},
             "user_id": user_id # <--- O SEGREDO ESTÁ AQUI
         }
         
         try:
-            supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-            supabase.table("scans").insert({"report": scan_data, "user_id": user_id}).execute()
+            supabase = get_client(SUPABASE_URL, SUPABASE_KEY)
+            with_retry(supabase.table("scans").insert({"report": scan_data, "user_id": user_id}).execute)
             print("✅ Relatório disponível no Dashboard!")
         except Exception as e:
             print(f"❌ Falha no upload: {e}")
@@ -78,7 +86,7 @@ async def main():
         print("ℹ️  Modo Offline (Sem API Key válida). Relatório apenas local.")
 
     # Resumo Final
-    critical_count = len([i for i in issues if i.severity == 'CRITICO'])
+    critical_count = report_meta["summary"]["critical"]
     if critical_count > 0:
         print(f"\n❌ SCAN FALHOU: {critical_count} problemas Críticos encontrados.")
         sys.exit(1)
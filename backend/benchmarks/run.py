@@ -0,0 +1,217 @@
+"""
+Benchmark do scanner sobre um repositório sintético.
+
+    cd backend
+    python -m benchmarks.run --profile medium --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --profile medium --baseline benchmarks/baseline.json
+
+Com --baseline, o processo termina com código 1 se alguma fase ficar mais lenta do que a
+tolerância ou se o número de findings mudar (mesmo perfil e seed => mesmos resultados).
+"""
+import os
+import sys
+import json
+import time
+import random
+import string
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+from datetime import datetime
+
+from core.scanner import Scanner
+from core.security import analyze_security, analyze_secrets, calculate_entropy
+from core.report import ReportWriter
+from core.classify import classify_file, LARGE_FILE_THRESHOLD
+from .synthetic import generate_repo, PROFILES
+
+# Uma fase é regressão se demorar mais do que baseline * (1 + tolerância)...
+DEFAULT_TOLERANCE = 0.15
+# ...e a diferença for maior do que isto (fases muito curtas são só ruído)
+MIN_REGRESSION_SECONDS = 0.05
+
+ENTROPY_SAMPLES = 50_000
+
+
+def peak_rss_mb():
+    # ru_maxrss é o pico do processo (KB em Linux, bytes em macOS); é cumulativo entre fases
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    return round(max(usage, children) / scale, 1)
+
+
+def best_of(repeat, fn):
+    """Menor tempo de repeat execuções; devolve (segundos, resultado da última)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def load_corpus(root):
+    """Conteúdo dos ficheiros que os analisadores veem (sem binários/minificados/enormes)"""
+    corpus = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if classify_file(path) or os.path.getsize(path) > LARGE_FILE_THRESHOLD:
+                continue
+            with open(path, "rb") as f:
+                corpus.append(f.read().decode("utf-8", errors="ignore"))
+    return corpus
+
+
+def stage(name, seconds, volume_bytes=None, items=None, item_label="files", findings=None):
+    result = {"stage": name, "seconds": round(seconds, 4), "peak_rss_mb": peak_rss_mb()}
+    if volume_bytes is not None:
+        result["mb_per_s"] = round(volume_bytes / 1024 / 1024 / seconds, 2) if seconds else None
+    if items is not None:
+        result[f"{item_label}_per_s"] = round(items / seconds, 1) if seconds else None
+    if findings is not None:
+        result["findings"] = findings
+    return result
+
+
+def run_benchmarks(root, repo_bytes, repeat=3, jobs=1):
+    results = []
+    scanner = Scanner()
+
+    # 1. Scan completo (primeiro, para que o pico de RSS medido seja o do scan)
+    file_count = len(scanner.collect_files(root))
+    seconds, issues = best_of(repeat, lambda: asyncio.run(scanner.scan_directory(root, jobs=jobs)))
+    results.append(stage("scan_directory", seconds, repo_bytes, file_count, findings=len(issues)))
+
+    corpus = load_corpus(root)
+    corpus_bytes = sum(len(text.encode("utf-8")) for text in corpus)
+
+    # 2. Regras do rules.yaml (motor já compilado)
+    seconds, found = best_of(repeat, lambda: sum(len(analyze_security(text, scanner.rule_engine)) for text in corpus))
+    results.append(stage("analyze_security", seconds, corpus_bytes, len(corpus), findings=found))
+
+    # 3. Segredos (padrões críticos + entropia)
+    seconds, found = best_of(repeat, lambda: sum(len(analyze_secrets(text)) for text in corpus))
+    results.append(stage("analyze_secrets", seconds, corpus_bytes, len(corpus), findings=found))
+
+    # 4. Entropia isolada
+    rng = random.Random(0)
+    alphabet = string.ascii_letters + string.digits + "+/="
+    samples = ["".join(rng.choice(alphabet) for _ in range(rng.randint(20, 64))) for _ in range(ENTROPY_SAMPLES)]
+    seconds, _ = best_of(repeat, lambda: [calculate_entropy(text) for text in samples])
+    results.append(stage("calculate_entropy", seconds, items=len(samples), item_label="strings"))
+
+    # 5. Relatório (JSON compacto em streaming)
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "report.json")
+
+        def write_report():
+            with ReportWriter(output, indent=None) as writer:
+                writer.write_many(issues)
+                writer.close(scanner.skipped)
+            return os.path.getsize(output)
+
+        seconds, size = best_of(repeat, write_report)
+    results.append(stage("report_json", seconds, size, len(issues), item_label="issues"))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Lista de regressões (texto) face ao baseline"""
+    regressions = []
+    previous = {item["stage"]: item for item in baseline["stages"]}
+    for item in results:
+        old = previous.get(item["stage"])
+        if not old:
+            continue
+        limit = old["seconds"] * (1 + tolerance)
+        change = (item["seconds"] / old["seconds"] - 1) * 100 if old["seconds"] else 0
+        item["vs_baseline_pct"] = round(change, 1)
+        if item["seconds"] > limit and item["seconds"] - old["seconds"] > MIN_REGRESSION_SECONDS:
+            regressions.append(f"{item['stage']}: {item['seconds']:.3f}s vs {old['seconds']:.3f}s (+{change:.0f}%)")
+        if "findings" in old and item.get("findings") != old["findings"]:
+            regressions.append(f"{item['stage']}: findings {item.get('findings')} vs {old['findings']} no baseline")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'fase':<20}{'segundos':>10}{'MB/s':>10}{'itens/s':>14}{'findings':>10}{'RSS MB':>9}{'vs base':>9}")
+    for item in results:
+        rate = next((v for k, v in item.items() if k.endswith("_per_s") and k != "mb_per_s"), None)
+        change = item.get("vs_baseline_pct")
+        print(f"{item['stage']:<20}{item['seconds']:>10.3f}{item.get('mb_per_s') or '-':>10}{rate or '-':>14}"
+              f"{item.get('findings', '-'):>10}{item['peak_rss_mb']:>9}{'-' if change is None else f'{change:+.1f}%':>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do SentinelScan (repositório sintético)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por fase (conta a mais rápida)")
+    parser.add_argument("--jobs", type=int, default=1, help="Processos do scan_directory (0 = um por CPU)")
+    parser.add_argument("--repo", help="Diretório do repositório sintético (é reutilizado se já existir)")
+    parser.add_argument("--output", help="Gravar os resultados em JSON")
+    parser.add_argument("--baseline", help="Comparar com este baseline")
+    parser.add_argument("--save-baseline", help="Gravar os resultados como novo baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.repo or os.path.join(tmp, "repo")
+        marker = os.path.join(root, ".benchmark.json")
+        if os.path.exists(marker):
+            with open(marker) as f:
+                meta = json.load(f)
+            if (meta["profile"], meta["seed"]) != (args.profile, args.seed):
+                sys.exit(f"{root} foi gerado com outro perfil/seed: {meta}")
+        else:
+            start = time.perf_counter()
+            files, size = generate_repo(root, args.profile, args.seed)
+            meta = {"profile": args.profile, "seed": args.seed, "files": files, "bytes": size}
+            with open(marker, "w") as f:
+                json.dump(meta, f)
+            print(f"Repositório sintético: {files} ficheiros, {size / 1024 / 1024:.1f} MB ({time.perf_counter() - start:.1f}s)")
+
+        results = run_benchmarks(root, meta["bytes"], args.repeat, args.jobs)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "profile": args.profile,
+        "seed": args.seed,
+        "jobs": args.jobs,
+        "repo": {"files": meta["files"], "bytes": meta["bytes"]},
+        "stages": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline["profile"], baseline["seed"]) != (args.profile, args.seed):
+            sys.exit(f"Baseline é de outro perfil/seed ({baseline['profile']}/{baseline['seed']})")
+        regressions = compare(results, baseline, args.tolerance)
+
+    print_table(results)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Resultados gravados em {path}")
+
+    if regressions:
+        print("\n❌ Regressões face ao baseline:")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import os
+import json
+import base64
+import random
+import string
+
+# Perfis de repositório sintético (tamanho e forma)
+PROFILES = {
+    "small": {"source_files": 300, "lines_per_file": 120, "huge_files": 0, "huge_file_mb": 0,
+              "minified_files": 3, "blob_files": 3, "dockerfiles": 2, "manifests": 2},
+    "medium": {"source_files": 3000, "lines_per_file": 200, "huge_files": 2, "huge_file_mb": 12,
+               "minified_files": 20, "blob_files": 20, "dockerfiles": 10, "manifests": 10},
+    "large": {"source_files": 20000, "lines_per_file": 250, "huge_files": 4, "huge_file_mb": 64,
+              "minified_files": 100, "blob_files": 100, "dockerfiles": 40, "manifests": 40},
+}
+
+# Uma linha em cada SECRET_RATE linhas de código leva um segredo conhecido
+SECRET_RATE = 400
+
+SECRETS = (
+    'aws_key = "AKIA{}"',
+    'password = "{}"',
+    'token = "sk_live_{}"',
+    'blob = "{}"',
+)
+
+CODE_LINES = (
+    "def handler_{n}(request):",
+    "    value_{n} = compute(request.args.get('q{n}'), limit={n})",
+    "    if value_{n} is None:",
+    "        return Response(status=404)",
+    "    logger.info('processed %s items', len(items_{n}))",
+    "    for item in items_{n}:",
+    "        total += item.price * item.quantity",
+    "    # TODO: validar o input antes de guardar",
+    "    return render_template('page_{n}.html', data=value_{n})",
+    "",
+)
+
+
+class SyntheticRepo:
+    """Gera um repositório sintético determinístico (mesma seed -> mesmos ficheiros)"""
+    def __init__(self, root, profile="small", seed=0):
+        self.root = root
+        self.shape = PROFILES[profile]
+        self.random = random.Random(seed)
+        self.files = 0
+        self.bytes = 0
+
+    def _write(self, rel_path, content):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        with open(path, "wb") as f:
+            f.write(data)
+        self.files += 1
+        self.bytes += len(data)
+
+    def _token(self, length, alphabet=string.ascii_letters + string.digits):
+        return "".join(self.random.choice(alphabet) for _ in range(length))
+
+    def _secret_line(self):
+        template = self.random.choice(SECRETS)
+        if "AKIA" in template:
+            return template.format(self._token(16, string.ascii_uppercase + string.digits))
+        if "sk_live_" in template:
+            return template.format(self._token(24))
+        return template.format(self._token(32, string.ascii_letters + string.digits + "+/"))
+
+    def _source_lines(self, count):
+        lines = []
+        for n in range(count):
+            if self.random.randrange(SECRET_RATE) == 0:
+                lines.append(self._secret_line())
+            else:
+                lines.append(CODE_LINES[n % len(CODE_LINES)].format(n=n))
+        return lines
+
+    def source_files(self):
+        shape = self.shape
+        for i in range(shape["source_files"]):
+            ext = (".py", ".js", ".go", ".java")[i % 4]
+            self._write(f"src/pkg{i % 50}/module_{i}{ext}", "\n".join(self._source_lines(shape["lines_per_file"])) + "\n")
+
+    def huge_files(self):
+        """Ficheiros grandes (logs/dumps), acima do limiar de mmap"""
+        target = self.shape["huge_file_mb"] * 1024 * 1024
+        for i in range(self.shape["huge_files"]):
+            block = "\n".join(self._source_lines(5000)) + "\n"
+            repeat = max(1, target // len(block))
+            self._write(f"data/dump_{i}.log", block * repeat)
+
+    def minified_files(self):
+        for i in range(self.shape["minified_files"]):
+            body = ";".join(f"var a{n}=function(b){{return b*{n}}}" for n in range(20000))
+            self._write(f"static/js/app_{i}.min.js", body)
+            # Minificado sem o sufixo .min.js: só a heurística do conteúdo o apanha
+            self._write(f"static/js/vendor_{i}.js", body)
+
+    def blob_files(self):
+        for i in range(self.shape["blob_files"]):
+            raw = bytes(self.random.getrandbits(8) for _ in range(48 * 1024))
+            encoded = base64.b64encode(raw).decode()
+            lines = [f'"{encoded[j:j + 76]}",' for j in range(0, len(encoded), 76)]
+            self._write(f"fixtures/blob_{i}.json", "[\n" + "\n".join(lines) + '\n""]\n')
+
+    def dockerfiles(self):
+        for i in range(self.shape["dockerfiles"]):
+            self._write(f"services/svc{i}/Dockerfile", "FROM node:latest\nWORKDIR /app\nCOPY . .\nEXPOSE 22\nCMD [\"node\", \"index.js\"]\n")
+
+    def manifests(self):
+        for i in range(self.shape["manifests"]):
+            package = {
+                "name": f"svc{i}",
+                "dependencies": {"axios": "^0.21.1", "lodash": "4.17.15", "express": "^4.18.2"},
+                "devDependencies": {"react": "16.8.0", "jest": "^29.0.0"},
+            }
+            self._write(f"services/svc{i}/package.json", json.dumps(package, indent=2))
+            self._write(f"services/svc{i}/requirements.txt", "requests==2.20.0\ndjango==3.2.0\nflask==2.3.2\n")
+
+    def generate(self):
+        self.source_files()
+        self.huge_files()
+        self.minified_files()
+        self.blob_files()
+        self.dockerfiles()
+        self.manifests()
+        return self
+
+
+def generate_repo(root, profile="small", seed=0):
+    """Cria o repositório em root; devolve (ficheiros, bytes)"""
+    repo = SyntheticRepo(root, profile, seed).generate()
+    return repo.files, repo.bytes
@@ -0,0 +1,366 @@
+"""
+Base de dados local de advisories (formato OSV) para o SCA.
+
+O dump offline do OSV (ficheiros .json, pastas ou os all.zip por ecossistema de
+https://osv-vulnerabilities.storage.googleapis.com/) é compilado para SQLite, indexado
+por (ecossistema, pacote):
+
+    python -m core.advisories build PyPI-all.zip npm-all.zip --db advisories.db
+
+Os workers só abrem a base de dados na primeira consulta. Cada pacote é procurado no
+índice, e as suas gamas de versões interpretadas, uma única vez por processo (enquanto
+estiver nas caches LRU).
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import zipfile
+import hashlib
+import argparse
+from functools import lru_cache
+from packaging.version import Version, InvalidVersion
+from packaging.utils import canonicalize_name
+
+# Base de dados compilada (se não existir, usa-se a lista embutida BUILTIN_ADVISORIES)
+ADVISORY_DB_PATH = os.getenv("SENTINEL_ADVISORY_DB", os.path.join(os.path.dirname(__file__), "../advisories.db"))
+
+# De quantos em quantos segundos se verifica se a base de dados foi substituída no disco
+ADVISORY_DB_CHECK = float(os.getenv("SENTINEL_ADVISORY_DB_CHECK", "60"))
+
+# Pacotes com as entradas já interpretadas, por processo
+PACKAGE_CACHE_SIZE = 8192
+
+# Pacotes já procurados no índice (com ou sem advisories), por processo
+PACKAGE_INDEX_CACHE_SIZE = 65536
+
+# Severidade do OSV/GHSA -> severidade do Sentinel
+SEVERITY_MAP = {"CRITICAL": "CRITICO", "HIGH": "ALTO", "MODERATE": "MEDIO", "MEDIUM": "MEDIO", "LOW": "MEDIO"}
+DEFAULT_SEVERITY = "ALTO"
+
+# Lista mínima usada sem base de dados compilada (demo/MVP e testes locais)
+BUILTIN_ADVISORIES = [
+    {"id": "SENTINEL-BUILTIN-axios", "summary": "Known vulnerable axios versions",
+     "affected": [{"package": {"ecosystem": "npm", "name": "axios"}, "versions": ["0.21.1", "0.19.0"]}]},
+    {"id": "SENTINEL-BUILTIN-lodash", "summary": "Known vulnerable lodash versions",
+     "affected": [{"package": {"ecosystem": "npm", "name": "lodash"}, "versions": ["4.17.15", "4.17.11"]}]},
+    {"id": "SENTINEL-BUILTIN-react", "summary": "Known vulnerable react versions",
+     "affected": [{"package": {"ecosystem": "npm", "name": "react"}, "versions": ["16.8.0"]}]},
+    {"id": "SENTINEL-BUILTIN-requests", "summary": "Known vulnerable requests versions",
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "requests"}, "versions": ["2.20.0"]}]},
+    {"id": "SENTINEL-BUILTIN-django", "summary": "Known vulnerable django versions",
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "django"}, "versions": ["3.2.0", "2.2.0"]}]},
+]
+
+SEMVER = re.compile(r"^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$")
+
+
+@lru_cache(maxsize=65536)
+def semver_key(version):
+    """Chave de ordenação SemVer 2.0 (pré-releases antes da release), None se inválida"""
+    m = SEMVER.match(version.strip())
+    if not m:
+        return None
+    major, minor, patch, pre = m.groups()
+    core = (int(major), int(minor or 0), int(patch or 0))
+    if pre is None:
+        return core + ((1,),)
+    # Identificadores numéricos ordenam-se como números e antes dos alfanuméricos
+    return core + ((0,) + tuple((0, int(p), "") if p.isdigit() else (1, 0, p) for p in pre.split(".")),)
+
+
+@lru_cache(maxsize=65536)
+def pep440_key(version):
+    try:
+        return Version(version)
+    except InvalidVersion:
+        return None
+
+
+# Comparador de cada ecossistema (gamas do tipo ECOSYSTEM); os restantes só usam a lista de versões
+ECOSYSTEM_KEYS = {
+    "PyPI": pep440_key,
+    "npm": semver_key,
+    "Go": semver_key,
+    "crates.io": semver_key,
+    "Packagist": semver_key,
+    "NuGet": semver_key,
+    "Hex": semver_key,
+    "Pub": semver_key,
+}
+
+
+def normalize_name(ecosystem, name):
+    """Nomes como o registo os compara (PyPI ignora maiúsculas e trata -, _ e . como iguais)"""
+    if ecosystem == "PyPI":
+        return canonicalize_name(name)
+    if ecosystem == "npm":
+        return name.lower()
+    return name
+
+
+def osv_severity(advisory):
+    """Severidade do advisory (database_specific do GHSA/OSV), ou ALTO se não vier indicada"""
+    for source in [advisory.get("database_specific") or {}] + [a.get("database_specific") or {} for a in advisory.get("affected", [])]:
+        severity = str(source.get("severity", "")).upper()
+        if severity in SEVERITY_MAP:
+            return SEVERITY_MAP[severity]
+    return DEFAULT_SEVERITY
+
+
+class Advisory:
+    __slots__ = ("id", "summary", "severity", "aliases")
+
+    def __init__(self, id, summary, severity, aliases):
+        self.id = id
+        self.summary = summary
+        self.severity = severity
+        self.aliases = aliases
+
+
+class AffectedEntry:
+    """Versões afetadas de um pacote num advisory: lista explícita + gamas já interpretadas"""
+    __slots__ = ("advisory", "versions", "key_fn", "version_keys", "ranges")
+
+    def __init__(self, advisory, versions, key_fn, ranges):
+        self.advisory = advisory
+        self.versions = versions
+        # Versões explícitas também comparadas pela chave do ecossistema (3.2 == 3.2.0 no PyPI)
+        self.key_fn = key_fn
+        self.version_keys = frozenset(k for k in map(key_fn, versions) if k is not None) if key_fn else frozenset()
+        self.ranges = ranges  # [(função de chave, [(evento, chave ou None)] ordenados)]
+
+    def affects(self, version):
+        if version in self.versions:
+            return True
+        if self.version_keys and self.key_fn(version) in self.version_keys:
+            return True
+        for key_fn, events in self.ranges:
+            key = key_fn(version)
+            if key is not None and _in_range(key, events):
+                return True
+        return False
+
+
+def _in_range(key, events):
+    """Semântica OSV: afetado a partir de 'introduced' até 'fixed' (exclusivo) ou 'last_affected' (inclusivo)"""
+    affected = False
+    for event, bound in events:
+        if bound is not None and bound > key:
+            break
+        if event == "introduced":
+            affected = True
+        elif event == "fixed":
+            affected = False
+        elif event == "last_affected" and bound is not None and bound < key:
+            affected = False
+    return affected
+
+
+def _parse_ranges(ecosystem, ranges):
+    parsed = []
+    for item in ranges:
+        kind = item.get("type")
+        key_fn = semver_key if kind == "SEMVER" else ECOSYSTEM_KEYS.get(ecosystem) if kind == "ECOSYSTEM" else None
+        if key_fn is None:
+            continue  # GIT (commits) e ecossistemas sem comparador
+        events = []
+        for event in item.get("events", []):
+            for name in ("introduced", "fixed", "last_affected"):
+                if name in event:
+                    value = event[name]
+                    bound = None if value == "0" else key_fn(value)
+                    if bound is not None or value == "0":
+                        events.append((name, bound))
+        # "0" (None) é o mínimo; num empate o início da gama vem antes do fim
+        events.sort(key=lambda e: (e[1] is not None, e[1] if e[1] is not None else 0, e[0] != "introduced"))
+        parsed.append((key_fn, events))
+    return parsed
+
+
+def iter_osv(sources):
+    """Lê advisories OSV um a um de ficheiros .json (objeto ou lista), pastas e .zip"""
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                yield from iter_osv(sorted(os.path.join(root, name) for name in files if name.endswith(".json")))
+        elif zipfile.is_zipfile(source):
+            with zipfile.ZipFile(source) as archive:
+                for name in archive.namelist():
+                    if name.endswith(".json"):
+                        with archive.open(name) as f:
+                            yield from _as_list(json.load(f))
+        else:
+            with open(source, encoding="utf-8") as f:
+                yield from _as_list(json.load(f))
+
+
+def _as_list(data):
+    return data if isinstance(data, list) else [data]
+
+
+def compile_advisories(conn, advisories):
+    """
+    Escreve advisories OSV numa base de dados SQLite vazia. A versão (hash dos ids + datas
+    de modificação) muda sempre que o conteúdo muda. Devolve (número de advisories, versão).
+    """
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("CREATE TABLE advisories (id TEXT PRIMARY KEY, summary TEXT, severity TEXT, aliases TEXT)")
+    conn.execute("CREATE TABLE affected (ecosystem TEXT, package TEXT, advisory_id TEXT, versions TEXT, ranges TEXT)")
+
+    digest = hashlib.sha256()
+    count = 0
+    for advisory in advisories:
+        if advisory.get("withdrawn"):
+            continue
+        advisory_id = advisory["id"]
+        digest.update(f"{advisory_id}\0{advisory.get('modified', '')}\n".encode())
+        conn.execute("INSERT OR REPLACE INTO advisories VALUES (?, ?, ?, ?)", (
+            advisory_id, advisory.get("summary") or advisory.get("details", "")[:200],
+            osv_severity(advisory), json.dumps(advisory.get("aliases", []))
+        ))
+        for affected in advisory.get("affected", []):
+            package = affected.get("package") or {}
+            if not package.get("name") or not package.get("ecosystem"):
+                continue
+            # "PyPI", "npm"... (o OSV pode acrescentar a versão da distribuição: "Debian:12")
+            ecosystem = package["ecosystem"].split(":")[0]
+            conn.execute("INSERT INTO affected VALUES (?, ?, ?, ?, ?)", (
+                ecosystem, normalize_name(ecosystem, package["name"]), advisory_id,
+                json.dumps(affected.get("versions", [])), json.dumps(affected.get("ranges", []))
+            ))
+        count += 1
+
+    version = digest.hexdigest()[:16]
+    conn.execute("CREATE INDEX affected_package ON affected (ecosystem, package)")
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("version", version), ("advisories", str(count)), ("built_at", str(int(time.time())))
+    ])
+    conn.commit()
+    return count, version
+
+
+def build_database(advisories, db_path):
+    """
+    Compila para db_path. A base de dados é escrita num ficheiro temporário e trocada no fim
+    (os.replace), por isso os workers nunca leem uma base de dados a meio.
+    """
+    tmp_path = f"{db_path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        result = compile_advisories(conn, advisories)
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return result
+
+
+class AdvisoryDB:
+    """
+    Consulta a base de dados compilada. A ligação só é aberta na primeira consulta (e
+    reaberta depois de um fork ou quando o ficheiro é substituído por um build novo).
+    """
+    def __init__(self, path=ADVISORY_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._mtime = None
+        self._checked_at = 0
+        self._version = None
+        # A maioria das dependências não tem advisories: é descartada pelo índice (e a resposta
+        # fica em cache) sem ler nem interpretar entradas
+        self._indexed = lru_cache(maxsize=PACKAGE_INDEX_CACHE_SIZE)(self._has_entries)
+        self._entries = lru_cache(maxsize=PACKAGE_CACHE_SIZE)(self._load_entries)
+
+    def _open(self):
+        if os.path.exists(self.path):
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._mtime = os.path.getmtime(self.path)
+        else:
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            compile_advisories(conn, BUILTIN_ADVISORIES)
+            self._mtime = None
+        self._conn = conn
+        self._pid = os.getpid()
+        self._version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        self._indexed.cache_clear()
+        self._entries.cache_clear()
+
+    def _connection(self):
+        now = time.monotonic()
+        if self._conn is None or self._pid != os.getpid():
+            self._open()
+            self._checked_at = now
+        elif now - self._checked_at > ADVISORY_DB_CHECK:
+            self._checked_at = now
+            mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+            if mtime != self._mtime:
+                self._conn.close()
+                self._open()
+        return self._conn
+
+    @property
+    def version(self):
+        """Versão do conteúdo (muda a cada build com advisories diferentes)"""
+        self._connection()
+        return self._version
+
+    def _has_entries(self, ecosystem, package):
+        return self._connection().execute(
+            "SELECT 1 FROM affected WHERE ecosystem = ? AND package = ? LIMIT 1", (ecosystem, package)
+        ).fetchone() is not None
+
+    def _load_entries(self, ecosystem, package):
+        rows = self._connection().execute(
+            "SELECT a.advisory_id, a.versions, a.ranges, d.summary, d.severity, d.aliases "
+            "FROM affected a JOIN advisories d ON d.id = a.advisory_id "
+            "WHERE a.ecosystem = ? AND a.package = ?", (ecosystem, package)
+        ).fetchall()
+        return [
+            AffectedEntry(
+                Advisory(advisory_id, summary, severity, json.loads(aliases)),
+                frozenset(json.loads(versions)),
+                ECOSYSTEM_KEYS.get(ecosystem),
+                _parse_ranges(ecosystem, json.loads(ranges))
+            )
+            for advisory_id, versions, ranges, summary, severity, aliases in rows
+        ]
+
+    def lookup(self, ecosystem, package, version):
+        """Advisories que afetam (ecossistema, pacote, versão); lista vazia se nenhum"""
+        # Verifica primeiro se a base de dados foi substituída (limpa as caches)
+        self._connection()
+        package = normalize_name(ecosystem, package)
+        if not self._indexed(ecosystem, package):
+            return []
+        entries = self._entries(ecosystem, package)
+        if not entries:
+            return []
+        found = {}
+        for entry in entries:
+            if entry.advisory.id not in found and entry.affects(version):
+                found[entry.advisory.id] = entry.advisory
+        return list(found.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila um dump OSV para a base de dados de advisories do SCA")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Compilar ficheiros .json, pastas ou .zip do OSV")
+    build.add_argument("sources", nargs="+")
+    build.add_argument("--db", default=ADVISORY_DB_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count, version = build_database(iter_osv(args.sources), args.db)
+    print(f"✅ {count} advisories compilados em {args.db} (versão {version}, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+import re
+from bisect import bisect_right
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+NEWLINE = re.compile("\n")
+
+# Todos os separadores de linha de str.splitlines() (\r\n conta como um só)
+BREAK_CHARS = "\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+LINE_BREAKS = re.compile(f"\r\n|[{BREAK_CHARS}]")
+
+# Os mesmos separadores em UTF-8: os que não são \n nem \r\n, e todos (split com o separador)
+OTHER_BYTE_BREAKS = re.compile(rb"\r(?!\n)|[\x0b\x0c\x1c-\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]")
+BYTE_LINE_BREAKS = re.compile(rb"(\r\n|[\n\r\x0b\x0c\x1c-\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9])")
+
+
+class SourceBuffer:
+    """
+    Conteúdo completo de um ficheiro, partilhado por todos os analisadores.
+    Em vez de splitlines() em cada analisador, as regex correm sobre o buffer inteiro
+    (finditer/search) e os offsets são mapeados para linhas com um índice de newlines.
+    """
+    def __init__(self, content, normalize=True):
+        # Normalizar todos os separadores de splitlines() para \n: os números de linha (e por
+        # isso os fingerprints) coincidem com os dos analisadores que usavam splitlines()
+        if normalize and any(ch in content for ch in BREAK_CHARS):
+            content = LINE_BREAKS.sub("\n", content)
+        self.content = content
+        self._line_starts = None
+
+    @classmethod
+    def of(cls, content):
+        """Aceita tanto uma string como um SourceBuffer já construído"""
+        return content if isinstance(content, cls) else cls(content)
+
+    @property
+    def line_starts(self):
+        # Índice construído só quando há o primeiro match (a maioria dos ficheiros não tem nenhum)
+        if self._line_starts is None:
+            starts = [0]
+            starts.extend(m.end() for m in NEWLINE.finditer(self.content))
+            self._line_starts = starts
+        return self._line_starts
+
+    def line_of(self, offset):
+        """Número da linha (1-based) que contém o offset"""
+        return bisect_right(self.line_starts, offset)
+
+    def line_bounds(self, line_num):
+        starts = self.line_starts
+        start = starts[line_num - 1]
+        end = starts[line_num] - 1 if line_num < len(starts) else len(self.content)
+        return start, end
+
+    def line(self, line_num):
+        start, end = self.line_bounds(line_num)
+        return self.content[start:end]
+
+    def line_length(self, line_num):
+        start, end = self.line_bounds(line_num)
+        return end - start
+
+    def iter_lines(self):
+        """(line_num, linha) de todo o ficheiro, uma de cada vez (sem construir a lista de linhas)"""
+        content = self.content
+        size = len(content)
+        pos, line_num = 0, 1
+        while pos < size:
+            end = content.find("\n", pos)
+            if end == -1:
+                end = size
+            yield line_num, content[pos:end]
+            pos, line_num = end + 1, line_num + 1
+
+    def find_lines(self, regex, max_length=None):
+        """
+        Devolve (por ordem) os números das linhas onde a regex encontra um match.
+        Depois de cada match a pesquisa recomeça na linha seguinte, por isso um match
+        que atravesse várias linhas nunca esconde um match numa linha posterior.
+        A regex deve ser compilada com re.MULTILINE se usar âncoras ^/$.
+        """
+        content = self.content
+        size = len(content)
+        pos = 0
+        while pos <= size:
+            m = regex.search(content, pos)
+            if not m:
+                return
+            line_num = self.line_of(m.start())
+            if max_length is None or self.line_length(line_num) <= max_length:
+                yield line_num
+            starts = self.line_starts
+            pos = starts[line_num] if line_num < len(starts) else size + 1
+
+    def find_groups(self, regex, group=0, max_length=None):
+        """Para cada match (regex que não atravessam linhas): (line_num, texto do grupo)"""
+        for m in regex.finditer(self.content):
+            line_num = self.line_of(m.start())
+            if max_length is not None and self.line_length(line_num) > max_length:
+                continue
+            yield line_num, m.group(group)
+
+
+# Versões em bytes das regex (partilhadas entre ficheiros), None se não houver equivalente
+_BYTES_REGEX = {}
+
+# Tamanho máximo de cada fatia copiada do mmap ao contar newlines
+COUNT_WINDOW = 4 * 1024 * 1024
+
+# Um caractere UTF-8 ocupa no máximo 4 bytes
+MAX_UTF8_BYTES = 4
+
+
+# Letras ASCII que em str com IGNORECASE também apanham caracteres não-ASCII (İ, ı, K, ſ)
+UNICODE_FOLDS = frozenset(map(ord, "iksIKS"))
+BOUNDARIES = (sre_parse.AT_BOUNDARY, sre_parse.AT_NON_BOUNDARY)
+
+
+def _unicode_items(subpattern, ignore_case):
+    for op, av in subpattern:
+        if op is sre_parse.AT and av in BOUNDARIES:
+            return True
+        if op in (sre_parse.LITERAL, sre_parse.NOT_LITERAL):
+            if ignore_case and (av in UNICODE_FOLDS or av > 127):
+                return True
+        elif op is sre_parse.IN:
+            for item_op, item in av:
+                if item_op is sre_parse.CATEGORY:
+                    return True
+                if item_op is sre_parse.LITERAL:
+                    lo = hi = item
+                elif item_op is sre_parse.RANGE:
+                    lo, hi = item
+                else:
+                    continue
+                if hi > 127 or (ignore_case and any(lo <= c <= hi for c in UNICODE_FOLDS)):
+                    return True
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, "POSSESSIVE_REPEAT", None)):
+            if _unicode_items(av[2], ignore_case):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            add_flags, del_flags = av[1], av[2]
+            scoped = (ignore_case or bool(add_flags & re.IGNORECASE)) and not del_flags & re.IGNORECASE
+            if _unicode_items(av[3], scoped):
+                return True
+        elif op is sre_parse.BRANCH:
+            if any(_unicode_items(alt, ignore_case) for alt in av[1]):
+                return True
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            if _unicode_items(av[1], ignore_case):
+                return True
+    return False
+
+
+def unicode_sensitive(regex):
+    """
+    True se a versão em bytes da regex pode encontrar matches diferentes da versão str:
+    \w \d \s \b (só ASCII em bytes), IGNORECASE com letras que dobram para não-ASCII,
+    e caracteres não-ASCII dentro de classes [...].
+    """
+    try:
+        return _unicode_items(sre_parse.parse(regex.pattern, regex.flags), bool(regex.flags & re.IGNORECASE))
+    except re.error:
+        return True
+
+
+def to_bytes_regex(regex):
+    """Versão em bytes da regex, ou None se não houver uma equivalente (usar as linhas descodificadas)"""
+    if regex not in _BYTES_REGEX:
+        flags = regex.flags & (re.IGNORECASE | re.MULTILINE | re.DOTALL | re.VERBOSE)
+        if unicode_sensitive(regex):
+            _BYTES_REGEX[regex] = None
+        else:
+            try:
+                _BYTES_REGEX[regex] = re.compile(regex.pattern.encode("utf-8"), flags)
+            except re.error:
+                _BYTES_REGEX[regex] = None
+    return _BYTES_REGEX[regex]
+
+
+class MappedBuffer(SourceBuffer):
+    """
+    Ficheiro grande mapeado em memória (mmap), com a mesma interface do SourceBuffer.
+    As regex são recompiladas em bytes e correm diretamente sobre o mapeamento; os números
+    de linha são obtidos contando newlines entre matches, e só as linhas com match são
+    descodificadas. A memória usada não depende do tamanho do ficheiro.
+    Em bytes, \w \d \s \b e IGNORECASE só conhecem ASCII: regex que dependem disso (ver
+    unicode_sensitive) ou sem versão em bytes correm em str sobre o ficheiro descodificado
+    em blocos de COUNT_WINDOW (mais lento; só um match que atravesse dois blocos difere do
+    SourceBuffer). Ficheiros com outros separadores de splitlines() além de \n e \r\n
+    (\r isolado, \x0c, \u2028...) seguem sempre esse caminho, com as linhas cortadas em
+    todos os separadores, como no SourceBuffer.
+    Em bytes, "." e classes negadas contam bytes e não caracteres (repetições limitadas
+    como .{10} podem diferir em texto não-ASCII).
+    """
+    def __init__(self, mm):
+        self.mm = mm
+        self.content = None
+        self._lines = {}  # line_num -> (start, end), só para linhas com match
+        # Contar só \n não chega: todas as pesquisas passam pelos blocos descodificados
+        self.other_breaks = OTHER_BYTE_BREAKS.search(mm) is not None
+
+    def _count_newlines(self, start, end):
+        count = 0
+        for pos in range(start, end, COUNT_WINDOW):
+            count += self.mm[pos:min(end, pos + COUNT_WINDOW)].count(b"\n")
+        return count
+
+    def _line_span(self, offset):
+        mm = self.mm
+        start = mm.rfind(b"\n", 0, offset) + 1
+        end = mm.find(b"\n", offset)
+        if end == -1:
+            end = len(mm)
+        if end > start and mm[end - 1:end] == b"\r":
+            end -= 1
+        return start, end
+
+    def _too_long(self, line_num, max_length):
+        if max_length is None:
+            return False
+        start, end = self._lines[line_num]
+        if end - start > max_length * MAX_UTF8_BYTES:
+            return True
+        return self.line_length(line_num) > max_length
+
+    def _matches(self, regex, restart_at_next_line):
+        """(line_num, match) por ordem; com restart_at_next_line, no máximo um match por linha"""
+        regex = to_bytes_regex(regex)
+        mm = self.mm
+        size = len(mm)
+        line_num, counted = 1, 0
+        pos = 0
+        while pos <= size:
+            m = regex.search(mm, pos)
+            if not m:
+                return
+            start, end = self._line_span(m.start())
+            line_num += self._count_newlines(counted, start)
+            counted = start
+            self._lines[line_num] = (start, end)
+            yield line_num, m
+            pos = mm.find(b"\n", m.start()) + 1 if restart_at_next_line else max(m.end(), m.start() + 1)
+            if pos == 0:
+                return
+
+    def _block_end(self, pos):
+        """Fim do bloco que começa em pos: a seguir ao último separador dentro de COUNT_WINDOW"""
+        mm = self.mm
+        size = len(mm)
+        limit = pos + COUNT_WINDOW
+        if limit >= size:
+            return size
+        end = mm.rfind(b"\n", pos, limit) + 1
+        if self.other_breaks:
+            # Ficheiros só com \r: corta no \r (ou no \n de um \r\n que fique na fronteira)
+            cr = mm.rfind(b"\r", pos, limit) + 1
+            if cr > end:
+                end = cr + 1 if mm[cr:cr + 1] == b"\n" else cr
+        if end <= pos:
+            # Linha maior do que o bloco
+            ends = [i + 1 for i in (mm.find(b"\n", limit), mm.find(b"\r", limit) if self.other_breaks else -1) if i != -1]
+            end = min(ends) if ends else size
+            if mm[end - 1:end] == b"\r" and mm[end:end + 1] == b"\n":
+                end += 1
+        return end
+
+    def _decoded_blocks(self):
+        """
+        (número da primeira linha, spans em bytes de cada linha, SourceBuffer do bloco):
+        o ficheiro descodificado em blocos de COUNT_WINDOW cortados num separador
+        """
+        mm = self.mm
+        size = len(mm)
+        pos, line_num = 0, 1
+        while pos < size:
+            end = self._block_end(pos)
+            chunk = mm[pos:end]
+            if self.other_breaks:
+                parts = BYTE_LINE_BREAKS.split(chunk)  # linha, separador, linha, ...
+                raws, separators = parts[0::2], [len(sep) for sep in parts[1::2]]
+            else:
+                raws, separators = chunk.split(b"\n"), None
+            newline = len(raws) > 1 and not raws[-1]
+            if newline:
+                raws.pop()
+            spans, lines = [], []
+            start = pos
+            for k, raw in enumerate(raws):
+                stop = start + len(raw)
+                if separators is None and raw.endswith(b"\r"):
+                    raw = raw[:-1]
+                spans.append((start, start + len(raw)))
+                lines.append(raw.decode("utf-8", errors="ignore"))
+                start = stop + (separators[k] if separators is not None and k < len(separators) else 1)
+            # O \n final fica no bloco (regex como \s{2} podem terminar nele)
+            yield line_num, spans, SourceBuffer("\n".join(lines) + ("\n" if newline else ""), normalize=False)
+            line_num += len(lines)
+            pos = end
+
+    def _decoded(self, find):
+        """find(SourceBuffer do bloco) -> (linha no bloco, valor); devolve (line_num, valor) no ficheiro"""
+        for first, spans, block in self._decoded_blocks():
+            for i, value in find(block):
+                if i > len(spans):
+                    break  # Depois do último \n: pertence ao bloco seguinte
+                line_num = first + i - 1
+                self._lines[line_num] = spans[i - 1]
+                yield line_num, value
+
+    def line_length(self, line_num):
+        return len(self.line(line_num))
+
+    def line(self, line_num):
+        start, end = self._lines[line_num]
+        return self.mm[start:end].decode("utf-8", errors="ignore")
+
+    def iter_lines(self):
+        # Descodificado em blocos de COUNT_WINDOW (cortados num separador): memória limitada ao bloco
+        for first, _, block in self._decoded_blocks():
+            for i, line in block.iter_lines():
+                yield first + i - 1, line
+
+    def find_lines(self, regex, max_length=None):
+        if self.other_breaks or to_bytes_regex(regex) is None:
+            matches = self._decoded(lambda block: ((i, None) for i in block.find_lines(regex)))
+        else:
+            matches = self._matches(regex, restart_at_next_line=True)
+        for line_num, _ in matches:
+            if not self._too_long(line_num, max_length):
+                yield line_num
+
+    def find_groups(self, regex, group=0, max_length=None):
+        if self.other_breaks or to_bytes_regex(regex) is None:
+            for line_num, value in self._decoded(lambda block: block.find_groups(regex, group)):
+                if not self._too_long(line_num, max_length):
+                    yield line_num, value
+            return
+        for line_num, m in self._matches(regex, restart_at_next_line=False):
+            if not self._too_long(line_num, max_length):
+                yield line_num, m.group(group).decode("utf-8", errors="ignore")
@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+# Nome do ficheiro de cache (criado ao lado do security_report.json)
+CACHE_FILENAME = ".sentinel_cache.db"
+
+# Limite de entradas; acima disto as menos usadas recentemente são removidas
+DEFAULT_MAX_ENTRIES = 200_000
+
+READ_CHUNK = 1024 * 1024
+
+
+def file_digest(file_path):
+    """SHA-256 do conteúdo do ficheiro (lido em blocos para não carregar tudo em memória)"""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def default_cache_path(output_file):
+    """A cache fica na mesma pasta do relatório"""
+    return os.path.join(os.path.dirname(os.path.abspath(output_file)), CACHE_FILENAME)
+
+
+class ScanCache:
+    """
+    Cache persistente (SQLite) de resultados por ficheiro.
+    Chave = digest do conteúdo + nome do ficheiro + políticas; o conjunto de regras e a
+    versão do scanner entram no fingerprint guardado na tabela meta: se mudarem, a cache
+    inteira é invalidada na abertura.
+    """
+    def __init__(self, path, fingerprint, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, issues TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if not row or row[0] != fingerprint:
+            # rules.yaml ou versão do scanner mudaram: nada do que está guardado é válido
+            self.conn.execute("DELETE FROM entries")
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+        self.conn.commit()
+
+    @staticmethod
+    def key_for(file_path, policies=None):
+        """Chave da entrada; None se o ficheiro não puder ser lido"""
+        try:
+            digest = file_digest(file_path)
+        except OSError:
+            return None
+        context = json.dumps([os.path.basename(file_path), policies or {}], sort_keys=True)
+        return hashlib.sha256(f"{digest}:{context}".encode()).hexdigest()
+
+    def get_many(self, keys):
+        """Devolve {key: [issue dicts]} para as chaves encontradas e atualiza o last_used"""
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(f"SELECT key, issues FROM entries WHERE key IN ({placeholders})", batch)
+            for key, issues in rows:
+                found[key] = json.loads(issues)
+        if found:
+            now = time.time()
+            self.conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """items = [(key, [issue dicts])]"""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO entries (key, issues, last_used) VALUES (?, ?, ?)",
+            [(key, json.dumps(issues), now) for key, issues in items]
+        )
+        self._evict()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count > self.max_entries:
+            # Remove as menos usadas até ficar 10% abaixo do limite
+            excess = count - int(self.max_entries * 0.9)
+            self.conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -5,6 +5,13 @@ from celery import Celery
 broker_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 result_backend = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
 
+# Arquivos com mais ficheiros do que isto são divididos em shards e distribuídos pelos workers
+SCAN_SHARD_SIZE = int(os.getenv("SCAN_SHARD_SIZE", "500"))
+
+# Webhooks/Jira são entregues por workers próprios, para não ocupar os workers de scan
+INTEGRATIONS_QUEUE = os.getenv("INTEGRATIONS_QUEUE", "integrations")
+INTEGRATION_MAX_RETRIES = int(os.getenv("INTEGRATION_MAX_RETRIES", "5"))
+
 celery_app = Celery(
     "sentinel_worker",
     broker=broker_url,
@@ -18,4 +25,5 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    task_routes={"deliver_integration_task": {"queue": INTEGRATIONS_QUEUE}},
 )
\ No newline at end of file
@@ -0,0 +1,101 @@
+import os
+import codecs
+import fnmatch
+
+# Só o início do ficheiro é lido para decidir se vale a pena analisá-lo
+HEAD_SIZE = 8192
+
+# Limite para conteúdo lido inteiro para memória (membros de arquivos ZIP)
+MAX_FILE_SIZE = 20 * 1024 * 1024
+
+# Ficheiros em disco acima disto são mapeados em memória (mmap) em vez de lidos
+LARGE_FILE_THRESHOLD = int(os.getenv("SENTINEL_MMAP_THRESHOLD", str(8 * 1024 * 1024)))
+
+# Ficheiros em disco maiores do que isto não são analisados
+MAX_MAPPED_FILE_SIZE = 2 * 1024 * 1024 * 1024
+
+# Linhas com mais do que isto já são ignoradas pelos analisadores; se a média do
+# início do ficheiro passar este valor, o ficheiro é minificado e não vale a pena lê-lo
+MINIFIED_AVG_LINE = 500
+
+BINARY_EXTENSIONS = {
+    # Imagens e media
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.tiff', '.psd',
+    '.mp3', '.mp4', '.wav', '.ogg', '.mov', '.avi', '.mkv', '.webm',
+    # Fontes
+    '.woff', '.woff2', '.ttf', '.otf', '.eot',
+    # Arquivos e pacotes
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.tar', '.jar', '.war', '.ear', '.whl', '.egg',
+    # Binários compilados
+    '.so', '.dll', '.dylib', '.exe', '.bin', '.o', '.a', '.lib', '.class', '.pyc', '.pyo', '.wasm',
+    # Dados
+    '.pdf', '.db', '.sqlite', '.sqlite3', '.pkl', '.npy', '.npz', '.parquet', '.h5', '.onnx', '.pt',
+}
+
+# Globs de ficheiros gerados/minificados que nunca são analisados
+SKIP_GLOBS = ('*.min.js', '*.min.css', '*.map', '*.bundle.js', '*.chunk.js')
+
+# Assinaturas (magic numbers) de formatos binários comuns
+MAGIC_NUMBERS = (
+    b'\x7fELF', b'\x89PNG', b'GIF87a', b'GIF89a', b'\xff\xd8\xff', b'PK\x03\x04',
+    b'%PDF', b'\xca\xfe\xba\xbe', b'wOFF', b'wOF2', b'\x1f\x8b', b'BZh', b'\xfd7zXZ',
+)
+
+# Convenções usadas pelos geradores de código (Go, Bazel, Jest, Relay, ...), sempre no cabeçalho
+GENERATED_MARKERS = (b'@generated', b'Code generated by')
+GENERATED_HEADER_SIZE = 1024
+
+UTF16_BOMS = (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+
+def classify_name(filename, size=None, max_size=MAX_FILE_SIZE):
+    """Decisão só pelo nome e tamanho (sem I/O); devolve o motivo para saltar ou None"""
+    name = os.path.basename(filename).lower()
+    if os.path.splitext(name)[1] in BINARY_EXTENSIONS:
+        return "binary-extension"
+    if any(fnmatch.fnmatch(name, pattern) for pattern in SKIP_GLOBS):
+        return "skip-glob"
+    if size is not None and size > max_size:
+        return "too-large"
+    return None
+
+
+def classify_head(head):
+    """Decisão pelo bloco inicial do ficheiro; devolve o motivo para saltar ou None"""
+    if head.startswith(UTF16_BOMS):
+        # Texto UTF-16 (tem bytes NUL, mas não é binário)
+        return None
+    if head.startswith(MAGIC_NUMBERS):
+        return "binary-magic"
+    if b'\x00' in head:
+        return "binary-content"
+    if len(head) >= HEAD_SIZE // 2 and head.count(b'\n') * MINIFIED_AVG_LINE < len(head):
+        return "minified"
+    header = head[:GENERATED_HEADER_SIZE]
+    if any(marker in header for marker in GENERATED_MARKERS):
+        return "generated"
+    return None
+
+
+def classify_file(file_path):
+    """Classificação completa de um ficheiro em disco: lê no máximo HEAD_SIZE bytes"""
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        return "unreadable"
+    reason = classify_name(file_path, size, MAX_MAPPED_FILE_SIZE)
+    if reason:
+        return reason
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(HEAD_SIZE)
+    except OSError:
+        return "unreadable"
+    return classify_head(head)
+
+
+def decode_source(data):
+    """Decodifica o conteúdo para os analisadores (UTF-16 com BOM, senão UTF-8 tolerante)"""
+    if data.startswith(UTF16_BOMS):
+        return data.decode('utf-16', errors='ignore')
+    return data.decode('utf-8', errors='ignore')
@@ -0,0 +1,53 @@
+import os
+import time
+import random
+import threading
+import httpx
+from supabase import create_client
+
+# Tentativas e backoff exponencial (com jitter) para falhas transitórias
+DB_RETRIES = int(os.getenv("DB_RETRIES", "4"))
+DB_BACKOFF = float(os.getenv("DB_BACKOFF", "0.5"))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url, key):
+    """
+    Cliente Supabase partilhado por processo (o httpx por baixo mantém o pool de ligações).
+    Depois de um fork (workers prefork do Celery) cada processo cria o seu.
+    """
+    pid = os.getpid()
+    with _clients_lock:
+        client = _clients.get((pid, url, key))
+        if client is None:
+            client = _clients[(pid, url, key)] = create_client(url, key)
+    return client
+
+
+def is_transient(exc):
+    """Erros de rede, timeouts, 429 e 5xx voltam a ser tentados; erros de dados não"""
+    if isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status:
+        return status == 429 or status >= 500
+    # PostgREST: PGRST000-PGRST003 são falhas de ligação à base de dados
+    code = str(getattr(exc, "code", "") or "")
+    return code.startswith("PGRST00")
+
+
+def with_retry(operation, retries=DB_RETRIES, backoff=DB_BACKOFF):
+    """Executa operation(); em falhas transitórias espera backoff * 2^n (+ jitter) e repete"""
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            delay = backoff * (2 ** attempt) * (1 + random.random())
+            print(f"⚠️ Supabase indisponível ({e}); nova tentativa em {delay:.1f}s")
+            time.sleep(delay)
+
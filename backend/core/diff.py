@@ -0,0 +1,65 @@
+import re
+import subprocess
+
+# Cabeçalho de hunk do diff unificado: @@ -a,b +c,d @@
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+def changed_lines(repo_dir, diff_range):
+    """
+    Usa o git para listar os ficheiros alterados em diff_range (ex: 'main..HEAD', 'A...B')
+    e as linhas adicionadas/modificadas de cada um.
+    Devolve {caminho relativo a repo_dir: [(linha_inicial, linha_final), ...]}.
+    """
+    cmd = [
+        "git",
+        # O container da Action corre com outro uid: sem isto o git recusa o repositório
+        "-c", "safe.directory=*",
+        "-c", "core.quotePath=false",
+        "-C", repo_dir,
+        "diff", "--no-color", "--no-ext-diff", "--relative",
+        "-U0", "-M", "--diff-filter=ACMR",
+        diff_range, "--",
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    if result.returncode != 0:
+        raise RuntimeError(f"git diff falhou: {result.stderr.strip()}")
+    return parse_unified_diff(result.stdout)
+
+
+def parse_unified_diff(diff_text):
+    changes = {}
+    current = None
+    in_header = False  # Uma linha adicionada "++ x" aparece como "+++ x" no corpo do hunk
+    for line in diff_text.split("\n"):
+        if line.startswith("diff --git "):
+            in_header = True
+            current = None
+        elif in_header and line.startswith("+++ "):
+            # O git acrescenta um TAB quando o nome tem espaços
+            path = line[4:].rstrip("\t")
+            if path.startswith('"') and path.endswith('"'):
+                path = path[1:-1]
+            if path == "/dev/null":
+                current = None
+                continue
+            current = path[2:] if path.startswith("b/") else path
+            changes.setdefault(current, [])
+        elif line.startswith("@@"):
+            in_header = False
+            m = HUNK_HEADER.match(line)
+            if not m or not current:
+                continue
+            start = int(m.group(1))
+            count = int(m.group(2)) if m.group(2) is not None else 1
+            # count == 0: hunk só com linhas removidas
+            if count:
+                changes[current].append((start, start + count - 1))
+    return changes
+
+
+def line_in_hunks(line, hunks):
+    """Findings sem linha (line 0) referem-se ao ficheiro inteiro e são sempre mantidos"""
+    if not line:
+        return True
+    return any(start <= line <= end for start, end in hunks)
@@ -0,0 +1,153 @@
+"""
+Despacho de analisadores por tipo de ficheiro.
+Nomes exatos, extensões e globs são associados a analisadores (SCA, IaC) e a linguagens;
+as regras podem declarar "languages" e/ou "files" no rules.yaml. Para cada nome de ficheiro
+é montado uma vez um pipeline: os analisadores que se aplicam e um RuleEngine só com as
+regras dessa linguagem (os subconjuntos compilados são partilhados entre extensões).
+"""
+import os
+import fnmatch
+
+# Linguagens conhecidas: nomes exatos, extensões (*.ext) ou globs (comparados em minúsculas)
+LANGUAGES = {
+    "python": ("*.py", "*.pyw", "*.pyi"),
+    "javascript": ("*.js", "*.jsx", "*.mjs", "*.cjs"),
+    "typescript": ("*.ts", "*.tsx", "*.mts", "*.cts"),
+    "java": ("*.java",),
+    "kotlin": ("*.kt", "*.kts"),
+    "go": ("*.go",),
+    "ruby": ("*.rb", "gemfile", "rakefile"),
+    "php": ("*.php",),
+    "csharp": ("*.cs",),
+    "c": ("*.c", "*.h"),
+    "cpp": ("*.cpp", "*.cc", "*.cxx", "*.hpp", "*.hh"),
+    "rust": ("*.rs",),
+    "swift": ("*.swift",),
+    "shell": ("*.sh", "*.bash", "*.zsh"),
+    "html": ("*.html", "*.htm"),
+    "sql": ("*.sql",),
+    "json": ("*.json",),
+    "yaml": ("*.yaml", "*.yml"),
+    "xml": ("*.xml",),
+    "terraform": ("*.tf", "*.tfvars"),
+    "dockerfile": ("dockerfile", "dockerfile.*", "*.dockerfile"),
+    "env": (".env", ".env.*"),
+    "config": ("*.ini", "*.cfg", "*.conf", "*.properties", "*.toml"),
+}
+
+# Pipelines guardados por nome de ficheiro (limpos quando cheios)
+MAX_PIPELINES = 10_000
+
+
+def file_key(path):
+    """Nome base normalizado (minúsculas) usado em todas as comparações por nome de ficheiro"""
+    return os.path.basename(path).lower()
+
+
+class Analyzer:
+    """Analisador especializado: fn(buffer, file_path) -> lista de issues em dict"""
+    __slots__ = ("stage", "fn", "policy", "large_files")
+
+    def __init__(self, stage, fn, policy=None, large_files=False):
+        self.stage = stage              # Fase no perfil ("sca", "iac")
+        self.fn = fn
+        self.policy = policy            # Política que o ativa (ex: dockerScan); None = sempre
+        self.large_files = large_files  # Aceita um MappedBuffer (ficheiros acima do limiar)
+
+
+class Pipeline:
+    __slots__ = ("analyzers", "rules")
+
+    def __init__(self, analyzers, rules):
+        self.analyzers = analyzers
+        self.rules = rules  # RuleEngine com as regras que se aplicam ao ficheiro
+
+
+class PatternIndex:
+    """Padrões -> etiquetas: nomes exatos e extensões num dict, o resto por fnmatch"""
+    def __init__(self):
+        self.names = {}
+        self.extensions = {}
+        self.globs = []
+
+    def add(self, pattern, tag):
+        pattern = pattern.lower()
+        if not any(ch in pattern for ch in "*?["):
+            self.names.setdefault(pattern, []).append(tag)
+        elif pattern.startswith("*.") and not any(ch in pattern[2:] for ch in "*?["):
+            self.extensions.setdefault(pattern[1:], []).append(tag)
+        else:
+            self.globs.append((pattern, tag))
+
+    def match(self, filename):
+        name = file_key(filename)
+        tags = list(self.names.get(name, ()))
+        # Todas as extensões compostas: a.d.ts -> .d.ts, .ts
+        dot = name.find(".", 1)
+        while dot != -1:
+            tags.extend(self.extensions.get(name[dot:], ()))
+            dot = name.find(".", dot + 1)
+        tags.extend(tag for pattern, tag in self.globs if fnmatch.fnmatchcase(name, pattern))
+        return tags
+
+
+class AnalyzerRegistry:
+    def __init__(self, engine, languages=LANGUAGES):
+        self.engine = engine
+        self.analyzers = []  # Por ordem de registo (é a ordem de execução)
+        self.index = PatternIndex()
+        for language, patterns in languages.items():
+            for pattern in patterns:
+                self.index.add(pattern, ("language", language))
+
+        # Regras sem languages/files aplicam-se a todos os ficheiros
+        self.universal = []
+        for rule in engine.rules:
+            if rule.languages is None and rule.files is None:
+                self.universal.append(rule)
+            for pattern in rule.files or ():
+                self.index.add(pattern, ("rule", rule.index))
+
+        self.engines = {}    # índices das regras -> RuleEngine (partilhado)
+        self.pipelines = {}  # nome do ficheiro -> Pipeline
+
+        # Subconjuntos das linguagens conhecidas compilados já no arranque
+        for language in languages:
+            self._engine_for([("language", language)])
+
+    def register(self, patterns, stage, fn, policy=None, large_files=False):
+        """Associa um analisador a nomes exatos, extensões (*.ext) ou globs"""
+        analyzer = Analyzer(stage, fn, policy, large_files)
+        position = len(self.analyzers)
+        self.analyzers.append(analyzer)
+        for pattern in patterns:
+            self.index.add(pattern, ("analyzer", position))
+        self.pipelines.clear()
+
+    def _engine_for(self, tags):
+        languages = {value for kind, value in tags if kind == "language"}
+        indexes = {value for kind, value in tags if kind == "rule"}
+        rules = [rule for rule in self.engine.rules
+                 if rule in self.universal or rule.index in indexes
+                 or (rule.languages and languages.intersection(rule.languages))]
+        key = frozenset(rule.index for rule in rules)
+        if len(key) == len(self.engine.rules):
+            return self.engine
+        engine = self.engines.get(key)
+        if engine is None:
+            engine = self.engines[key] = self.engine.subset(rules)
+        return engine
+
+    def pipeline(self, filename):
+        """Pipeline do ficheiro (pelo nome base), montado uma vez por nome"""
+        key = file_key(filename)
+        pipeline = self.pipelines.get(key)
+        if pipeline is None:
+            if len(self.pipelines) >= MAX_PIPELINES:
+                self.pipelines.clear()
+            tags = self.index.match(key)
+            positions = sorted({value for kind, value in tags if kind == "analyzer"})
+            pipeline = self.pipelines[key] = Pipeline(
+                [self.analyzers[i] for i in positions], self._engine_for(tags)
+            )
+        return pipeline
@@ -1,72 +1,419 @@
+"""
+Motor de IaC: Dockerfile, Terraform (*.tf) e manifestos Kubernetes (YAML).
+Cada ficheiro é lido uma vez para uma forma estruturada leve (instruções, blocos HCL,
+documentos YAML com números de linha) e as verificações declarativas correm sobre ela
+numa única passagem. As formas estruturadas ficam em cache pelo hash do conteúdo.
+"""
+import os
 import re
+import hashlib
+import yaml
+from .buffer import SourceBuffer
+from .dispatch import file_key
+
+# Formas estruturadas guardadas por processo (conteúdos iguais são lidos uma só vez)
+PARSE_CACHE_SIZE = int(os.getenv("IAC_PARSE_CACHE_SIZE", "2048"))
+
+# Um manifesto Kubernetes tem apiVersion e kind no topo de algum documento
+K8S_API_VERSION = re.compile(r"^apiVersion\s*:", re.MULTILINE)
+K8S_KIND = re.compile(r"^kind\s*:", re.MULTILINE)
+
+
+def iac_kind(filename):
+    """Tipo de ficheiro de IaC pelo nome ("dockerfile", "terraform", "yaml") ou None"""
+    lower = file_key(filename)
+    if lower == "dockerfile" or lower.startswith("dockerfile.") or lower.endswith(".dockerfile"):
+        return "dockerfile"
+    if lower.endswith(".tf"):
+        return "terraform"
+    if lower.endswith((".yaml", ".yml")):
+        return "yaml"
+    return None
+
+
+# --- Dockerfile ---------------------------------------------------------------
+
+class Instruction:
+    __slots__ = ("keyword", "args", "line")
+
+    def __init__(self, keyword, args, line):
+        self.keyword = keyword
+        self.args = args
+        self.line = line
+
+
+def parse_dockerfile(buffer):
+    """Instruções (com as continuações "\\" juntas), na linha onde começam"""
+    instructions = []
+    parts, start = [], 0
+    for line_num, line in buffer.iter_lines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if not parts:
+            start = line_num
+        if stripped.endswith("\\"):
+            parts.append(stripped[:-1])
+            continue
+        parts.append(stripped)
+        keyword, _, args = " ".join(parts).partition(" ")
+        instructions.append(Instruction(keyword.upper(), args.strip(), start))
+        parts = []
+    if parts:
+        keyword, _, args = " ".join(parts).partition(" ")
+        instructions.append(Instruction(keyword.upper(), args.strip(), start))
+    return instructions
+
+
+def _from_latest(instruction):
+    # FROM [--platform=...] imagem[:tag] [AS nome]
+    image = next((arg for arg in instruction.args.split() if not arg.startswith("--")), "")
+    return image.lower().endswith(":latest")
+
+
+def _exposes_ssh(instruction):
+    return any(port.split("/")[0] == "22" for port in instruction.args.split())
+
+
+# --- Terraform ----------------------------------------------------------------
+
+# resource "aws_s3_bucket" "b" {   |   ingress {   |   dynamic "x" {}
+HCL_BLOCK = re.compile(r'^\s*([\w-]+)((?:\s+"[^"]*")*)\s*\{\s*(\})?\s*$')
+HCL_ATTRIBUTE = re.compile(r"^\s*([\w-]+)\s*=\s*(.*?)\s*$")
+HCL_HEREDOC = re.compile(r"<<-?\s*([A-Za-z_]\w*)\s*$")
+
+
+class Block:
+    __slots__ = ("type", "labels", "line", "attributes", "blocks")
+
+    def __init__(self, type, labels, line):
+        self.type = type
+        self.labels = labels
+        self.line = line
+        self.attributes = {}  # nome -> (valor em texto, linha)
+        self.blocks = []
+
+    def attribute(self, name):
+        value = self.attributes.get(name)
+        return value[0] if value else None
+
+    def walk(self):
+        """Este bloco e todos os blocos aninhados"""
+        yield self
+        for block in self.blocks:
+            yield from block.walk()
+
+
+def _balance(text):
+    """Parênteses/chavetas por fechar (fora de strings)"""
+    depth, quoted, escaped = 0, False, False
+    for ch in text:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif not quoted and ch in "{[(":
+            depth += 1
+        elif not quoted and ch in "}])":
+            depth -= 1
+    return depth
+
+
+def parse_terraform(buffer):
+    """
+    Árvore de blocos HCL de nível superior. Os valores ficam em texto (multilinha juntos):
+    as verificações só precisam de comparar literais, não de avaliar expressões.
+    """
+    root = Block("", (), 0)
+    stack = [root]
+    pending = None        # [nome, partes, linha, profundidade] de um valor multilinha
+    heredoc = None        # [nome, terminador, partes, linha]
+    in_comment = False
+    for line_num, line in buffer.iter_lines():
+        if heredoc:
+            if line.strip() == heredoc[1]:
+                name, _, parts, start = heredoc
+                stack[-1].attributes[name] = ("\n".join(parts), start)
+                heredoc = None
+            else:
+                heredoc[2].append(line)
+            continue
+        stripped = line.strip()
+        if in_comment:
+            in_comment = "*/" not in stripped
+            continue
+        if pending:
+            pending[1].append(stripped)
+            pending[3] += _balance(stripped)
+            if pending[3] <= 0:
+                name, parts, start, _ = pending
+                stack[-1].attributes[name] = (" ".join(parts), start)
+                pending = None
+            continue
+        if not stripped or stripped.startswith(("#", "//")):
+            continue
+        if stripped.startswith("/*"):
+            in_comment = "*/" not in stripped
+            continue
+        if stripped.startswith("}"):
+            if len(stack) > 1:
+                stack.pop()
+            continue
+
+        m = HCL_BLOCK.match(line)
+        if m:
+            labels = tuple(re.findall(r'"([^"]*)"', m.group(2)))
+            block = Block(m.group(1), labels, line_num)
+            stack[-1].blocks.append(block)
+            if not m.group(3):
+                stack.append(block)
+            continue
+
+        m = HCL_ATTRIBUTE.match(line)
+        if m:
+            name, value = m.groups()
+            h = HCL_HEREDOC.search(value)
+            if h:
+                heredoc = [name, h.group(1), [], line_num]
+                continue
+            depth = _balance(value)
+            if depth > 0:
+                pending = [name, [value], line_num, depth]
+            else:
+                stack[-1].attributes[name] = (value, line_num)
+    return root
+
+
+def _resources(root, *types):
+    return [b for b in root.blocks if b.type == "resource" and b.labels and b.labels[0] in types]
+
+
+def _literal(value):
+    return value.strip().strip('"').lower() if value is not None else None
+
+
+def _open_cidr_attributes(block):
+    """Atributos cidr abertos ao mundo numa regra de entrada de um security group"""
+    if block.type == "egress" or _literal(block.attribute("type")) == "egress":
+        return []
+    if block.type == "resource" and block.labels[:1] == ("aws_vpc_security_group_egress_rule",):
+        return []
+    found = []
+    for name in ("cidr_blocks", "cidr_ipv4", "ipv6_cidr_blocks", "cidr_ipv6"):
+        value, line = block.attributes.get(name, (None, 0))
+        if value and ("0.0.0.0/0" in value or '"::/0"' in value or value.strip('"') == "::/0"):
+            found.append(line)
+    return found
+
+
+def _terraform_findings(root):
+    """(id, linha) de cada verificação; uma passagem pela árvore"""
+    findings = []
+    # Encriptação configurada num recurso separado (AWS provider >= 4) cobre os buckets do ficheiro
+    separate_sse = bool(_resources(root, "aws_s3_bucket_server_side_encryption_configuration"))
+
+    for block in root.walk():
+        for line in _open_cidr_attributes(block):
+            findings.append(("AWS_OPEN_SG", line))
+
+        if block.type != "resource" or not block.labels:
+            continue
+        resource_type = block.labels[0]
+
+        if resource_type == "aws_s3_bucket":
+            nested_sse = any(b.type == "server_side_encryption_configuration" for b in block.blocks)
+            if not nested_sse and not separate_sse:
+                findings.append(("UNENCRYPTED_S3", block.line))
+
+        if resource_type in ("aws_s3_bucket", "aws_s3_bucket_acl"):
+            if _literal(block.attribute("acl")) in ("public-read", "public-read-write"):
+                findings.append(("TF_PUBLIC_S3_ACL", block.attributes["acl"][1]))
+
+        if resource_type in ("aws_db_instance", "aws_rds_cluster_instance"):
+            if _literal(block.attribute("publicly_accessible")) == "true":
+                findings.append(("TF_PUBLIC_DB", block.attributes["publicly_accessible"][1]))
+    return findings
+
+
+# --- Kubernetes -------------------------------------------------------------------
+
+class Mapping(dict):
+    """Mapping YAML com a linha onde começa e a linha de cada chave"""
+    __slots__ = ("line", "lines")
+
+
+class _ManifestLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    pass
+
+
+def _construct_mapping(loader, node):
+    mapping = Mapping(loader.construct_mapping(node, deep=True))
+    mapping.line = node.start_mark.line + 1
+    mapping.lines = {key.value: key.start_mark.line + 1 for key, _ in node.value if isinstance(key, yaml.ScalarNode)}
+    return mapping
+
+
+_ManifestLoader.add_constructor(yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG, _construct_mapping)
+
+# Onde está o pod spec de cada tipo de workload
+POD_SPEC_PATHS = {
+    "Pod": ("spec",),
+    "Deployment": ("spec", "template", "spec"),
+    "StatefulSet": ("spec", "template", "spec"),
+    "DaemonSet": ("spec", "template", "spec"),
+    "ReplicaSet": ("spec", "template", "spec"),
+    "ReplicationController": ("spec", "template", "spec"),
+    "Job": ("spec", "template", "spec"),
+    "CronJob": ("spec", "jobTemplate", "spec", "template", "spec"),
+}
+
+
+def parse_manifests(buffer):
+    """Documentos Kubernetes (Mapping com apiVersion e kind); None se não for um manifesto válido"""
+    content = buffer.content
+    if not K8S_API_VERSION.search(content) or not K8S_KIND.search(content):
+        return None
+    try:
+        documents = list(yaml.load_all(content, Loader=_ManifestLoader))
+    except yaml.YAMLError:
+        # Ex: templates Helm ({{ ... }}) não são YAML válido
+        return None
+    return [doc for doc in documents if isinstance(doc, Mapping) and "apiVersion" in doc and "kind" in doc]
+
+
+def _pod_spec(document):
+    spec = document
+    for key in POD_SPEC_PATHS.get(document.get("kind"), ()):
+        spec = spec.get(key) if isinstance(spec, Mapping) else None
+    return spec if isinstance(spec, Mapping) and spec is not document else None
+
+
+def _security_context(mapping):
+    context = mapping.get("securityContext")
+    return context if isinstance(context, Mapping) else None
+
+
+def _image_unpinned(image):
+    # Sem digest: sem tag ou com :latest (a tag vem depois do último "/")
+    if not isinstance(image, str) or "@" in image:
+        return False
+    last = image.rsplit("/", 1)[-1]
+    return ":" not in last or last.lower().endswith(":latest")
+
+
+def _k8s_findings(documents):
+    findings = []
+    for document in documents:
+        pod = _pod_spec(document)
+        if pod is None:
+            continue
+
+        for key in ("hostNetwork", "hostPID", "hostIPC"):
+            if pod.get(key) is True:
+                findings.append(("K8S_HOST_NAMESPACE", pod.lines[key]))
+
+        pod_context = _security_context(pod)
+        if pod_context and pod_context.get("runAsUser") == 0:
+            findings.append(("K8S_RUN_AS_ROOT", pod_context.lines["runAsUser"]))
+
+        containers = [c for key in ("initContainers", "containers") for c in (pod.get(key) or []) if isinstance(c, Mapping)]
+        for container in containers:
+            context = _security_context(container)
+            if context and context.get("privileged") is True:
+                findings.append(("K8S_PRIVILEGED", context.lines["privileged"]))
+            if context and context.get("runAsUser") == 0:
+                findings.append(("K8S_RUN_AS_ROOT", context.lines["runAsUser"]))
+            if _image_unpinned(container.get("image")):
+                findings.append(("K8S_LATEST", container.lines["image"]))
+    return findings
+
+
+# --- Verificações ----------------------------------------------------------------
+
+CHECKS = {
+    "DOCKER_LATEST": ("Docker: Avoid using ':latest' tag", "MEDIO"),
+    "DOCKER_SSH": ("Docker: SSH Port 22 exposed", "CRITICO"),
+    "DOCKER_ROOT": ("Docker: Running as Root (User not defined)", "ALTO"),
+    "AWS_OPEN_SG": ("IaC: Security Group open to world (0.0.0.0/0)", "CRITICO"),
+    "UNENCRYPTED_S3": ("IaC: S3 Bucket might be unencrypted", "ALTO"),
+    "TF_PUBLIC_S3_ACL": ("IaC: S3 Bucket with public ACL", "ALTO"),
+    "TF_PUBLIC_DB": ("IaC: Database publicly accessible", "ALTO"),
+    "K8S_PRIVILEGED": ("K8s: Privileged container", "CRITICO"),
+    "K8S_HOST_NAMESPACE": ("K8s: Pod shares host network/PID/IPC namespace", "ALTO"),
+    "K8S_RUN_AS_ROOT": ("K8s: Container runs as root (runAsUser: 0)", "ALTO"),
+    "K8S_LATEST": ("K8s: Image without a pinned tag (latest)", "MEDIO"),
+}
+
+
+def _dockerfile_findings(instructions):
+    findings = []
+    users = []
+    for instruction in instructions:
+        if instruction.keyword == "FROM" and _from_latest(instruction):
+            findings.append(("DOCKER_LATEST", instruction.line))
+        elif instruction.keyword == "EXPOSE" and _exposes_ssh(instruction):
+            findings.append(("DOCKER_SSH", instruction.line))
+        elif instruction.keyword == "USER":
+            users.append(instruction)
+    if not users:
+        findings.append(("DOCKER_ROOT", 1, "N/A"))
+    elif users[-1].args.split(":")[0] in ("root", "0"):
+        findings.append(("DOCKER_ROOT", users[-1].line))
+    return findings
+
+
+PARSERS = {
+    "dockerfile": (parse_dockerfile, _dockerfile_findings),
+    "terraform": (parse_terraform, _terraform_findings),
+    "yaml": (parse_manifests, _k8s_findings),
+}
+
 
 class IaCScanner:
-    def scan_dockerfile(self, content, file_path):
+    def __init__(self, cache_size=PARSE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.parsed = {}  # (tipo, hash do conteúdo) -> forma estruturada
+
+    def parse(self, kind, buffer):
+        key = (kind, hashlib.blake2b(buffer.content.encode("utf-8", "surrogatepass"), digest_size=16).digest())
+        if key in self.parsed:
+            return self.parsed[key]
+        if len(self.parsed) >= self.cache_size:
+            self.parsed.clear()
+        parsed = self.parsed[key] = PARSERS[kind][0](buffer)
+        return parsed
+
+    def scan(self, content, file_path, kind=None):
+        """Issues de IaC do ficheiro (kind por omissão vem do nome: ver iac_kind)"""
+        kind = kind or iac_kind(os.path.basename(file_path))
+        if kind not in PARSERS:
+            return []
+        buffer = SourceBuffer.of(content)
+        parsed = self.parse(kind, buffer)
+        if parsed is None:
+            return []
+
         issues = []
-        lines = content.splitlines()
-        has_user = False
-        
-        for i, line in enumerate(lines, 1):
-            if line.strip().upper().startswith("USER"):
-                has_user = True
-            
-            # Check: Using 'latest' tag
-            if "FROM" in line.upper() and ":LATEST" in line.upper():
-                issues.append({
-                    "id": "DOCKER_LATEST",
-                    "file": file_path,
-                    "line": i,
-                    "name": "Docker: Avoid using ':latest' tag",
-                    "severity": "MEDIO",
-                    "snippet": line.strip()
-                })
-            
-            # Check: Exposing sensitive ports
-            if "EXPOSE 22" in line.upper():
-                issues.append({
-                    "id": "DOCKER_SSH",
-                    "file": file_path,
-                    "line": i,
-                    "name": "Docker: SSH Port 22 exposed",
-                    "severity": "CRITICO",
-                    "snippet": line.strip()
-                })
-
-        if not has_user:
+        # Cada verificação devolve (id, linha) ou (id, linha, snippet)
+        for check_id, line, *snippet in PARSERS[kind][1](parsed):
+            name, severity = CHECKS[check_id]
             issues.append({
-                "id": "DOCKER_ROOT",
+                "id": check_id,
                 "file": file_path,
-                "line": 1,
-                "name": "Docker: Running as Root (User not defined)",
-                "severity": "ALTO",
-                "snippet": "N/A"
+                "line": line,
+                "name": name,
+                "severity": severity,
+                "snippet": snippet[0] if snippet else buffer.line(line).strip()
             })
         return issues
 
+    def scan_dockerfile(self, content, file_path):
+        return self.scan(content, file_path, "dockerfile")
+
     def scan_terraform(self, content, file_path):
-        issues = []
-        lines = content.splitlines()
-        for i, line in enumerate(lines, 1):
-            # Check: AWS Security Group open to world
-            if "cidr_blocks" in line and "0.0.0.0/0" in line:
-                issues.append({
-                    "id": "AWS_OPEN_SG",
-                    "file": file_path,
-                    "line": i,
-                    "name": "IaC: Security Group open to world (0.0.0.0/0)",
-                    "severity": "CRITICO",
-                    "snippet": line.strip()
-                })
-            
-            # Check: Unencrypted S3 Bucket
-            if 'server_side_encryption_configuration' not in content and 'resource "aws_s3_bucket"' in content and i == 1:
-                 # Simplificação: avisa no topo se detetar bucket sem encriptação
-                 issues.append({
-                    "id": "UNENCRYPTED_S3",
-                    "file": file_path,
-                    "line": 1,
-                    "name": "IaC: S3 Bucket might be unencrypted",
-                    "severity": "ALTO",
-                    "snippet": "resource aws_s3_bucket"
-                })
-        return issues
\ No newline at end of file
+        return self.scan(content, file_path, "terraform")
+
+    def scan_kubernetes(self, content, file_path):
+        return self.scan(content, file_path, "yaml")
@@ -1,111 +1,268 @@
+import os
 import requests
-import hashlib
 import json
-from .security import decrypt_data
+from urllib3.exceptions import ConnectTimeoutError
+from datetime import datetime, timezone
+from .security import decrypt_data, issue_fingerprint
 import base64
+from array import array
+from bisect import bisect_left
 
 
+# Máximo de segredos desencriptados guardados por processo
+MAX_DECRYPTED = 1024
+
+# token Fernet -> texto desencriptado (só desencriptações bem-sucedidas)
+_decrypted = {}
+
+def decrypt_secret(token):
+    """
+    decrypt_data com memória: cada token Fernet é único, por isso editar uma integração
+    gera um token novo e a entrada antiga deixa simplesmente de ser usada.
+    Uma falha (None) não fica guardada: um problema temporário de chave ou configuração
+    não desativa a integração até o worker reiniciar.
+    """
+    value = _decrypted.get(token)
+    if value is None:
+        value = decrypt_data(token)
+        if value is None:
+            print("⚠️ Não foi possível desencriptar o segredo de uma integração")
+            return None
+        if len(_decrypted) >= MAX_DECRYPTED:
+            _decrypted.clear()
+        _decrypted[token] = value
+    return value
+
 def generate_issue_hash(issue):
     """Cria um ID único para o erro baseado no ficheiro e regra"""
     # Hash: filename + rule_id + snippet (limpo de espaços)
-    unique_str = f"{issue['file']}-{issue.get('id', 'unknown')}-{issue.get('snippet', '').strip()}"
-    return hashlib.sha256(unique_str.encode()).hexdigest()
+    return issue_fingerprint(issue['file'], issue.get('id', 'unknown'), issue.get('snippet', '')).hex()
+
+
+class SuppressionSet:
+    """
+    Hashes ignorados de uma org em forma compacta: os primeiros 64 bits de cada SHA-256,
+    num array ordenado (8 bytes por hash, em vez de ~110 de uma string hex num set).
+    Com centenas de milhares de hashes a verificação continua a ser uma pesquisa binária.
+    Hashes inválidos (não hex) são ignorados um a um: não desativam as restantes supressões.
+    """
+    __slots__ = ("keys",)
+
+    def __init__(self, hashes=()):
+        keys = set()
+        invalid = 0
+        for h in hashes:
+            if not h:
+                continue
+            try:
+                keys.add(int(h[:16], 16))
+            except (TypeError, ValueError):
+                invalid += 1
+        if invalid:
+            print(f"⚠️ {invalid} hashes ignorados inválidos (não são SHA-256 em hex)")
+        self.keys = array('Q', sorted(keys))
+
+    def __contains__(self, issue_hash):
+        key = int(issue_hash[:16], 16)
+        i = bisect_left(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key
+
+    def __len__(self):
+        return len(self.keys)
+
 
 def filter_ignored_issues(issues, ignored_hashes):
     """Remove issues que já foram marcados como ignorados"""
+    if not isinstance(ignored_hashes, SuppressionSet):
+        ignored_hashes = SuppressionSet(ignored_hashes)
     active_issues = []
     for issue in issues:
-        ihash = generate_issue_hash(issue)
-        issue['hash'] = ihash # Adiciona o hash ao objeto para o frontend usar
-        if ihash not in ignored_hashes:
+        # O hash já vem calculado no scan (Issue.dict()); só dicts antigos precisam dele aqui
+        ihash = issue.get('hash')
+        if ihash is None:
+            ihash = issue['hash'] = generate_issue_hash(issue) # Adiciona o hash ao objeto para o frontend usar
+        if not ignored_hashes or ihash not in ignored_hashes:
             active_issues.append(issue)
     return active_issues
 
+# Timeouts por endpoint (ligação, leitura) e ligações mantidas por host
+INTEGRATION_TIMEOUT = (float(os.getenv("INTEGRATION_CONNECT_TIMEOUT", "3")), float(os.getenv("INTEGRATION_READ_TIMEOUT", "10")))
+INTEGRATION_POOL_SIZE = int(os.getenv("INTEGRATION_POOL_SIZE", "16"))
+
+# Entregas falhadas de vez ficam numa lista Redis (as mais recentes primeiro)
+DEAD_LETTER_REDIS_URL = os.getenv("DEAD_LETTER_REDIS_URL", os.getenv("CELERY_BROKER_URL"))
+DEAD_LETTER_KEY = "sentinel:integrations:dead_letter"
+DEAD_LETTER_MAX = 1000
+
+# Criar um ticket Jira não é idempotente: só se repete quando o pedido de certeza não foi
+# processado (ligação falhada, 429 ou 503). Timeouts de leitura e 5xx vão para a dead-letter.
+JIRA_RETRY_STATUS = {429, 503}
+
+# Sessão HTTP partilhada pelo processo (pool de ligações keep-alive)
+_session = requests.Session()
+_adapter = requests.adapters.HTTPAdapter(pool_connections=INTEGRATION_POOL_SIZE, pool_maxsize=INTEGRATION_POOL_SIZE)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+
+class DeliveryError(Exception):
+    """Falha ao entregar uma integração; transient=True quando vale a pena repetir"""
+    def __init__(self, message, transient=True):
+        super().__init__(message)
+        self.transient = transient
+
+
+def report_digest(report):
+    """Só o que as integrações usam do relatório (o relatório completo não passa pela fila)"""
+    return {"summary": report['summary'], "total_issues": report['total_issues']}
+
+
+def wants_delivery(integration, report):
+    if not integration.get('enabled'):
+        return False
+    if integration['type'] == 'webhook':
+        return True
+    # Só cria ticket se houver erros CRÍTICOS e o scan falhou
+    return integration['type'] == 'jira' and report['summary']['critical'] > 0
+
+
+def webhook_request(integration, report):
+    """(url, kwargs do POST) do webhook, ou None se não estiver configurado"""
+    config = integration['config']
+    # Nota: O config vem como dict do Supabase (JSONB)
+    # Se url_encrypted não existir, tentamos url (legado)
+    url_enc = config.get('url_encrypted')
+    url = decrypt_secret(url_enc) if url_enc else config.get('url')
+    if not url:
+        return None
+    payload = {
+        "event": "scan_completed",
+        "status": "failed" if report['summary']['critical'] > 0 else "passed",
+        "summary": report['summary'],
+        "total_issues": report['total_issues']
+    }
+    return url, {"json": payload}
+
+
+def jira_request(integration, report):
+    """(url, kwargs do POST) para criar o ticket no Jira, ou None se faltarem credenciais"""
+    config = integration['config']
+
+    # Decriptar credenciais
+    domain = config.get('domain') # ex: sua-empresa.atlassian.net
+    email = config.get('email')
+    token = decrypt_secret(config.get('token_encrypted'))
+    project_key = config.get('project_key') # ex: SEC
+
+    if not (domain and email and token and project_key): return None
+
+    url = f"https://{domain}/rest/api/3/issue"
+    auth_str = f"{email}:{token}"
+    auth_base64 = base64.b64encode(auth_str.encode()).decode()
+
+    headers = {
+        "Authorization": f"Basic {auth_base64}",
+        "Content-Type": "application/json"
+    }
+
+    # Criar descrição do ticket
+    description = {
+        "type": "doc",
+        "version": 1,
+        "content": [
+            {
+                "type": "paragraph",
+                "content": [
+                    {"type": "text", "text": f"Sentinel encontrou {report['total_issues']} vulnerabilidades."}
+                ]
+            }
+        ]
+    }
+
+    payload = {
+        "fields": {
+            "project": {"key": project_key},
+            "summary": f"[Sentinel] Security Alert: {report['summary']['critical']} Critical Issues Found",
+            "description": description,
+            "issuetype": {"name": "Bug"},
+            "priority": {"name": "High"}
+        }
+    }
+    return url, {"json": payload, "headers": headers}
+
+
+def never_sent(exc):
+    """True se o pedido falhou antes de chegar ao servidor (DNS, ligação recusada, timeout de ligação)"""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    # Um ConnectionError também cobre ligações cortadas a meio da resposta: aí o pedido já foi enviado
+    cause = exc.args[0] if exc.args else None
+    return isinstance(exc, requests.ConnectionError) and isinstance(getattr(cause, "reason", None), ConnectTimeoutError)
+
+
+def deliver(integration, report):
+    """Entrega uma integração (webhook ou Jira); lança DeliveryError se falhar"""
+    build = webhook_request if integration['type'] == 'webhook' else jira_request
+    request = build(integration, report)
+    if request is None:
+        raise DeliveryError(f"{integration['type']} sem configuração válida", transient=False)
+    url, kwargs = request
+    jira = integration['type'] == 'jira'
+    try:
+        resp = _session.post(url, timeout=INTEGRATION_TIMEOUT, **kwargs)
+    except requests.RequestException as e:
+        raise DeliveryError(f"{type(e).__name__}: {e}", transient=not jira or never_sent(e))
+    if resp.status_code >= 400:
+        # 429 e 5xx são temporários; outros 4xx (credenciais, payload) não melhoram com retries
+        if jira:
+            transient = resp.status_code in JIRA_RETRY_STATUS
+        else:
+            transient = resp.status_code == 429 or resp.status_code >= 500
+        raise DeliveryError(f"HTTP {resp.status_code}: {resp.text[:200]}", transient=transient)
+    if integration['type'] == 'jira':
+        print(f"✅ Jira ticket created: {resp.json().get('key')}")
+    else:
+        print(f"Webhook sent to {url}")
+    return resp.status_code
+
+
+def record_dead_letter(integration, report, error, attempts):
+    """Guarda a entrega falhada (sem segredos) para análise/reenvio manual"""
+    entry = {
+        "integration_id": integration.get('id'),
+        "org_id": integration.get('org_id'),
+        "type": integration.get('type'),
+        "error": str(error),
+        "attempts": attempts,
+        "failed_at": datetime.now(timezone.utc).isoformat(),
+        "report": report
+    }
+    print(f"❌ Integration dead-lettered: {entry['type']} {entry['integration_id']} ({error})")
+    if not DEAD_LETTER_REDIS_URL:
+        return
+    try:
+        import redis
+        client = redis.Redis.from_url(DEAD_LETTER_REDIS_URL, socket_timeout=2)
+        client.lpush(DEAD_LETTER_KEY, json.dumps(entry))
+        client.ltrim(DEAD_LETTER_KEY, 0, DEAD_LETTER_MAX - 1)
+    except Exception as e:
+        print(f"Dead-letter store unavailable: {e}")
+
+
 def trigger_webhooks(org_integrations, report):
-    """Envia o relatório para os Webhooks configurados pela empresa"""
+    """Envia o relatório para os Webhooks configurados pela empresa (entrega direta, sem fila)"""
     for integration in org_integrations:
-        if integration['type'] == 'webhook' and integration['enabled']:
+        if integration['type'] == 'webhook' and wants_delivery(integration, report):
             try:
-                # Decriptar URL
-                config = integration['config'] 
-                # Nota: O config vem como dict do Supabase (JSONB)
-                # Se url_encrypted não existir, tentamos url (legado)
-                url_enc = config.get('url_encrypted')
-                url = decrypt_data(url_enc) if url_enc else config.get('url')
-                
-                if url:
-                    payload = {
-                        "event": "scan_completed",
-                        "status": "failed" if report['summary']['critical'] > 0 else "passed",
-                        "summary": report['summary'],
-                        "total_issues": report['total_issues']
-                    }
-                    requests.post(url, json=payload, timeout=5)
-                    print(f"Webhook sent to {url}")
+                deliver(integration, report)
             except Exception as e:
                 print(f"Webhook failed: {e}")
 
 def create_jira_ticket(org_integrations, report):
-    """Cria ticket no Jira se houver vulnerabilidades críticas"""
-    
-    # Só cria ticket se houver erros CRÍTICOS e o scan falhou
-    if report['summary']['critical'] == 0:
-        return
-
+    """Cria ticket no Jira se houver vulnerabilidades críticas (entrega direta, sem fila)"""
     for integration in org_integrations:
-        if integration['type'] == 'jira' and integration['enabled']:
+        if integration['type'] == 'jira' and wants_delivery(integration, report):
             try:
-                config = integration['config']
-                
-                # Decriptar credenciais
-                domain = config.get('domain') # ex: sua-empresa.atlassian.net
-                email = config.get('email')
-                token = decrypt_data(config.get('token_encrypted'))
-                project_key = config.get('project_key') # ex: SEC
-                
-                if not (domain and email and token and project_key): continue
-
-                url = f"https://{domain}/rest/api/3/issue"
-                auth_str = f"{email}:{token}"
-                auth_base64 = base64.b64encode(auth_str.encode()).decode()
-
-                headers = {
-                    "Authorization": f"Basic {auth_base64}",
-                    "Content-Type": "application/json"
-                }
-
-                # Criar descrição do ticket
-                description = {
-                    "type": "doc",
-                    "version": 1,
-                    "content": [
-                        {
-                            "type": "paragraph",
-                            "content": [
-                                {"type": "text", "text": f"Sentinel encontrou {report['total_issues']} vulnerabilidades."}
-                            ]
-                        }
-                    ]
-                }
-
-                payload = {
-                    "fields": {
-                        "project": {"key": project_key},
-                        "summary": f"[Sentinel] Security Alert: {report['summary']['critical']} Critical Issues Found",
-                        "description": description,
-                        "issuetype": {"name": "Bug"},
-                        "priority": {"name": "High"}
-                    }
-                }
-
-                # Verificar se já existe ticket aberto recentemente para evitar duplicados (Opcional/Avançado)
-                # Por agora, enviamos sempre:
-                resp = requests.post(url, json=payload, headers=headers)
-                
-                if resp.status_code == 201:
-                    print(f"✅ Jira ticket created: {resp.json().get('key')}")
-                else:
-                    print(f"❌ Jira error: {resp.text}")
-
+                deliver(integration, report)
             except Exception as e:
-                print(f"Jira integration failed: {e}")
\ No newline at end of file
+                print(f"Jira integration failed: {e}")
@@ -0,0 +1,162 @@
+"""
+Parsers de lockfiles em streaming, linha a linha: nenhum constrói a árvore completa do
+ficheiro (um package-lock.json de 30 MB com json.loads ocupa centenas de MB em dicts).
+Todos aproveitam o formato que as ferramentas escrevem (JSON indentado, YAML/TOML com
+uma chave por linha) e devolvem (ecossistema, pacote, versão, linha, snippet).
+"""
+import re
+from .dispatch import file_key
+
+# "chave": { ou "chave": [  (abre um objeto/lista com a chave no caminho)
+JSON_OPEN = re.compile(r'^\s*(?:"((?:[^"\\]|\\.)*)"\s*:\s*)?[\{\[]\s*$')
+JSON_VERSION = re.compile(r'^\s*"version"\s*:\s*"([^"]*)"')
+
+YARN_VERSION = re.compile(r'^\s+version:?\s+"?([^"\s]+)"?')
+TOML_STRING = re.compile(r'^(name|version)\s*=\s*"([^"]*)"')
+
+# lockfile pnpm v5: /nome/versão_peers ou /@scope/nome/versão_peers
+PNPM_V5 = re.compile(r"^((?:@[^/]+/)?[^/@]+)/(\d[^_/]*)")
+
+
+def _json_versions(lines):
+    """(caminho de chaves do objeto, versão, linha onde o objeto abre) para cada "version" """
+    stack = []  # (chave, linha)
+    for line_num, line in lines:
+        # Testes baratos antes das regex: a maioria das linhas é "chave": "valor",
+        end = line.rstrip()[-1:]
+        if end == "{" or end == "[":
+            m = JSON_OPEN.match(line)
+            if m:
+                stack.append((m.group(1), line_num))
+                continue
+        if line.lstrip()[:1] in ("}", "]"):
+            if stack:
+                stack.pop()
+            continue
+        if '"version"' in line and stack:
+            m = JSON_VERSION.match(line)
+            if m:
+                yield [key for key, _ in stack], m.group(1), stack[-1][1]
+
+
+def parse_package_lock(lines):
+    """package-lock.json / npm-shrinkwrap.json (v1: dependencies aninhadas; v2/v3: packages)"""
+    for path, version, line_num in _json_versions(lines):
+        if len(path) >= 3 and path[-2] == "packages":
+            # "node_modules/a/node_modules/@scope/b" -> "@scope/b" ("" é o próprio projeto)
+            name = path[-1].rpartition("node_modules/")[2]
+            if not name or "node_modules/" not in path[-1]:
+                continue
+        elif len(path) >= 3 and path[-2] == "dependencies":
+            name = path[-1]
+        else:
+            continue
+        yield "npm", name, version, line_num, f'"{name}": "{version}"'
+
+
+def parse_pipfile_lock(lines):
+    for path, version, line_num in _json_versions(lines):
+        if len(path) == 3 and path[1] in ("default", "develop"):
+            name = path[2]
+            version = version.lstrip("=")
+            yield "PyPI", name, version, line_num, f"{name}=={version}"
+
+
+def _yarn_name(spec):
+    """'@babel/core@^7.0.0' ou '@babel/core@npm:^7.0.0' -> '@babel/core'"""
+    spec = spec.strip().strip('"')
+    at = spec.find("@", 1)
+    return spec[:at] if at > 0 else spec
+
+
+def parse_yarn_lock(lines):
+    """yarn.lock v1 (version "x") e Berry (version: x)"""
+    header = None
+    for line_num, line in lines:
+        if not line or line.startswith("#"):
+            continue
+        if not line[0].isspace():
+            line = line.rstrip()
+            header = (line[:-1], line_num) if line.endswith(":") else None
+            continue
+        if header is None:
+            continue
+        m = YARN_VERSION.match(line)
+        if m:
+            specs, header_line = header
+            header = None
+            first = specs.split(",")[0]
+            # Pacotes do próprio workspace ou ligados localmente não vêm de nenhum registo
+            if first.strip('"') == "__metadata" or any(tag in specs for tag in ("@workspace:", "@link:", "@portal:", "@file:")):
+                continue
+            name = _yarn_name(first)
+            yield "npm", name, m.group(1), header_line, f"{name}@{m.group(1)}"
+
+
+def _pnpm_package(key):
+    """'/lodash/4.17.21', '/lodash@4.17.21', 'lodash@4.17.21(react@18)' ou '/@types/node@20.1.0' -> (nome, versão)"""
+    key = key.strip().strip("'\"").lstrip("/").split("(")[0]
+    m = PNPM_V5.match(key)
+    if m:
+        return m.group(1), m.group(2)
+    at = key.find("@", 1)
+    if at > 0:
+        return key[:at], key[at + 1:]
+    return None, None
+
+
+def parse_pnpm_lock(lines):
+    in_packages = False
+    for line_num, line in lines:
+        if not line or line.lstrip().startswith("#"):
+            continue
+        if not line[0].isspace():
+            in_packages = line.rstrip() == "packages:"
+            continue
+        # Chaves dos pacotes: exatamente dois espaços de indentação
+        if in_packages and line.startswith("  ") and not line[2].isspace() and line.rstrip().endswith(":"):
+            name, version = _pnpm_package(line.rstrip()[:-1])
+            if name and version and not version.startswith(("link:", "file:")):
+                yield "npm", name, version, line_num, f"{name}@{version}"
+
+
+def parse_poetry_lock(lines):
+    """poetry.lock: name/version de cada [[package]] (as subtabelas [package.*] são ignoradas)"""
+    in_package = False
+    name = version = None
+    name_line = 0
+    for line_num, line in lines:
+        if line.startswith("["):
+            in_package = line.strip() == "[[package]]"
+            name = version = None
+            continue
+        if not in_package:
+            continue
+        m = TOML_STRING.match(line)
+        if not m:
+            continue
+        if m.group(1) == "name":
+            name, name_line = m.group(2), line_num
+        else:
+            version = m.group(2)
+        if name and version:
+            yield "PyPI", name, version, name_line, f"{name}=={version}"
+            in_package = False
+
+
+LOCKFILE_PARSERS = {
+    "package-lock.json": parse_package_lock,
+    "npm-shrinkwrap.json": parse_package_lock,
+    "yarn.lock": parse_yarn_lock,
+    "pnpm-lock.yaml": parse_pnpm_lock,
+    "poetry.lock": parse_poetry_lock,
+    "Pipfile.lock": parse_pipfile_lock,
+}
+
+# Mesmo nome normalizado que o despacho usa (Package-Lock.json também é um lockfile)
+_PARSERS_BY_KEY = {name.lower(): parser for name, parser in LOCKFILE_PARSERS.items()}
+
+
+def lockfile_parser(file_path):
+    """Parser do lockfile pelo nome do ficheiro, ou None"""
+    return _PARSERS_BY_KEY.get(file_key(file_path))
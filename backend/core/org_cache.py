@@ -0,0 +1,134 @@
+"""Cache por org (hashes ignorados, integrações) usada no finalize_report"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Validade das entradas (segundos) e número máximo de entradas em memória (LRU)
+# Curta: é o atraso máximo até um issue ignorado ou uma integração alterada ser visto
+ORG_CACHE_TTL = int(os.getenv("ORG_CACHE_TTL", "30"))
+ORG_CACHE_SIZE = int(os.getenv("ORG_CACHE_SIZE", "1024"))
+
+# Redis partilhado (ex: redis://redis:6379/1); sem isto a cache é só do processo
+ORG_CACHE_REDIS_URL = os.getenv("ORG_CACHE_REDIS_URL")
+
+# Tipos de dados em cache por org
+KINDS = ("ignored", "integrations")
+
+
+class OrgCache:
+    """
+    Cache por org dos dados lidos do Supabase em cada scan (hashes ignorados, integrações).
+    - Sem Redis: TTL + LRU em memória do processo; uma alteração é vista no máximo ao fim de ttl.
+    - Com Redis: os valores ficam no Redis (partilhados por todos os workers e pela API), por
+      isso invalidate() tem efeito imediato em todos os processos.
+    Os valores guardados têm de ser serializáveis em JSON; build() converte-os no objeto usado.
+    Com Redis, cada valor tem também uma etag (sentinel:org:<org>:<kind>:etag). O objeto já
+    construído fica na memória do processo com a etag de onde veio: enquanto a etag no Redis
+    não mudar, get() lê só a etag e não volta a descarregar nem a construir o valor
+    (ex: o SuppressionSet não é reordenado em cada relatório).
+    """
+    def __init__(self, ttl=ORG_CACHE_TTL, max_entries=ORG_CACHE_SIZE, redis_url=ORG_CACHE_REDIS_URL):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (kind, org_id) -> (expira_em, valor)
+        self.built = OrderedDict()    # (kind, org_id) -> (etag, valor construído), só com Redis
+        self._lock = threading.Lock()
+        self.redis = None
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=1)
+            except ImportError:
+                print("⚠️ Pacote redis não instalado: cache de orgs só em memória")
+
+    @staticmethod
+    def _redis_key(kind, org_id):
+        return f"sentinel:org:{org_id}:{kind}"
+
+    def get(self, kind, org_id, loader, build=None):
+        """Valor em cache ou loader() (que pode lançar exceção; nesse caso nada é guardado)"""
+        build = build or (lambda value: value)
+        if self.redis is not None:
+            return self._get_redis(kind, org_id, loader, build)
+
+        key = (kind, org_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                return entry[1]
+
+        value = build(loader())
+        with self._lock:
+            self.entries[key] = (now + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def _remember(self, key, etag, value):
+        with self._lock:
+            self.built[key] = (etag, value)
+            self.built.move_to_end(key)
+            while len(self.built) > self.max_entries:
+                self.built.popitem(last=False)
+        return value
+
+    def _get_redis(self, kind, org_id, loader, build):
+        key = (kind, org_id)
+        redis_key = self._redis_key(kind, org_id)
+        with self._lock:
+            local = self.built.get(key)
+        try:
+            etag = self.redis.get(f"{redis_key}:etag")
+            if etag is not None:
+                etag = etag.decode()
+                if local and local[0] == etag:
+                    return local[1]
+                cached = self.redis.get(redis_key)
+                if cached is not None and hashlib.sha1(cached).hexdigest() == etag:
+                    return self._remember(key, etag, build(json.loads(cached)))
+        except Exception as e:
+            # Redis indisponível: segue para a base de dados
+            print(f"⚠️ Org cache (Redis): {e}")
+            return build(loader())
+        value = loader()
+        data = json.dumps(value).encode()
+        etag = hashlib.sha1(data).hexdigest()
+        try:
+            # Valor e etag gravados juntos (MULTI): quem lê a etag encontra o valor correspondente
+            pipe = self.redis.pipeline()
+            pipe.set(redis_key, data, ex=self.ttl)
+            pipe.set(f"{redis_key}:etag", etag, ex=self.ttl)
+            pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Org cache (Redis): {e}")
+            return build(value)
+        return self._remember(key, etag, build(value))
+
+    def invalidate(self, org_id, kind=None):
+        """Chamar quando um issue é ignorado (kind='ignored') ou uma integração muda (kind='integrations')"""
+        kinds = (kind,) if kind else KINDS
+        with self._lock:
+            for k in kinds:
+                self.entries.pop((k, org_id), None)
+                self.built.pop((k, org_id), None)
+        if self.redis is not None:
+            try:
+                keys = [self._redis_key(k, org_id) for k in kinds]
+                self.redis.delete(*keys, *(f"{key}:etag" for key in keys))
+            except Exception as e:
+                print(f"⚠️ Org cache (Redis): {e}")
+
+
+# Instância partilhada pelo processo (workers e API)
+org_cache = OrgCache()
+
+
+def invalidate_org(org_id, kind=None):
+    """Para quem grava 'ignored_issues' ou 'integrations' (ex: /issues/ignore, /settings/webhook)"""
+    org_cache.invalidate(org_id, kind)
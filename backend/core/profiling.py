@@ -0,0 +1,100 @@
+import os
+import heapq
+from time import perf_counter
+
+# Número de ficheiros mais lentos guardados no perfil
+TOP_FILES = int(os.getenv("SCAN_PROFILE_TOP_FILES", "20"))
+
+# Workers do Celery: perfil em todos os scans (senão só com a policy "profile")
+SCAN_PROFILE = os.getenv("SCAN_PROFILE", "0") == "1"
+
+
+def profiling_enabled(policies=None):
+    return SCAN_PROFILE or bool((policies or {}).get("profile"))
+
+
+class ScanProfile:
+    """
+    Instrumentação opcional do scan: tempo e findings por fase (read, sca, iac, rules,
+    secrets), tempo/verificações/matches por regra e os N ficheiros mais lentos.
+    Os perfis dos processos do pool e dos shards do Celery juntam-se com merge().
+    """
+    def __init__(self, top_n=TOP_FILES):
+        self.top_n = top_n
+        self.stages = {}  # fase -> [segundos, chamadas, findings]
+        self.rules = {}   # regra -> [segundos, verificações, matches]
+        self.files = []   # heap (segundos, ficheiro) com os top_n mais lentos
+
+    def add_stage(self, name, seconds, findings=0):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = [0.0, 0, 0]
+        entry[0] += seconds
+        entry[1] += 1
+        entry[2] += findings
+
+    def add_rule(self, rule_id, seconds, checks=1, matches=0):
+        entry = self.rules.get(rule_id)
+        if entry is None:
+            entry = self.rules[rule_id] = [0.0, 0, 0]
+        entry[0] += seconds
+        entry[1] += checks
+        entry[2] += matches
+
+    def add_file(self, file_path, seconds):
+        item = (seconds, file_path)
+        if len(self.files) < self.top_n:
+            heapq.heappush(self.files, item)
+        elif item > self.files[0]:
+            heapq.heapreplace(self.files, item)
+
+    def merge(self, other):
+        """Junta outro perfil (ScanProfile ou o dict de to_dict())"""
+        if isinstance(other, ScanProfile):
+            other = other.to_dict()
+        for name, data in other["stages"].items():
+            entry = self.stages.setdefault(name, [0.0, 0, 0])
+            entry[0] += data["seconds"]
+            entry[1] += data["calls"]
+            entry[2] += data["findings"]
+        for data in other["rules"]:
+            self.add_rule(data["rule"], data["seconds"], data["checks"], data["matches"])
+        for data in other["slowest_files"]:
+            self.add_file(data["file"], data["seconds"])
+        return self
+
+    def to_dict(self):
+        """Secção 'perf' do relatório (serializável em JSON)"""
+        return {
+            "stages": {
+                name: {"seconds": round(seconds, 6), "calls": calls, "findings": findings}
+                for name, (seconds, calls, findings) in self.stages.items()
+            },
+            "rules": [
+                {"rule": rule_id, "seconds": round(seconds, 6), "checks": checks, "matches": matches}
+                for rule_id, (seconds, checks, matches) in sorted(self.rules.items(), key=lambda item: -item[1][0])
+            ],
+            "slowest_files": [
+                {"file": file_path, "seconds": round(seconds, 6)}
+                for seconds, file_path in sorted(self.files, reverse=True)
+            ],
+        }
+
+
+class timed:
+    """with timed(profile, 'fase') as t: ...; t.findings = n  (não faz nada se profile for None)"""
+    __slots__ = ("profile", "name", "start", "findings")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+        self.findings = 0
+
+    def __enter__(self):
+        if self.profile is not None:
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profile is not None:
+            self.profile.add_stage(self.name, perf_counter() - self.start, self.findings)
@@ -1,42 +1,167 @@
 import json
 import os
 from datetime import datetime
-from supabase import create_client, Client
+from .db import get_client, with_retry
 from dotenv import load_dotenv 
 
 load_dotenv()
 
-def generate_json_report(issues, output_file="report.json"):
-    # 1. Preparar os dados
-    report_data = {
-        "scan_timestamp": datetime.now().isoformat(),
-        "total_issues": len(issues),
-        "issues": issues,
-        "summary": {
-            "critical": len([i for i in issues if i['severity'] == 'CRITICO']),
-            "high": len([i for i in issues if i['severity'] == 'ALTO']),
-            "medium": len([i for i in issues if i['severity'] == 'MEDIO']),
+def skip_summary(skipped):
+    """Resumo dos ficheiros não analisados: total e contagem por motivo"""
+    return {"total": sum(skipped.values()), "reasons": dict(skipped)}
+
+# Formatos do relatório local
+REPORT_FORMATS = ("json", "ndjson", "sarif")
+
+# Severidade do issue -> chave do sumário
+SEVERITY_KEYS = {"CRITICO": "critical", "ALTO": "high", "MEDIO": "medium"}
+
+# Issues codificados e escritos em blocos deste tamanho
+FLUSH_EVERY = 1000
+
+# Marca o lugar do array de issues no esqueleto do documento
+ITEMS_MARKER = "\x00items\x00"
+
+class ReportWriter:
+    """
+    Escreve o relatório em streaming: cada issue é codificado e escrito à medida que chega
+    (em blocos), e o sumário por severidade é contado na mesma passagem.
+    - json: um objeto {"scan_timestamp", "issues": [...], "total_issues", "summary", ...}
+    - ndjson: um issue por linha e, na última linha, o sumário com "type": "summary"
+    indent=None gera JSON compacto (mais rápido e mais pequeno, para máquinas).
+    Subclasses mudam o documento com _skeleton() e cada issue com _record().
+    """
+    formats = ("json", "ndjson")
+
+    def __init__(self, output_file, fmt="json", indent=None):
+        if fmt not in self.formats:
+            raise ValueError(f"Formato de relatório desconhecido: {fmt}")
+        self.fmt = fmt
+        self.indent = indent if fmt != "ndjson" else None
+        self.encoder = json.JSONEncoder(ensure_ascii=False, indent=self.indent)
+        self.scan_timestamp = datetime.now().isoformat()
+        self.total_issues = 0
+        self.summary = {"critical": 0, "high": 0, "medium": 0}
+        self._chunk = []
+        self._file = open(output_file, 'w', encoding='utf-8')
+
+        if fmt != "ndjson":
+            head, self._item_prefix, _ = self._split_skeleton(self.metadata())
+            self._file.write(head)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._file.closed:
+            self._file.close()
+
+    def _skeleton(self, meta):
+        """Documento completo, com o array de issues reduzido ao marcador"""
+        return {"scan_timestamp": meta["scan_timestamp"], "issues": [ITEMS_MARKER],
+                **{key: value for key, value in meta.items() if key != "scan_timestamp"}}
+
+    def _record(self, data):
+        return data
+
+    def _split_skeleton(self, meta):
+        """(texto até ao '[' dos issues, prefixo de cada issue, texto a seguir ao último issue)"""
+        text = self.encoder.encode(self._skeleton(meta))
+        marker = self.encoder.encode(ITEMS_MARKER)
+        i = text.index(marker)
+        head = text[:i].rstrip(" \n")
+        return head, text[len(head):i], text[i + len(marker):]
+
+    def write(self, issue):
+        """Aceita um Issue ou um dict"""
+        data = issue if isinstance(issue, dict) else issue.dict()
+        key = SEVERITY_KEYS.get(data.get("severity"))
+        if key: self.summary[key] += 1
+        self._chunk.append(self._record(data))
+        if len(self._chunk) >= FLUSH_EVERY:
+            self.flush()
+
+    def write_many(self, issues):
+        for issue in issues:
+            self.write(issue)
+
+    def flush(self):
+        """Codifica o bloco pendente de uma só vez (encoder em C) e escreve-o"""
+        chunk = self._chunk
+        if not chunk:
+            return
+        if self.fmt == "ndjson":
+            text = "".join(self.encoder.encode(data) + "\n" for data in chunk)
+        else:
+            # Codifica o bloco como uma lista, reindentada ao nível do array, sem os parênteses retos
+            outer = self._item_prefix[:len(self._item_prefix) - self.indent] if self.indent else self._item_prefix
+            text = self.encoder.encode(chunk)
+            if outer:
+                text = text.replace("\n", outer)
+            text = text[1:len(text) - len(outer) - 1]
+            if self.total_issues:
+                text = ("," if self.indent is not None else ", ") + text
+        self._file.write(text)
+        self.total_issues += len(chunk)
+        chunk.clear()
+
+    def metadata(self, skipped=None, perf=None):
+        """Campos do relatório além da lista de issues"""
+        data = {
+            "scan_timestamp": self.scan_timestamp,
+            "total_issues": self.total_issues,
+            "summary": dict(self.summary),
         }
-    }
+        if skipped:
+            data["skipped_files"] = skip_summary(skipped)
+        if perf:
+            data["perf"] = perf
+        return data
+
+    def close(self, skipped=None, perf=None):
+        """Escreve o sumário e fecha o ficheiro; devolve os metadados do relatório"""
+        self.flush()
+        data = self.metadata(skipped, perf)
+        if self.fmt == "ndjson":
+            self._file.write(self.encoder.encode({"type": "summary", **data}) + "\n")
+        else:
+            _, _, tail = self._split_skeleton(data)
+            self._file.write(tail if self.total_issues else tail.lstrip(" \n"))
+        self._file.close()
+        return data
+
+def open_report(output_file, fmt="json", indent=None, rules=(), base_dir=None):
+    """ReportWriter para o formato pedido (SARIF precisa das regras e da raiz do scan)"""
+    if fmt == "sarif":
+        from .sarif import SarifWriter
+        return SarifWriter(output_file, indent=indent, rules=rules, base_dir=base_dir)
+    return ReportWriter(output_file, fmt=fmt, indent=indent)
 
-    # 2. Gravar localmente (Backup)
+def generate_json_report(issues, output_file="report.json", skipped=None, fmt="json", indent=4, rules=(), base_dir=None, perf=None):
+    """Aceita Issues ou dicts; o ficheiro local é escrito em streaming"""
+    # 1. Gravar localmente (Backup)
+    report_data = None
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(report_data, f, indent=4, ensure_ascii=False)
+        with open_report(output_file, fmt, indent, rules, base_dir) as writer:
+            writer.write_many(issues)
+            report_data = writer.close(skipped, perf)
         print(f"Relatório local salvo em {output_file}")
     except Exception as e:
         print(f"Erro local: {e}")
 
-    # 3. Enviar para o Supabase (Cloud)
+    # 2. Enviar para o Supabase (Cloud)
     # Só tenta enviar se tivermos as chaves configuradas
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_SERVICE_KEY")
 
     if url and key:
         try:
-            supabase: Client = create_client(url, key)
+            supabase = get_client(url, key)
+            # O payload do Supabase precisa da lista completa: só é construído aqui
+            report_data = report_data or {"total_issues": len(issues)}
+            report_data["issues"] = [i if isinstance(i, dict) else i.dict() for i in issues]
             # Inserir na tabela 'scans' na coluna 'report'
-            data = supabase.table("scans").insert({"report": report_data}).execute()
+            data = with_retry(supabase.table("scans").insert({"report": report_data}).execute)
             print("✅ Relatório enviado para o Supabase com sucesso!")
             return True
         except Exception as e:
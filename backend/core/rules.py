@@ -0,0 +1,454 @@
+import os
+import re
+import string
+from time import perf_counter
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# Motor de tempo linear opcional (pip install google-re2), usado nas regras assinaladas pelo lint
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# Literais mais curtos do que isto assinalam demasiadas linhas para servir de prefiltro
+MIN_LITERAL_LENGTH = 3
+
+# Regras com construções propensas a backtracking catastrófico:
+# warn = avisar (o orçamento por ficheiro protege o scan), strict = rejeitar a regra, off = não verificar
+REGEX_LINT = os.getenv("SENTINEL_REGEX_LINT", "warn")
+
+
+class CompiledRule:
+    """Regra do rules.yaml já normalizada e compilada"""
+    def __init__(self, index, id, name, severity, pattern, regex, description=None, languages=None, files=None):
+        self.index = index
+        self.id = id
+        self.name = name
+        self.severity = severity
+        self.description = description
+        self.pattern = pattern
+        self.regex = regex
+        self.languages = languages  # Linguagens a que a regra se aplica (None = todos os ficheiros)
+        self.files = files          # Nomes/globs de ficheiros a que a regra se aplica
+        self.literals = None        # Literais obrigatórios (qualquer match contém pelo menos um)
+        self.ignore_case = False    # Literais comparados sem distinguir maiúsculas
+        self.buffer_regex = None    # Versão MULTILINE, só para regras fora do prefiltro
+        self.unsafe = None          # Problemas encontrados pelo lint_pattern
+
+
+class LiteralPrefilter:
+    """Alternância de literais obrigatórios de várias regras, com o mapa literal -> regras"""
+    def __init__(self, rules, ignore_case=False):
+        self.rules = rules
+        self.ignore_case = ignore_case
+        literals = {lit for rule in rules for lit in rule.literals}
+        flags = re.IGNORECASE if ignore_case else 0
+        self.regex = re.compile("|".join(re.escape(lit) for lit in sorted(literals, key=len, reverse=True)), flags)
+
+    def candidates(self, line):
+        if self.ignore_case:
+            return self.rules
+        return [rule for rule in self.rules if any(lit in line for lit in rule.literals)]
+
+
+# Limite de combinações ao expandir alternâncias de literais (ex: AKIA|AGPA|...)
+MAX_LITERAL_EXPANSION = 64
+
+# Asserções de largura zero não interrompem uma sequência de literais
+ZERO_WIDTH = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT)
+
+
+def _best(*candidates):
+    """Escolhe o conjunto cujo literal mais curto é o mais longo"""
+    best = None
+    for candidate in candidates:
+        if candidate and (best is None or min(map(len, candidate)) > min(map(len, best))):
+            best = candidate
+    return best
+
+
+def _concat(left, right):
+    if left is None or right is None or len(left) * len(right) > MAX_LITERAL_EXPANSION:
+        return None
+    return {a + b for a in left for b in right}
+
+
+def _analyze_item(op, av):
+    """Devolve (strings exatas, prefixos obrigatórios, literais obrigatórios) de um nó"""
+    if op is sre_parse.LITERAL:
+        char = {chr(av)}
+        return char, char, char
+    if op in ZERO_WIDTH:
+        return {""}, {""}, None
+    if op is sre_parse.SUBPATTERN:
+        group, add_flags, del_flags, p = av
+        if add_flags & re.IGNORECASE:
+            return None, None, None
+        return _analyze(p)
+    if op is sre_parse.BRANCH:
+        results = [_analyze(alt) for alt in av[1]]
+        exact = set().union(*(r[0] for r in results)) if all(r[0] is not None for r in results) else None
+        prefixes = set().union(*(r[1] for r in results)) if all(r[1] for r in results) else None
+        required = set().union(*(r[2] for r in results)) if all(r[2] for r in results) else None
+        return exact, prefixes, required
+    if op is sre_parse.IN:
+        if len(av) <= MAX_LITERAL_EXPANSION and all(item_op is sre_parse.LITERAL for item_op, _ in av):
+            chars = {chr(value) for _, value in av}
+            return chars, chars, None
+        return None, None, None
+    if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+        min_count, max_count, p = av
+        if min_count >= 1:
+            exact, prefixes, required = _analyze(p)
+            return None, prefixes, _best(required, exact)
+    return None, None, None
+
+
+def _analyze(subpattern):
+    """
+    Analisa uma sequência: literais consecutivos (e alternâncias pequenas de literais)
+    são concatenados; quando a sequência é interrompida, a parte acumulada seguida dos
+    prefixos do nó seguinte continua a ser uma substring obrigatória de qualquer match.
+    """
+    run = {""}
+    prefixes = None
+    best = None
+    broken = False
+
+    for op, av in subpattern:
+        exact, item_prefixes, required = _analyze_item(op, av)
+        joined = _concat(run, exact)
+        if joined is not None:
+            run = joined
+            continue
+
+        joined = _concat(run, item_prefixes) or run
+        best = _best(best, joined, required)
+        if not broken:
+            prefixes = joined
+            broken = True
+        run = exact if exact is not None and len(exact) <= MAX_LITERAL_EXPANSION else {""}
+
+    best = _best(best, run)
+    if not broken:
+        return run, run, best
+    return None, prefixes, best
+
+
+def extract_literals(pattern):
+    """Literais obrigatórios de um padrão (None se a regra não puder usar o prefiltro)"""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None, False
+    literals = _analyze(parsed)[2]
+    if not literals or min(map(len, literals)) < MIN_LITERAL_LENGTH:
+        return None, False
+    # Um literal com newline nunca cabe numa linha
+    if any("\n" in lit for lit in literals):
+        return None, False
+    return literals, bool(parsed.state.flags & re.IGNORECASE)
+
+
+# Aproximação ASCII dos conjuntos de caracteres (chega para detetar sobreposições)
+ALL_CHARS = frozenset(range(128))
+CATEGORY_CHARS = {
+    sre_parse.CATEGORY_DIGIT: frozenset(map(ord, string.digits)),
+    sre_parse.CATEGORY_WORD: frozenset(map(ord, string.ascii_letters + string.digits + "_")),
+    sre_parse.CATEGORY_SPACE: frozenset(map(ord, " \t\n\r\f\v")),
+}
+CATEGORY_CHARS[sre_parse.CATEGORY_NOT_DIGIT] = ALL_CHARS - CATEGORY_CHARS[sre_parse.CATEGORY_DIGIT]
+CATEGORY_CHARS[sre_parse.CATEGORY_NOT_WORD] = ALL_CHARS - CATEGORY_CHARS[sre_parse.CATEGORY_WORD]
+CATEGORY_CHARS[sre_parse.CATEGORY_NOT_SPACE] = ALL_CHARS - CATEGORY_CHARS[sre_parse.CATEGORY_SPACE]
+
+# Intervalos maiores do que isto contam como "qualquer carácter"
+MAX_RANGE_CHARS = 1024
+
+
+def _class_chars(items):
+    chars = set()
+    negate = False
+    for op, av in items:
+        if op is sre_parse.NEGATE:
+            negate = True
+        elif op is sre_parse.LITERAL:
+            chars.add(av)
+        elif op is sre_parse.RANGE:
+            if av[1] - av[0] > MAX_RANGE_CHARS:
+                return ALL_CHARS
+            chars.update(range(av[0], av[1] + 1))
+        elif op is sre_parse.CATEGORY:
+            chars |= CATEGORY_CHARS.get(av, ALL_CHARS)
+        else:
+            return ALL_CHARS
+    return ALL_CHARS - chars if negate else frozenset(chars)
+
+
+def _first_chars(subpattern):
+    """Caracteres com que um match pode começar (ALL_CHARS quando não se sabe)"""
+    for op, av in subpattern:
+        if op in ZERO_WIDTH:
+            continue
+        if op is sre_parse.LITERAL:
+            return frozenset((av,))
+        if op is sre_parse.NOT_LITERAL:
+            return ALL_CHARS - {av}
+        if op is sre_parse.IN:
+            return _class_chars(av)
+        if op is sre_parse.SUBPATTERN:
+            return _first_chars(av[3])
+        if op is sre_parse.BRANCH:
+            return frozenset().union(*(_first_chars(alt) for alt in av[1]))
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            return _first_chars(av[2])
+        return ALL_CHARS
+    return ALL_CHARS
+
+
+def _variable_parts(subpattern):
+    """
+    Caracteres iniciais de cada parte de comprimento variável de um nó (a qualquer
+    profundidade): repetições como a+ e alternâncias como (|a), que é o que o sre_parse
+    faz de (a|aa) ao fatorizar o prefixo comum
+    """
+    for op, av in subpattern:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            if av[0] != av[1]:
+                yield _first_chars(av[2])
+            yield from _variable_parts(av[2])
+        elif op is sre_parse.SUBPATTERN:
+            yield from _variable_parts(av[3])
+        elif op is sre_parse.BRANCH:
+            alternatives = av[1]
+            if len({alt.getwidth() for alt in alternatives}) > 1:
+                yield frozenset().union(*(_first_chars(alt) for alt in alternatives if alt.getwidth()[1]))
+            for alt in alternatives:
+                yield from _variable_parts(alt)
+
+
+def _branches(subpattern):
+    """
+    Alternativas de cada alternância de um nó, a qualquer profundidade. O sre_parse fatoriza
+    o prefixo comum, por isso (a|a) aparece como a(|) e só se vê dentro da sequência.
+    """
+    for op, av in subpattern:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            yield from _branches(av[2])
+        elif op is sre_parse.SUBPATTERN:
+            yield from _branches(av[3])
+        elif op is sre_parse.BRANCH:
+            yield av[1]
+            for alt in av[1]:
+                yield from _branches(alt)
+
+
+def _ambiguous(alternatives):
+    """Duas alternativas que podem consumir o mesmo início (ou duas vazias)"""
+    seen = frozenset()
+    empty = False
+    for alt in alternatives:
+        if not alt.getwidth()[1]:
+            if empty:
+                return True
+            empty = True
+            continue
+        chars = _first_chars(alt)
+        if chars & seen:
+            return True
+        seen |= chars
+    return False
+
+
+def _lint(subpattern, problems):
+    previous = None  # Última repetição sem limite da sequência (para detetar adjacentes)
+    for op, av in subpattern:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            min_count, max_count, body = av
+            unbounded = max_count == sre_parse.MAXREPEAT
+            if unbounded:
+                starts = _first_chars(body)
+                # (a+)+: a repetição interior pode consumir o início da iteração seguinte
+                if any(chars & starts for chars in _variable_parts(body)):
+                    problems.append("quantificador aninhado (backtracking exponencial)")
+                # (a|a)*, (ab|a.)*: alternativas que começam pelos mesmos caracteres
+                if any(_ambiguous(alternatives) for alternatives in _branches(body)):
+                    problems.append("alternância ambígua dentro de um quantificador (backtracking exponencial)")
+                # \w+\w*: duas repetições seguidas sobre os mesmos caracteres
+                if previous is not None and _first_chars(body) & _first_chars(previous):
+                    problems.append("quantificadores adjacentes sobrepostos (backtracking polinomial)")
+                previous = body
+            else:
+                previous = None
+            _lint(body, problems)
+        elif op is sre_parse.SUBPATTERN:
+            previous = None
+            _lint(av[3], problems)
+        elif op is sre_parse.BRANCH:
+            previous = None
+            for alt in av[1]:
+                _lint(alt, problems)
+        elif op not in ZERO_WIDTH:
+            previous = None
+
+
+def lint_pattern(pattern):
+    """
+    Lint estático de uma regex: devolve a lista (sem repetidos) de construções propensas
+    a backtracking catastrófico. É uma heurística conservadora: pode assinalar padrões
+    que na prática são seguros, mas apanha os casos clássicos ((a+)+, (a|a)*, .*.*).
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    problems = []
+    _lint(parsed, problems)
+    return list(dict.fromkeys(problems))
+
+
+class RuleEngine:
+    """
+    Compila o conjunto de regras uma única vez.
+    De cada regra extrai-se um conjunto de literais obrigatórios; todos são fundidos numa
+    alternância de literais que serve de prefiltro sobre o buffer inteiro. Só as linhas
+    assinaladas são verificadas, e apenas com as regras cujos literais aparecem na linha.
+    """
+    def __init__(self, rules=None):
+        self.rules = []
+        for rule in self._normalize(rules):
+            pattern = rule.get('pattern') or rule.get('regex')
+            if not pattern:
+                continue
+            try:
+                regex = re.compile(pattern)
+            except re.error as e:
+                print(f"Regra inválida '{rule.get('id', 'UNKNOWN')}': {e}")
+                continue
+
+            problems = lint_pattern(pattern) if REGEX_LINT != "off" else None
+            if problems:
+                print(f"⚠️ Regra '{rule.get('id', 'UNKNOWN')}' pode bloquear o scan: {'; '.join(problems)}")
+                if REGEX_LINT == "strict":
+                    continue
+
+            compiled = CompiledRule(
+                index=len(self.rules),
+                id=rule.get('id', 'UNKNOWN'),
+                name=rule.get('name', 'Vulnerability Found'),
+                severity=rule.get('severity', 'MEDIO'),
+                pattern=pattern,
+                regex=regex,
+                description=rule.get('description'),
+                languages=self._selectors(rule.get('languages')),
+                files=self._selectors(rule.get('files'))
+            )
+            self.rules.append(compiled)
+            if problems:
+                compiled.unsafe = problems
+                compiled.regex = self._linear_regex(pattern) or regex
+
+            literals, ignore_case = extract_literals(pattern)
+            if literals:
+                compiled.literals = literals
+                compiled.ignore_case = ignore_case
+            else:
+                compiled.buffer_regex = re.compile(pattern, re.MULTILINE)
+        self._build_index()
+
+    def _build_index(self):
+        self.standalone = []  # Regras sem literais obrigatórios (verificadas individualmente)
+        self.prefilters = []
+        grouped = {False: [], True: []}
+        for compiled in self.rules:
+            if compiled.literals:
+                grouped[compiled.ignore_case].append(compiled)
+            else:
+                self.standalone.append(compiled)
+        for ignore_case, group in grouped.items():
+            if group:
+                self.prefilters.append(LiteralPrefilter(group, ignore_case))
+
+    def subset(self, rules):
+        """Motor só com algumas das regras já compiladas (sem recompilar nem voltar a fazer o lint)"""
+        engine = RuleEngine.__new__(RuleEngine)
+        engine.rules = sorted(rules, key=lambda rule: rule.index)
+        engine._build_index()
+        return engine
+
+    @staticmethod
+    def _linear_regex(pattern):
+        """Versão RE2 (tempo linear) para confirmar a regra linha a linha, se o motor existir"""
+        if re2 is None:
+            return None
+        try:
+            return re2.compile(pattern)
+        except Exception:
+            # Backreferences/lookarounds não existem no RE2: fica o re (protegido pelo orçamento)
+            return None
+
+    @staticmethod
+    def _selectors(value):
+        """languages/files de uma regra: string ou lista -> tuplo (None = sem restrição)"""
+        if not value:
+            return None
+        if isinstance(value, str):
+            value = [value]
+        return tuple(str(item).lower() for item in value)
+
+    @staticmethod
+    def _normalize(rules):
+        """Aceita tanto uma lista de regras como o formato {'rules': [...]} do rules.yaml"""
+        if not rules:
+            return []
+        if isinstance(rules, dict):
+            rules = rules.get('rules') or []
+        return [r for r in rules if isinstance(r, dict)]
+
+    def scan(self, buffer, max_line_length=None, profile=None):
+        """
+        Percorre o buffer inteiro e devolve [(line_num, line, [regras])] por ordem de linha.
+        O prefiltro assinala as linhas candidatas; cada regra só é confirmada nessas linhas.
+        Com um ScanProfile, o tempo do prefiltro e de cada regra fica registado por id.
+        """
+        to_check = {}
+        for prefilter in self.prefilters:
+            start = perf_counter() if profile is not None else 0
+            flagged = 0
+            for line_num in buffer.find_lines(prefilter.regex, max_line_length):
+                to_check.setdefault(line_num, set()).update(prefilter.candidates(buffer.line(line_num)))
+                flagged += 1
+            if profile is not None:
+                name = "<prefilter:ignorecase>" if prefilter.ignore_case else "<prefilter>"
+                profile.add_rule(name, perf_counter() - start, 1, flagged)
+        for rule in self.standalone:
+            start = perf_counter() if profile is not None else 0
+            for line_num in buffer.find_lines(rule.buffer_regex, max_line_length):
+                to_check.setdefault(line_num, set()).add(rule)
+            if profile is not None:
+                # Passagem pelo buffer inteiro: os matches contam-se na confirmação abaixo
+                profile.add_rule(rule.id, perf_counter() - start, 0, 0)
+
+        results = []
+        for line_num in sorted(to_check):
+            line = buffer.line(line_num)
+            candidates = sorted(to_check[line_num], key=lambda rule: rule.index)
+            if profile is None:
+                matched = [rule for rule in candidates if rule.regex.search(line)]
+            else:
+                matched = []
+                for rule in candidates:
+                    start = perf_counter()
+                    hit = rule.regex.search(line)
+                    profile.add_rule(rule.id, perf_counter() - start, 1, 1 if hit else 0)
+                    if hit:
+                        matched.append(rule)
+            if matched:
+                results.append((line_num, line, matched))
+        return results
+
+    def __len__(self):
+        return len(self.rules)
@@ -0,0 +1,94 @@
+import os
+from urllib.parse import quote
+from .report import ReportWriter, ITEMS_MARKER
+from .scanner import SCANNER_VERSION
+
+SARIF_VERSION = "2.1.0"
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+TOOL_NAME = "SentinelScan"
+TOOL_URI = "https://github.com/miguelaopt/Sentinel"
+
+# Severidade do Sentinel -> nível SARIF e security-severity (escala CVSS usada pelo GitHub)
+SARIF_LEVELS = {"CRITICO": "error", "ALTO": "error", "MEDIO": "warning"}
+SECURITY_SEVERITY = {"CRITICO": "9.5", "ALTO": "7.5", "MEDIO": "5.0"}
+
+
+class SarifWriter(ReportWriter):
+    """
+    Relatório SARIF 2.1.0 (upload para GitHub code scanning) escrito em streaming.
+    Cada regra aparece uma única vez em tool.driver.rules e os resultados referem-na
+    pelo índice (ruleIndex). Os descritores são escritos no fim, depois dos resultados,
+    para incluir também as regras que só aparecem durante o scan (SCA, IaC, segredos).
+    """
+    formats = ("sarif",)
+
+    def __init__(self, output_file, indent=None, rules=(), base_dir=None):
+        self.base_dir = base_dir
+        self.descriptors = []
+        self.rule_indexes = {}
+        # Regras do rules.yaml primeiro, pela ordem de declaração (índices estáveis entre scans)
+        for rule in rules:
+            self._rule_index(rule.id, rule.name, rule.severity, rule.description)
+        super().__init__(output_file, fmt="sarif", indent=indent)
+
+    def _rule_index(self, rule_id, name, severity, description=None):
+        index = self.rule_indexes.get(rule_id)
+        if index is None:
+            index = self.rule_indexes[rule_id] = len(self.descriptors)
+            descriptor = {
+                "id": rule_id,
+                "name": name,
+                "shortDescription": {"text": name},
+                "defaultConfiguration": {"level": SARIF_LEVELS.get(severity, "note")},
+                "properties": {"tags": ["security"], "security-severity": SECURITY_SEVERITY.get(severity, "3.0")},
+            }
+            if description:
+                descriptor["fullDescription"] = {"text": description}
+            self.descriptors.append(descriptor)
+        return index
+
+    def _uri(self, file_path):
+        """Caminho relativo à raiz do scan, com '/' (o GitHub resolve-o a partir da raiz do repositório)"""
+        path = file_path or ""
+        if self.base_dir and path:
+            relative = os.path.relpath(path, self.base_dir)
+            if not relative.startswith(".."):
+                path = relative
+        return quote(path.replace(os.sep, "/"))
+
+    def _skeleton(self, meta):
+        return {
+            "$schema": SARIF_SCHEMA,
+            "version": SARIF_VERSION,
+            "runs": [{
+                "results": [ITEMS_MARKER],
+                "tool": {"driver": {
+                    "name": TOOL_NAME,
+                    "version": SCANNER_VERSION,
+                    "informationUri": TOOL_URI,
+                    "rules": self.descriptors,
+                }},
+                "properties": meta,
+            }],
+        }
+
+    def _record(self, data):
+        severity = data["severity"]
+        location = {"artifactLocation": {"uri": self._uri(data["file"])}}
+        message = data["name"]
+        if data["line"]:
+            location["region"] = {"startLine": data["line"], "snippet": {"text": data["snippet"]}}
+        elif data["snippet"]:
+            # Findings sem linha (compliance) referem-se ao projeto: o detalhe vai na mensagem
+            message = f"{message}: {data['snippet']}"
+        result = {
+            "ruleId": data["id"],
+            "ruleIndex": self._rule_index(data["id"], data["name"], severity),
+            "level": SARIF_LEVELS.get(severity, "note"),
+            "message": {"text": message},
+            "locations": [{"physicalLocation": location}],
+        }
+        if data.get("hash"):
+            # Mesmo hash que o dashboard usa para ignorar issues
+            result["partialFingerprints"] = {"sentinelIssueHash/v1": data["hash"]}
+        return result
@@ -1,57 +1,89 @@
 import json
 import re
+from .buffer import SourceBuffer
+from .advisories import AdvisoryDB
+from .lockfiles import lockfile_parser
+from .sca_cache import ResolutionCache
+
+PINNED = re.compile("==")
+
+# Ordem das severidades (a do issue é a do advisory mais grave)
+SEVERITY_ORDER = {"CRITICO": 3, "ALTO": 2, "MEDIO": 1}
 
 class SCAScanner:
-    def __init__(self):
-        # Em produção, isto ligaria a uma DB de CVEs (ex: OSV.dev API)
-        # Para demo/MVP, usamos uma lista de "bad versions" conhecidas
-        self.vulnerable_packages = {
-            "axios": ["0.21.1", "0.19.0"],
-            "lodash": ["4.17.15", "4.17.11"],
-            "requests": ["2.20.0"],
-            "django": ["3.2.0", "2.2.0"],
-            "react": ["16.8.0"]
-        }
+    def __init__(self, advisories=None, cache=None):
+        # Base de dados OSV compilada (core/advisories.py), aberta só na primeira consulta
+        self.advisories = advisories or AdvisoryDB()
+        # (ecossistema, pacote, versão) -> advisories: cada dependência é resolvida uma vez,
+        # mesmo que apareça em muitos ficheiros, scans ou orgs (com Redis)
+        self.cache = cache or ResolutionCache()
+
+    def resolve(self, ecosystem, pkg, version):
+        key = (ecosystem, pkg, version)
+        return self.cache.resolve_many(self.advisories, [key])[key]
+
+    def _issues(self, candidates, file_path):
+        """candidates: (ecossistema, pacote, versão, linha, snippet); resolvidos todos de uma vez"""
+        verdicts = self.cache.resolve_many(self.advisories, [c[:3] for c in candidates])
+        issues = []
+        for ecosystem, pkg, version, line, snippet in candidates:
+            found = verdicts[(ecosystem, pkg, version)]
+            if found:
+                issues.append({
+                    "id": "VULNERABLE_DEP",
+                    "file": file_path,
+                    "line": line,
+                    "name": f"SCA: {pkg} v{version} is vulnerable ({', '.join(a.id for a in found)})",
+                    "severity": max((a.severity for a in found), key=lambda s: SEVERITY_ORDER.get(s, 0)),
+                    "snippet": snippet
+                })
+        return issues
 
     def scan_package_json(self, content, file_path):
         issues = []
         try:
-            data = json.loads(content)
+            buffer = SourceBuffer.of(content)
+            data = json.loads(buffer.content)
             deps = {**data.get("dependencies", {}), **data.get("devDependencies", {})}
-            
+
+            candidates = []
             for pkg, version in deps.items():
                 # Limpar caracteres como ^ ou ~ (ex: ^1.2.3 -> 1.2.3)
                 clean_ver = re.sub(r'[^\d.]', '', version)
-                
-                if pkg in self.vulnerable_packages:
-                    if clean_ver in self.vulnerable_packages[pkg]:
-                        issues.append({
-                            "id": "VULNERABLE_DEP",
-                            "file": file_path,
-                            "line": 0, # JSON não é fácil mapear linha sem parser custom
-                            "name": f"SCA: {pkg} v{clean_ver} is vulnerable",
-                            "severity": "ALTO",
-                            "snippet": f'"{pkg}": "{version}"'
-                        })
+                candidates.append(("npm", pkg, clean_ver, 0, f'"{pkg}": "{version}"'))
+
+            issues = self._issues(candidates, file_path)
+            for issue in issues:
+                # Linha da declaração (só procurada para as dependências vulneráveis)
+                pkg, _, version = issue["snippet"].partition(": ")
+                declared = re.compile(f'{re.escape(pkg)}\\s*:\\s*{re.escape(version)}')
+                issue["line"] = next(buffer.find_lines(declared), 0)
         except:
             pass
         return issues
 
     def scan_requirements_txt(self, content, file_path):
-        issues = []
-        for i, line in enumerate(content.splitlines(), 1):
-            if "==" in line:
-                parts = line.split("==")
-                pkg = parts[0].strip().lower()
-                ver = parts[1].strip()
-                
-                if pkg in self.vulnerable_packages and ver in self.vulnerable_packages[pkg]:
-                    issues.append({
-                        "id": "VULNERABLE_DEP",
-                        "file": file_path,
-                        "line": i,
-                        "name": f"SCA: {pkg} v{ver} is vulnerable",
-                        "severity": "ALTO",
-                        "snippet": line.strip()
-                    })
-        return issues
\ No newline at end of file
+        buffer = SourceBuffer.of(content)
+        candidates = []
+        for i in buffer.find_lines(PINNED):
+            line = buffer.line(i)
+            parts = line.split("==")
+            pkg = parts[0].strip().lower()
+            ver = parts[1].strip()
+            candidates.append(("PyPI", pkg, ver, i, line.strip()))
+        return self._issues(candidates, file_path)
+
+    def scan_lockfile(self, content, file_path):
+        """
+        package-lock.json, yarn.lock, pnpm-lock.yaml, poetry.lock e Pipfile.lock, lidos em
+        streaming (aceita também um MappedBuffer). Cada pacote@versão é reportado uma vez por
+        lockfile, na linha da primeira ocorrência.
+        """
+        parser = lockfile_parser(file_path)
+        if parser is None:
+            return []
+        buffer = SourceBuffer.of(content)
+        candidates = {}
+        for ecosystem, pkg, version, line, snippet in parser(buffer.iter_lines()):
+            candidates.setdefault((ecosystem, pkg, version), (ecosystem, pkg, version, line, snippet))
+        return self._issues(list(candidates.values()), file_path)
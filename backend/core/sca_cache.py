@@ -0,0 +1,121 @@
+import os
+import json
+from .advisories import Advisory
+
+# Redis partilhado (ex: redis://redis:6379/1); sem isto os vereditos só ficam na memória do processo
+SCA_CACHE_REDIS_URL = os.getenv("SCA_CACHE_REDIS_URL")
+
+# Validade do hash de uma versão da base de dados no Redis (segundos)
+SCA_CACHE_TTL = int(os.getenv("SCA_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Limite de vereditos guardados em memória por processo
+MAX_RESOLVED = 100_000
+
+# Campos por comando HMGET/HSET
+REDIS_BATCH = 1000
+
+VERSION_KEY = "sentinel:sca:version"
+
+
+class ResolutionCache:
+    """
+    Vereditos (ecossistema, pacote, versão) -> advisories, partilhados entre ficheiros e scans.
+    - Memória do processo: dicionário limitado, limpo quando a base de dados de advisories muda.
+    - Com Redis: um hash por versão da base de dados (sentinel:sca:<versão>), partilhado por
+      todos os workers e orgs. Quando um worker vê uma versão nova, o hash da anterior é
+      apagado de uma vez; os hashes órfãos expiram ao fim de SCA_CACHE_TTL.
+    As dependências de um ficheiro são resolvidas em lote: um HMGET por bloco de REDIS_BATCH.
+    """
+    def __init__(self, redis_url=SCA_CACHE_REDIS_URL, max_entries=MAX_RESOLVED, ttl=SCA_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local = {}
+        self.version = None
+        self.redis = None
+        self._registered = None  # Versão já registada no Redis por este processo
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=1)
+            except ImportError:
+                print("⚠️ Pacote redis não instalado: cache de SCA só em memória")
+
+    @staticmethod
+    def _field(key):
+        return "\x1f".join(key)
+
+    @staticmethod
+    def _encode(advisories):
+        return json.dumps([[a.id, a.severity, a.summary] for a in advisories])
+
+    @staticmethod
+    def _decode(value):
+        return [Advisory(id, summary, severity, []) for id, severity, summary in json.loads(value)]
+
+    def _register(self, version):
+        """Regista a versão atual; se era outra, apaga o hash dela (invalidação em bloco)"""
+        if self._registered == version:
+            return
+        previous = self.redis.getset(VERSION_KEY, version)
+        if previous is not None and previous.decode() != version:
+            self.redis.delete(f"sentinel:sca:{previous.decode()}")
+        self._registered = version
+
+    def _from_redis(self, version, keys, result):
+        """Preenche result com os vereditos do Redis; devolve as chaves que lá não estavam"""
+        self._register(version)
+        name = f"sentinel:sca:{version}"
+        pipe = self.redis.pipeline(transaction=False)
+        for i in range(0, len(keys), REDIS_BATCH):
+            pipe.hmget(name, [self._field(key) for key in keys[i:i + REDIS_BATCH]])
+        values = [value for chunk in pipe.execute() for value in chunk]
+        missing = []
+        for key, value in zip(keys, values):
+            if value is None:
+                missing.append(key)
+            else:
+                result[key] = self._decode(value)
+        return missing
+
+    def _to_redis(self, version, computed):
+        name = f"sentinel:sca:{version}"
+        items = [(self._field(key), self._encode(found)) for key, found in computed.items()]
+        pipe = self.redis.pipeline(transaction=False)
+        for i in range(0, len(items), REDIS_BATCH):
+            pipe.hset(name, mapping=dict(items[i:i + REDIS_BATCH]))
+        pipe.expire(name, self.ttl)
+        pipe.execute()
+
+    def resolve_many(self, db, keys):
+        """{(ecossistema, pacote, versão): [Advisory]} para todas as chaves (lista vazia = sem advisories)"""
+        version = db.version
+        if version != self.version or len(self.local) >= self.max_entries:
+            self.local.clear()
+            self.version = version
+
+        result = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            found = self.local.get(key)
+            if found is None:
+                missing.append(key)
+            else:
+                result[key] = found
+
+        if missing and self.redis is not None:
+            try:
+                missing = self._from_redis(version, missing, result)
+            except Exception as e:
+                # Redis indisponível: resolve-se tudo localmente
+                print(f"⚠️ Cache de SCA (Redis): {e}")
+
+        computed = {key: db.lookup(*key) for key in missing}
+        if computed and self.redis is not None:
+            try:
+                self._to_redis(version, computed)
+            except Exception as e:
+                print(f"⚠️ Cache de SCA (Redis): {e}")
+
+        result.update(computed)
+        self.local.update(result)
+        return result
@@ -1,14 +1,63 @@
 import os
 import re
+import mmap
+import asyncio
+import zipfile
+from time import perf_counter
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from .sca import SCAScanner
+from .lockfiles import LOCKFILE_PARSERS
 from .iac import IaCScanner
+from .dispatch import AnalyzerRegistry
 from .compliance import check_compliance
 from .security import analyze_security, analyze_secrets, Issue
+from .rules import RuleEngine
+from .buffer import SourceBuffer, MappedBuffer
+from .cache import ScanCache, CACHE_FILENAME
+from .profiling import ScanProfile, timed
+from .watchdog import file_budget, ScanTimeout, FILE_TIME_BUDGET
+from .diff import changed_lines, line_in_hunks
+from .classify import (
+    classify_file, classify_name, classify_head, decode_source,
+    MAX_FILE_SIZE, HEAD_SIZE, LARGE_FILE_THRESHOLD, UTF16_BOMS
+)
+import hashlib
+import json
 import yaml
 
 # Caminho para o ficheiro rules.yaml
 RULES_PATH = os.path.join(os.path.dirname(__file__), "../rules.yaml")
 
+# Incrementar sempre que a lógica de análise mude (invalida as caches incrementais)
+SCANNER_VERSION = "1.1"
+
+# Número máximo de ficheiros enviados de cada vez para um processo do pool
+MAX_BATCH_SIZE = 256
+
+# Scanner de cada processo do pool (criado uma vez por processo pelo initializer)
+_worker_scanner = None
+
+def _init_worker():
+    global _worker_scanner
+    _worker_scanner = Scanner()
+
+def _scan_batch(file_paths, policies, profiling=False):
+    """
+    Corre num processo do pool: devolve ((issues, completo) de cada ficheiro pela mesma ordem,
+    ficheiros saltados/incompletos por motivo, perfil do lote em dict ou None)
+    """
+    _worker_scanner.skipped.clear()
+    _worker_scanner.profile = ScanProfile() if profiling else None
+    results = [_worker_scanner.scan_file_sync(path, policies) for path in file_paths]
+    return results, dict(_worker_scanner.skipped), _worker_scanner.profile.to_dict() if profiling else None
+
+def resolve_jobs(jobs):
+    """0 ou None = um processo por CPU"""
+    if not jobs:
+        return os.cpu_count() or 1
+    return max(1, jobs)
+
 class Scanner:
     def __init__(self):
         # Carregar regras do YAML se existir, senão usa lista vazia
@@ -20,79 +69,366 @@ class Scanner:
             except Exception as e:
                 print(f"Erro ao carregar rules.yaml: {e}")
 
+        # Compilar as regras uma única vez (prefiltro combinado + regex por regra)
+        self.rule_engine = RuleEngine(self.regex_rules)
+
         # Inicializar sub-scanners
         self.sca = SCAScanner()
         self.iac = IaCScanner()
+
+        # Tipo de ficheiro -> analisadores e subconjunto das regras (montado uma vez por nome)
+        self.dispatch = AnalyzerRegistry(self.rule_engine)
+        self.dispatch.register(["package.json"], "sca", self.sca.scan_package_json)
+        self.dispatch.register(["requirements.txt"], "sca", self.sca.scan_requirements_txt)
+        self.dispatch.register(LOCKFILE_PARSERS, "sca", self.sca.scan_lockfile, large_files=True)
+        self.dispatch.register(["Dockerfile", "Dockerfile.*", "*.dockerfile"], "iac", self.iac.scan_dockerfile, policy="dockerScan")
+        self.dispatch.register(["*.tf"], "iac", self.iac.scan_terraform)
+        self.dispatch.register(["*.yaml", "*.yml"], "iac", self.iac.scan_kubernetes)
+
+        self._rules_key = json.dumps(self.regex_rules, sort_keys=True, default=str)
         
         # Pastas a ignorar
         self.IGNORE_DIRS = {'.git', '.svn', 'node_modules', 'venv', '.venv', '__pycache__', '.next', 'dist', 'build'}
 
+        # Ficheiros saltados no último scan (binários, minificados, demasiado grandes...), por motivo
+        self.skipped = Counter()
+
+        # ScanProfile opcional (--profile): tempos por fase, por regra e ficheiros mais lentos
+        self.profile = None
+
+    @property
+    def fingerprint(self):
+        """
+        Regras + versão do scanner + versão da base de dados de advisories (findings de SCA).
+        Só é lido ao abrir a cache: a base de dados não é aberta no arranque do worker.
+        """
+        return hashlib.sha256(
+            f"{SCANNER_VERSION}:{self.sca.advisories.version}:{self._rules_key}".encode()
+        ).hexdigest()
+
     async def scan_file(self, file_path, policies=None):
+        issues, _ = self.scan_file_sync(file_path, policies)
+        return issues
+
+    def scan_file_sync(self, file_path, policies=None):
+        """
+        Devolve (issues, completo). completo é False se o ficheiro não foi lido ou analisado
+        até ao fim (timeout ou erro): os issues são parciais e não podem ir para a cache.
+        """
+        if self.profile is None:
+            return self._scan_file(file_path, policies)
+        start = perf_counter()
+        result = self._scan_file(file_path, policies)
+        self.profile.add_file(file_path, perf_counter() - start)
+        return result
+
+    def _scan_file(self, file_path, policies):
+        try:
+            if os.path.getsize(file_path) > LARGE_FILE_THRESHOLD:
+                result = self.scan_large_file(file_path)
+                if result is not None:
+                    return result
+            with timed(self.profile, "read"):
+                with open(file_path, 'rb') as f:
+                    content = decode_source(f.read())
+        except Exception as e:
+            # print(f"Erro ao ler {file_path}: {e}")
+            return [], False
+
+        return self._scan_content(content, file_path, policies)
+
+    def scan_large_file(self, file_path):
+        """
+        Ficheiros grandes: o ficheiro é mapeado (mmap) e as regras/segredos correm em bytes
+        diretamente sobre o mapeamento, descodificando só as linhas com match.
+        Só correm os analisadores registados com large_files (os lockfiles, lidos linha a
+        linha do mapeamento); IaC não se aplica.
+        Devolve (issues, completo), ou None para ficheiros UTF-16, que seguem o caminho normal.
+        """
+        issues = []
+        complete = False
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:2] in UTF16_BOMS:
+                return None
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            try:
+                buffer = MappedBuffer(mm)
+                pipeline = self.dispatch.pipeline(os.path.basename(file_path))
+                with file_budget():
+                    for analyzer in pipeline.analyzers:
+                        if not analyzer.large_files:
+                            continue
+                        with timed(self.profile, analyzer.stage) as stage:
+                            raw_issues = analyzer.fn(buffer, file_path)
+                            stage.findings = len(raw_issues)
+                        for i in raw_issues:
+                            issues.append(Issue(i['id'], i['name'], i['severity'], i['snippet'], i['line'], file_path))
+                    with timed(self.profile, "rules") as stage:
+                        found = analyze_security(buffer, pipeline.rules, self.profile)
+                        stage.findings = len(found)
+                    for issue in found:
+                        issue.file = file_path
+                        issues.append(issue)
+                    with timed(self.profile, "secrets") as stage:
+                        secrets = analyze_secrets(buffer, self.profile)
+                        stage.findings = len(secrets)
+                    for issue in secrets:
+                        issue.file = file_path
+                        issues.append(issue)
+                complete = True
+            except ScanTimeout:
+                self._mark_incomplete(file_path)
+            except Exception as e:
+                # print(f"Erro ao analisar {file_path}: {e}")
+                pass
+        return issues, complete
+
+    def _mark_incomplete(self, file_path):
+        """O ficheiro excedeu o orçamento de tempo: conta como 'scan-incomplete' em vez de bloquear o scan"""
+        self.skipped["scan-incomplete"] += 1
+        print(f"⏱️ Scan incompleto (mais de {FILE_TIME_BUDGET:g}s): {file_path}")
+
+    def scan_content(self, content, file_path, policies=None):
+        """Corre todos os analisadores sobre conteúdo já em memória (ficheiro ou membro de um ZIP)"""
+        issues, _ = self._scan_content(content, file_path, policies)
+        return issues
+
+    def _scan_content(self, content, file_path, policies):
         issues = []
+        complete = False
         if not policies: policies = {"dockerScan": True}
         
         filename = os.path.basename(file_path)
 
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-
-            # 1. SCA (Dependências)
-            if filename == 'package.json':
-                # Nota: SCA retorna dicts, convertemos para Issue se necessário
-                raw_issues = self.sca.scan_package_json(content, file_path)
-                for i in raw_issues:
-                    issues.append(Issue(i['id'], i['name'], i['severity'], i['snippet'], i['line'], file_path))
-                    
-            elif filename == 'requirements.txt':
-                raw_issues = self.sca.scan_requirements_txt(content, file_path)
-                for i in raw_issues:
-                    issues.append(Issue(i['id'], i['name'], i['severity'], i['snippet'], i['line'], file_path))
-
-            # 2. IaC (Infraestrutura)
-            if filename == 'Dockerfile' and policies.get('dockerScan'):
-                raw_issues = self.iac.scan_dockerfile(content, file_path)
-                for i in raw_issues:
-                    issues.append(Issue(i['id'], i['name'], i['severity'], i['snippet'], i['line'], file_path))
-
-            # 3. SAST (Análise de Segurança Avançada)
-            # Usa as funções do security.py corrigido
-            security_issues = analyze_security(content, self.regex_rules)
-            for issue in security_issues:
-                issue.file = file_path
-                issues.append(issue)
-
-            # 4. Segredos (Entropia)
-            secret_issues = analyze_secrets(content)
-            for issue in secret_issues:
-                issue.file = file_path
-                issues.append(issue)
+            with file_budget():
+                # Um único buffer (e índice de linhas) partilhado por todos os analisadores
+                buffer = SourceBuffer(content)
+                pipeline = self.dispatch.pipeline(filename)
+
+                # 1. Analisadores especializados (SCA, IaC) registados para este tipo de ficheiro
+                for analyzer in pipeline.analyzers:
+                    if analyzer.policy and not policies.get(analyzer.policy):
+                        continue
+                    with timed(self.profile, analyzer.stage) as stage:
+                        raw_issues = analyzer.fn(buffer, file_path)
+                        stage.findings = len(raw_issues)
+                    for i in raw_issues:
+                        issues.append(Issue(i['id'], i['name'], i['severity'], i['snippet'], i['line'], file_path))
+
+                # 2. SAST (Análise de Segurança Avançada)
+                # Usa as funções do security.py corrigido
+                with timed(self.profile, "rules") as stage:
+                    security_issues = analyze_security(buffer, pipeline.rules, self.profile)
+                    stage.findings = len(security_issues)
+                for issue in security_issues:
+                    issue.file = file_path
+                    issues.append(issue)
 
+                # 3. Segredos (Entropia)
+                with timed(self.profile, "secrets") as stage:
+                    secret_issues = analyze_secrets(buffer, self.profile)
+                    stage.findings = len(secret_issues)
+                for issue in secret_issues:
+                    issue.file = file_path
+                    issues.append(issue)
+            complete = True
+
+        except ScanTimeout:
+            # Ficam os findings das fases que terminaram a tempo
+            self._mark_incomplete(file_path)
         except Exception as e:
-            # print(f"Erro ao ler {file_path}: {e}")
+            # print(f"Erro ao analisar {file_path}: {e}")
             pass
 
-        return issues
+        return issues, complete
 
-    async def scan_directory(self, target_dir, policies=None):
-        all_issues = []
-        
+    def collect_files(self, target_dir):
+        """Lista os ficheiros a analisar (pela ordem do os.walk)"""
+        file_paths = []
         for root, dirs, files in os.walk(target_dir):
             # Filtrar pastas ignoradas
             dirs[:] = [d for d in dirs if d not in self.IGNORE_DIRS]
             
             for file in files:
-                file_path = os.path.join(root, file)
-                # Ignorar ficheiros do próprio scanner para evitar falsos positivos
-                if "security_report.json" in file or "rules.yaml" in file:
+                if self._skip_file(file):
                     continue
-                    
-                file_issues = await self.scan_file(file_path, policies)
-                all_issues.extend(file_issues)
+                file_paths.append(os.path.join(root, file))
+        return file_paths
+
+    @staticmethod
+    def _skip_file(filename):
+        # Ignorar ficheiros do próprio scanner para evitar falsos positivos
+        return "security_report.json" in filename or "rules.yaml" in filename or filename.startswith(CACHE_FILENAME)
+
+    def _is_ignored(self, rel_path):
+        parts = rel_path.split("/")
+        return any(part in self.IGNORE_DIRS for part in parts[:-1]) or self._skip_file(parts[-1])
+
+    def open_cache(self, path):
+        """Abre a cache incremental associada ao conjunto de regras atual"""
+        return ScanCache(path, self.fingerprint)
+
+    async def scan_files(self, file_paths, policies=None, jobs=1, cache=None):
+        """
+        Analisa uma lista de ficheiros. Com jobs > 1 os ficheiros são distribuídos em lotes
+        por um ProcessPoolExecutor; os resultados são juntos pela ordem original da lista.
+        Com uma ScanCache, os ficheiros inalterados são repostos a partir da cache.
+        """
+        # Classificação rápida (nome, tamanho e primeiros bytes) antes de qualquer análise
+        scannable = []
+        for file_path in file_paths:
+            reason = classify_file(file_path)
+            if reason:
+                self.skipped[reason] += 1
+            else:
+                scannable.append(file_path)
+        file_paths = scannable
+
+        if cache is None:
+            per_file = await self._scan_per_file(file_paths, policies, jobs)
+        else:
+            per_file = await self._scan_per_file_cached(file_paths, policies, jobs, cache)
+
+        all_issues = []
+        for file_issues, _ in per_file:
+            all_issues.extend(file_issues)
+        return all_issues
+
+    async def _scan_per_file(self, file_paths, policies, jobs):
+        """Devolve (issues, completo) por ficheiro, pela ordem de file_paths"""
+        jobs = resolve_jobs(jobs)
+        if jobs == 1 or len(file_paths) < 2:
+            return [self.scan_file_sync(file_path, policies) for file_path in file_paths]
+
+        # Lotes pequenos o suficiente para equilibrar a carga entre processos
+        batch_size = max(1, min(MAX_BATCH_SIZE, len(file_paths) // (jobs * 4)))
+        batches = [file_paths[i:i + batch_size] for i in range(0, len(file_paths), batch_size)]
+
+        loop = asyncio.get_running_loop()
+        profiling = self.profile is not None
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+            futures = [loop.run_in_executor(pool, _scan_batch, batch, policies, profiling) for batch in batches]
+            results = await asyncio.gather(*futures)
+
+        # Ficheiros incompletos e perfis de cada lote juntam-se aos do processo principal
+        for _, skipped, perf in results:
+            self.skipped.update(skipped)
+            if perf:
+                self.profile.merge(perf)
+        return [file_issues for batch_result, _, _ in results for file_issues in batch_result]
+
+    async def _scan_per_file_cached(self, file_paths, policies, jobs, cache):
+        keys = [cache.key_for(file_path, policies) for file_path in file_paths]
+        cached = cache.get_many({key for key in keys if key})
+
+        # Só os ficheiros alterados (ou novos) são analisados
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        scanned = await self._scan_per_file([file_paths[i] for i in missing], policies, jobs)
+
+        per_file = [None] * len(file_paths)
+        new_entries = []
+        for i, (file_issues, complete) in zip(missing, scanned):
+            per_file[i] = (file_issues, complete)
+            # Resultados parciais (timeout, erro de leitura) não são guardados: o ficheiro é
+            # analisado outra vez no próximo scan
+            if keys[i] and complete:
+                new_entries.append((keys[i], [self._cacheable(issue) for issue in file_issues]))
+        cache.put_many(new_entries)
+
+        for i, key in enumerate(keys):
+            if per_file[i] is None:
+                per_file[i] = ([Issue(file=file_paths[i], **data) for data in cached[key]], True)
+        return per_file
+
+    @staticmethod
+    def _cacheable(issue):
+        # O caminho (e o hash, que depende dele) não entra na cache: o mesmo conteúdo pode estar noutro sítio
+        data = issue.dict()
+        data.pop("file", None)
+        data.pop("hash", None)
+        return data
+
+    async def scan_directory(self, target_dir, policies=None, jobs=1, cache=None):
+        self.skipped = Counter()
+        file_paths = self.collect_files(target_dir)
+        all_issues = await self.scan_files(file_paths, policies, jobs, cache)
         
         # 5. Compliance Check (Global)
         # Verifica se os erros encontrados violam ISO 27001, GDPR, etc.
-        compliance_issues = check_compliance(all_issues)
+        with timed(self.profile, "compliance") as stage:
+            compliance_issues = check_compliance(all_issues)
+            stage.findings = len(compliance_issues)
+        all_issues.extend(compliance_issues)
+
+        return all_issues
+
+    async def scan_diff(self, target_dir, diff_range, policies=None, jobs=1, cache=None):
+        """
+        Modo Pull Request: analisa só os ficheiros alterados em diff_range (ex: 'main..HEAD')
+        e só mantém os findings que caem em linhas alteradas. O compliance corre sobre o resultado.
+        """
+        self.skipped = Counter()
+        hunks_by_path = {}
+        for rel_path, hunks in changed_lines(target_dir, diff_range).items():
+            if not hunks or self._is_ignored(rel_path):
+                continue
+            file_path = os.path.join(target_dir, rel_path)
+            if os.path.isfile(file_path):
+                hunks_by_path[file_path] = hunks
+
+        file_issues = await self.scan_files(list(hunks_by_path), policies, jobs, cache)
+        all_issues = [issue for issue in file_issues if line_in_hunks(issue.line, hunks_by_path[issue.file])]
+
+        with timed(self.profile, "compliance") as stage:
+            compliance_issues = check_compliance(all_issues)
+            stage.findings = len(compliance_issues)
+        all_issues.extend(compliance_issues)
+
+        return all_issues
+
+    def archive_members(self, archive):
+        """Membros do ZIP a analisar, com os mesmos filtros (IGNORE_DIRS, tamanho) do scan em disco"""
+        members = []
+        for info in archive.infolist():
+            if info.is_dir() or self._is_ignored(info.filename.replace("\\", "/")):
+                continue
+            reason = classify_name(info.filename, info.file_size)
+            if reason:
+                self.skipped[reason] += 1
+                continue
+            members.append(info)
+        return members
+
+    def scan_archive_members(self, archive, members, policies=None):
+        """Lê cada membro diretamente do ZIP para memória e analisa-o, sem extrair para disco"""
+        all_issues = []
+        for info in members:
+            try:
+                with archive.open(info) as member:
+                    # Limite aplicado à leitura (o tamanho declarado no ZIP pode mentir)
+                    data = member.read(MAX_FILE_SIZE + 1)
+            except Exception as e:
+                print(f"Erro ao ler {info.filename} do arquivo: {e}")
+                continue
+            reason = "too-large" if len(data) > MAX_FILE_SIZE else classify_head(data[:HEAD_SIZE])
+            if reason:
+                self.skipped[reason] += 1
+                continue
+            content = decode_source(data)
+            all_issues.extend(self.scan_content(content, info.filename, policies))
+        return all_issues
+
+    async def scan_archive(self, archive_path, policies=None):
+        """Scan de um upload ZIP em streaming: os caminhos dos issues são os caminhos dentro do arquivo"""
+        self.skipped = Counter()
+        with zipfile.ZipFile(archive_path, 'r') as archive:
+            all_issues = self.scan_archive_members(archive, self.archive_members(archive), policies)
+
+        with timed(self.profile, "compliance") as stage:
+            compliance_issues = check_compliance(all_issues)
+            stage.findings = len(compliance_issues)
         all_issues.extend(compliance_issues)
 
-        return all_issues
\ No newline at end of file
+        return all_issues
@@ -1,11 +1,17 @@
 import os
 import json
 import zipfile
-import shutil
-from supabase import create_client
-from .celery_app import celery_app
+from collections import Counter
+from celery import chord
+from .celery_app import celery_app, SCAN_SHARD_SIZE, INTEGRATION_MAX_RETRIES
 from .scanner import Scanner
-from .integrations import filter_ignored_issues, trigger_webhooks, create_jira_ticket # <--- Importar
+from .security import Issue
+from .compliance import check_compliance
+from .report import skip_summary
+from .profiling import ScanProfile, profiling_enabled, timed
+from .db import get_client, with_retry
+from .org_cache import org_cache
+from .integrations import filter_ignored_issues, SuppressionSet, wants_delivery, report_digest, deliver, record_dead_letter, DeliveryError
 
 # --- CONFIGURAÇÃO SUPABASE (SERVICE ROLE) ---
 # É crucial que a chave SERVICE_ROLE esteja no .env e no docker-compose
@@ -15,91 +21,191 @@ SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") # <--- Tem de ser a chave
 if not SUPABASE_URL or not SUPABASE_KEY:
     print("CRITICAL: Supabase credentials missing in Worker.")
 
-# Cliente com privilégios de Admin (Bypass RLS)
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 scanner_engine = Scanner()
 
-@celery_app.task(name="scan_code_task")
-def scan_code_task(file_path, policies, org_id):
+@celery_app.task(name="scan_code_task", bind=True)
+def scan_code_task(self, file_path, policies, org_id):
     """
     Executa o scan e GRAVA na base de dados.
+    Arquivos grandes são divididos em shards e distribuídos pelos workers (chord).
     """
-    extract_path = file_path + "_extracted"
-    
+    sharded = False
+    scanner_engine.skipped.clear()
+    scanner_engine.profile = ScanProfile() if profiling_enabled(policies) else None
     try:
-        # 1. Extrair
-        os.makedirs(extract_path, exist_ok=True)
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_path)
-
-        # 2. Scan
-        raw_issues = scanner_engine.scan_directory(extract_path, policies)
-
-        # 3. Filtrar Ignorados
-        ignored_hashes = set()
-        if org_id:
-            try:
-                res = supabase.table("ignored_issues").select("issue_hash").eq("org_id", org_id).execute()
-                ignored_hashes = {item['issue_hash'] for item in res.data}
-            except Exception as e:
-                print(f"Warning: Could not fetch ignored issues: {e}")
-        
-        active_issues = filter_ignored_issues(raw_issues, ignored_hashes)
-
-        # 4. Sumário
-        severity_counts = {"critical": 0, "high": 0, "medium": 0, "low": 0}
-        for issue in active_issues:
-            sev = issue.get("severity", "LOW").lower()
-            if "critico" in sev or "critical" in sev: severity_counts["critical"] += 1
-            elif "alto" in sev or "high" in sev: severity_counts["high"] += 1
-            elif "medio" in sev or "medium" in sev: severity_counts["medium"] += 1
-            else: severity_counts["low"] += 1
-
-        report = {
-            "status": "completed",
-            "summary": severity_counts,
-            "total_issues": len(active_issues),
-            "issues": active_issues,
-            "ignored_count": len(raw_issues) - len(active_issues)
-        }
+        with zipfile.ZipFile(file_path, 'r') as archive:
+            members = scanner_engine.archive_members(archive)
+            if len(members) > SCAN_SHARD_SIZE:
+                names = [info.filename for info in members]
+                sharded = True
+            else:
+                # 1. Scan em streaming a partir do ZIP (sem extrair para o volume partilhado)
+                raw_issues = scanner_engine.scan_archive_members(archive, members, policies)
 
-        # 5. GRAVAR NA BASE DE DADOS (CRUCIAL)
-        # Usamos o cliente 'supabase' que foi iniciado com a Service Key
-        try:
-            scan_entry = {
-                "org_id": org_id,
-                "report": report,
-                "status": "Completed"
-            }
-            # .execute() é necessário para efetivar a inserção
-            data = supabase.table("scans").insert(scan_entry).execute()
-            print(f"✅ Scan saved via Worker. ID: {data.data[0]['id']}")
-        except Exception as db_err:
-            print(f"❌ Error saving to Supabase: {db_err}")
-            # Em caso de erro, não falhamos a task, mas o frontend não vai ver histórico novo
-            
-        # 6. Webhooks
-        if org_id:
-            try:
-                res = supabase.table("integrations").select("*").eq("org_id", org_id).execute()
-                integrations_list = res.data
-                
-                # Disparar Webhooks
-                trigger_webhooks(integrations_list, report)
-                
-                # Criar Ticket no Jira (Novo)
-                create_jira_ticket(integrations_list, report)
-                
-            except Exception as e:
-                print(f"Integrations error: {e}")
-
-        return report
+        if not sharded:
+            with timed(scanner_engine.profile, "compliance") as stage:
+                compliance_issues = check_compliance(raw_issues)
+                stage.findings = len(compliance_issues)
+            raw_issues.extend(compliance_issues)
+            perf = scanner_engine.profile.to_dict() if scanner_engine.profile else None
+            return finalize_report([issue.dict() for issue in raw_issues], org_id, scanner_engine.skipped, perf)
 
     except Exception as e:
+        sharded = False
         print(f"Task Failed: {e}")
         return {"status": "failed", "error": str(e)}
-        
+
     finally:
-        if os.path.exists(extract_path): shutil.rmtree(extract_path)
-        if os.path.exists(file_path): os.remove(file_path)
\ No newline at end of file
+        # Com shards, o upload só é apagado no fim do chord
+        if not sharded: _remove_upload(file_path)
+
+    shards = [names[i:i + SCAN_SHARD_SIZE] for i in range(0, len(names), SCAN_SHARD_SIZE)]
+    print(f"📦 Scan dividido em {len(shards)} shards de até {SCAN_SHARD_SIZE} ficheiros")
+    workflow = chord(
+        (scan_shard_task.s(file_path, shard, policies) for shard in shards),
+        # Saltados por nome/tamanho já no archive_members (antes da divisão em shards)
+        merge_shards_task.s(file_path, org_id, dict(scanner_engine.skipped))
+    ).on_error(scan_failed_task.s(file_path))
+    # O id desta task passa a devolver o resultado do callback (é esse id que o frontend consulta)
+    return self.replace(workflow)
+
+
+@celery_app.task(name="scan_shard_task")
+def scan_shard_task(file_path, member_names, policies):
+    """Analisa um subconjunto dos membros do ZIP; devolve os issues como dicts (serializáveis)"""
+    scanner_engine.skipped.clear()
+    scanner_engine.profile = ScanProfile() if profiling_enabled(policies) else None
+    with zipfile.ZipFile(file_path, 'r') as archive:
+        members = [archive.getinfo(name) for name in member_names]
+        issues = scanner_engine.scan_archive_members(archive, members, policies)
+    result = {"issues": [issue.dict() for issue in issues], "skipped": dict(scanner_engine.skipped)}
+    if scanner_engine.profile:
+        result["perf"] = scanner_engine.profile.to_dict()
+    return result
+
+
+@celery_app.task(name="merge_shards_task")
+def merge_shards_task(shard_results, file_path, org_id, skipped=None):
+    """Callback do chord: junta os shards (pela ordem original), corre o compliance e grava o scan"""
+    try:
+        raw_issues = [issue for shard in shard_results for issue in shard["issues"]]
+        skipped = Counter(skipped or {})
+        for shard in shard_results:
+            skipped.update(shard["skipped"])
+        # Os perfis dos shards (se pedidos) juntam-se num só
+        profile = None
+        for shard in shard_results:
+            if shard.get("perf"):
+                profile = (profile or ScanProfile()).merge(shard["perf"])
+        with timed(profile, "compliance") as stage:
+            compliance_issues = check_compliance([Issue(**issue) for issue in raw_issues])
+            stage.findings = len(compliance_issues)
+        raw_issues.extend(issue.dict() for issue in compliance_issues)
+        return finalize_report(raw_issues, org_id, skipped, profile.to_dict() if profile else None)
+    except Exception as e:
+        print(f"Task Failed: {e}")
+        return {"status": "failed", "error": str(e)}
+    finally:
+        _remove_upload(file_path)
+
+
+@celery_app.task(name="scan_failed_task")
+def scan_failed_task(request, exc, traceback, file_path):
+    """Errback do chord: um shard falhou, o upload deixa de ser necessário"""
+    print(f"Task Failed: {exc}")
+    _remove_upload(file_path)
+
+
+def _remove_upload(file_path):
+    if os.path.exists(file_path): os.remove(file_path)
+
+
+def finalize_report(raw_issues, org_id, skipped=None, perf=None):
+    """Filtra ignorados, calcula o sumário, grava a linha em 'scans' e dispara as integrações"""
+    # 2. Filtrar Ignorados
+    # Hashes ignorados e integrações vêm da cache por org (ver org_cache.invalidate_org)
+    supabase = get_client(SUPABASE_URL, SUPABASE_KEY)
+    ignored_hashes = SuppressionSet()
+    if org_id:
+        try:
+            ignored_hashes = org_cache.get("ignored", org_id, lambda: [
+                item['issue_hash'] for item in
+                with_retry(supabase.table("ignored_issues").select("issue_hash").eq("org_id", org_id).execute).data
+            ], build=SuppressionSet)
+        except Exception as e:
+            print(f"Warning: Could not fetch ignored issues: {e}")
+    
+    active_issues = filter_ignored_issues(raw_issues, ignored_hashes)
+
+    # 3. Sumário
+    severity_counts = {"critical": 0, "high": 0, "medium": 0, "low": 0}
+    for issue in active_issues:
+        sev = issue.get("severity", "LOW").lower()
+        if "critico" in sev or "critical" in sev: severity_counts["critical"] += 1
+        elif "alto" in sev or "high" in sev: severity_counts["high"] += 1
+        elif "medio" in sev or "medium" in sev: severity_counts["medium"] += 1
+        else: severity_counts["low"] += 1
+
+    report = {
+        "status": "completed",
+        "summary": severity_counts,
+        "total_issues": len(active_issues),
+        "issues": active_issues,
+        "ignored_count": len(raw_issues) - len(active_issues)
+    }
+    if skipped:
+        report["skipped_files"] = skip_summary(skipped)
+    if perf:
+        report["perf"] = perf
+
+    # 4. GRAVAR NA BASE DE DADOS (CRUCIAL)
+    # Cliente Service Role (bypass RLS) partilhado pelo processo; a linha é gravada antes de a
+    # task terminar, com retry em falhas transitórias
+    try:
+        scan_entry = {
+            "org_id": org_id,
+            "report": report,
+            "status": "Completed"
+        }
+        data = with_retry(supabase.table("scans").insert(scan_entry).execute)
+        print(f"✅ Scan saved via Worker. ID: {data.data[0]['id']}")
+    except Exception as db_err:
+        print(f"❌ Error saving to Supabase: {db_err}")
+        # Em caso de erro, não falhamos a task, mas o frontend não vai ver histórico novo
+
+    # 5. Webhooks e Jira: uma task por integração na fila própria (o scan não espera pelas entregas)
+    if org_id:
+        try:
+            integrations_list = org_cache.get("integrations", org_id, lambda: with_retry(
+                supabase.table("integrations").select("*").eq("org_id", org_id).execute
+            ).data)
+            digest = report_digest(report)
+            for integration in integrations_list:
+                if wants_delivery(integration, digest):
+                    deliver_integration_task.delay(integration, digest)
+
+        except Exception as e:
+            print(f"Integrations error: {e}")
+
+    return report
+
+
+@celery_app.task(name="deliver_integration_task", bind=True, acks_late=True, max_retries=INTEGRATION_MAX_RETRIES)
+def deliver_integration_task(self, integration, report):
+    """
+    Entrega um webhook/ticket Jira (fila 'integrations'). Falhas temporárias são repetidas
+    com backoff exponencial; esgotados os retries, ou num erro definitivo, a entrega vai
+    para a dead-letter list.
+    """
+    attempts = self.request.retries + 1
+    try:
+        return {"status": "delivered", "http_status": deliver(integration, report)}
+    except DeliveryError as e:
+        if e.transient and self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=min(2 ** self.request.retries * 5, 600))
+        record_dead_letter(integration, report, e, attempts)
+        return {"status": "dead_letter", "error": str(e)}
+    except Exception as e:
+        # Configuração inválida ou resposta inesperada: repetir não ajuda
+        record_dead_letter(integration, report, e, attempts)
+        return {"status": "dead_letter", "error": str(e)}
@@ -0,0 +1,43 @@
+import os
+import signal
+import threading
+
+# Tempo máximo de análise de um ficheiro, em segundos (0 desativa)
+FILE_TIME_BUDGET = float(os.getenv("SCAN_FILE_TIME_BUDGET", "30"))
+
+
+class ScanTimeout(Exception):
+    """O ficheiro excedeu o orçamento de tempo (o scan dele fica incompleto)"""
+
+
+def _on_alarm(signum, frame):
+    raise ScanTimeout()
+
+
+class file_budget:
+    """
+    with file_budget(): ... lança ScanTimeout se o bloco demorar mais do que o orçamento.
+    Usa um temporizador SIGALRM: o motor re verifica sinais durante o matching, por isso
+    até uma regex em backtracking catastrófico é interrompida. Fora da thread principal
+    (ou sem SIGALRM, ex: Windows) o orçamento não é aplicado.
+    """
+    __slots__ = ("seconds", "previous", "armed")
+
+    def __init__(self, seconds=None):
+        self.seconds = FILE_TIME_BUDGET if seconds is None else seconds
+        self.previous = None
+        self.armed = False
+
+    def __enter__(self):
+        if (self.seconds > 0 and hasattr(signal, "setitimer")
+                and threading.current_thread() is threading.main_thread()):
+            self.previous = signal.signal(signal.SIGALRM, _on_alarm)
+            self.armed = True
+            signal.setitimer(signal.ITIMER_REAL, self.seconds)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.armed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self.previous or signal.SIG_DFL)
+            self.armed = False
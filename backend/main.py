@@ -1,9 +1,12 @@
 import argparse
+import os
 import sys
 import time
 import asyncio  # <--- Importante
 from core.scanner import Scanner
-from core.report import generate_json_report
+from core.cache import default_cache_path
+from core.report import generate_json_report, REPORT_FORMATS
+from core.profiling import ScanProfile
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
@@ -11,25 +14,87 @@ from core.notifications import send_alert
 
 console = Console()
 
+def print_profile(perf, top=10):
+    """Tabelas do --profile: fases, regras mais lentas e ficheiros mais lentos"""
+    table = Table(title="⏱️ Tempo por fase", show_header=True, header_style="bold white")
+    table.add_column("Fase")
+    table.add_column("Segundos", justify="right")
+    table.add_column("Chamadas", justify="right")
+    table.add_column("Findings", justify="right")
+    for name, data in sorted(perf["stages"].items(), key=lambda item: -item[1]["seconds"]):
+        table.add_row(name, f"{data['seconds']:.3f}", str(data["calls"]), str(data["findings"]))
+    console.print(table)
+
+    table = Table(title=f"⏱️ {top} regras mais lentas", show_header=True, header_style="bold white")
+    table.add_column("Regra")
+    table.add_column("Segundos", justify="right")
+    table.add_column("Verificações", justify="right")
+    table.add_column("Matches", justify="right")
+    for data in perf["rules"][:top]:
+        table.add_row(data["rule"], f"{data['seconds']:.3f}", str(data["checks"]), str(data["matches"]))
+    console.print(table)
+
+    table = Table(title=f"⏱️ {top} ficheiros mais lentos", show_header=True, header_style="bold white")
+    table.add_column("Ficheiro")
+    table.add_column("Segundos", justify="right")
+    for data in perf["slowest_files"][:top]:
+        table.add_row(data["file"], f"{data['seconds']:.3f}")
+    console.print(table)
+
 async def main():  # <--- Agora é async
     # 1. Configuração de Argumentos CLI
     parser = argparse.ArgumentParser(description="SentinelScan Enterprise Edition")
     parser.add_argument("directory", help="Diretório para analisar")
     parser.add_argument("--output", default="security_report.json", help="Ficheiro de saída JSON")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="json", help="Formato do relatório (ndjson = um issue por linha, sarif = GitHub code scanning)")
+    parser.add_argument("--indent", type=int, default=4, help="Indentação do JSON (0 = compacto)")
+    parser.add_argument("--jobs", type=int, default=1, help="Processos em paralelo (0 = um por CPU)")
+    parser.add_argument("--diff", default=None, metavar="BASE..HEAD", help="Analisar só as linhas alteradas neste intervalo git (modo Pull Request)")
+    parser.add_argument("--cache", nargs="?", const=True, default=None, help="Cache incremental SQLite (por omissão ao lado do relatório)")
+    parser.add_argument("--profile", action="store_true", help="Medir o tempo por fase, por regra e os ficheiros mais lentos (secção 'perf' do relatório)")
     args = parser.parse_args()
 
     # 2. Intro Visual
     console.print(Panel.fit("[bold cyan]SentinelScan Enterprise v1.0[/bold cyan]\n[dim]Secure Code Scanner[/dim]", border_style="cyan"))
 
     scanner = Scanner()
+    if args.profile:
+        scanner.profile = ScanProfile()
+
+    # Cache incremental: ficheiros inalterados não voltam a ser analisados
+    cache = None
+    if args.cache:
+        cache_path = args.cache if isinstance(args.cache, str) else default_cache_path(args.output)
+        cache = scanner.open_cache(cache_path)
     
     # 3. Análise com Barra de Progresso
     console.print(f"[bold]🔎 A analisar diretório:[/bold] {args.directory}")
+    if args.diff:
+        console.print(f"[bold]🔀 Modo diff:[/bold] apenas alterações em {args.diff}")
     
     with console.status("[bold green]A verificar ficheiros...[/bold green]", spinner="dots"):
         time.sleep(1) 
         # <--- O AWAIT é obrigatório aqui porque o scan é assíncrono
-        issues = await scanner.scan_directory(args.directory)
+        if args.diff:
+            try:
+                issues = await scanner.scan_diff(args.directory, args.diff, jobs=args.jobs, cache=cache)
+            except RuntimeError as e:
+                console.print(f"[bold red]❌ {e}[/bold red]")
+                sys.exit(2)
+        else:
+            issues = await scanner.scan_directory(args.directory, jobs=args.jobs, cache=cache)
+
+    if cache:
+        console.print(f"[dim]♻️  Cache: {cache.hits} ficheiros reutilizados, {cache.misses} analisados[/dim]")
+        cache.close()
+
+    if scanner.skipped:
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in scanner.skipped.most_common())
+        console.print(f"[dim]⏭️  {sum(scanner.skipped.values())} ficheiros não analisados ({reasons})[/dim]")
+
+    perf = scanner.profile.to_dict() if scanner.profile else None
+    if perf:
+        print_profile(perf)
 
     # 4. Mostrar Resultados em Tabela
     if issues:
@@ -58,9 +123,11 @@ async def main():  # <--- Agora é async
 
     # 5. Gerar Relatório
     console.print("\n[dim]📄 A gerar relatórios...[/dim]")
-    # Converter objetos Issue para dicionários antes de gerar JSON
-    issues_dict = [i.dict() for i in issues]
-    success = generate_json_report(issues_dict, args.output)
+    # Os Issues são escritos em streaming (sem lista intermédia de dicionários)
+    success = generate_json_report(
+        issues, args.output, skipped=scanner.skipped, fmt=args.format, indent=args.indent or None,
+        rules=scanner.rule_engine.rules, base_dir=args.directory, perf=perf
+    )
     
     if success:
         console.print("[bold green]☁️  Dados sincronizados com Sentinel Cloud![/bold green]")
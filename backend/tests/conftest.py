@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Os testes correm a partir de backend/ ou da raiz do repositório: "core" tem de ser importável
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Resultados reprodutíveis: advisories da lista interna (sem advisories.db local) e sem Redis
+os.environ["SENTINEL_ADVISORY_DB"] = os.path.join(tempfile.mkdtemp(), "advisories.db")
+for name in ("SCA_CACHE_REDIS_URL", "ORG_CACHE_REDIS_URL", "SUPABASE_URL", "SUPABASE_SERVICE_KEY", "SCAN_PROFILE"):
+    os.environ.pop(name, None)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Findings esperados no scan de fixtures/repo: (ficheiro, regra, linha, hash)
+# O hash é o issue_hash guardado em 'ignored_issues' (o caminho do ficheiro entra no hash)
+EXPECTED = sorted([
+    ("repo/requirements.txt", "VULNERABLE_DEP", 2, "d0fde0905b68211895cfaccac7b793838e0d0ea02a6feaee3c1958a1baac3820"),
+    ("repo/Dockerfile", "DOCKER_LATEST", 1, "15d3d00e2cca1d51f65f82711a6154277ee4e529b58a17ce23b09b9a40eaa31f"),
+    ("repo/Dockerfile", "DOCKER_SSH", 3, "77d11f25ab2f054bf944b41cf4c3780a7e4bee284b59e63fd623fff098b19a12"),
+    ("repo/Dockerfile", "DOCKER_ROOT", 1, "264a50e26cd5c6b40e684a3ee42437e950e5fbd0a10937e78535a03aee7661bb"),
+    ("repo/notes.txt", "generic-secret", 2, "9934fd63aa73ec75d4b7c60a180bc2e23a22ba71decd64ac951c84697e8dd598"),
+    ("repo/app.py", "aws-access-key", 4, "bc4de4937793b13f4f164169e804b43999dd157e20ad4f629600864c0b2e8d72"),
+    ("repo/app.py", "generic-secret", 5, "a82ef4db946427065853d76064565cdbf9fd91c3e7c9ac7e814c0a166e0ec1b0"),
+    ("repo/app.py", "HIGH_ENTROPY", 6, "1a664ae1d673a9c642f2834b6499f406826ad9d70e3a86aa0083a8e48327141d"),
+    ("repo/web/package.json", "VULNERABLE_DEP", 4, "1ce10c663a6f26aaab94529d5ed33cbeab2b453f9b255932692bd308163a99b8"),
+    ("repo/infra/deploy.yaml", "K8S_PRIVILEGED", 10, "b8fbc2279c5b468316d523532096d7c4c7bb7d2a0fe8c914a79d8320d499dca5"),
+    ("repo/infra/main.tf", "AWS_OPEN_SG", 4, "2132fca9988fb77509d99c1303cd7a95958ab817dabbd864ca6f95c5173b5d03"),
+    ("REPORT_COMPLIANCE_SUMMARY", "COMPLIANCE_DOCKER_LATEST", 0, "e393428ae7d618759f36f3da8d5b0bf1ca9505cb092e1506ed3200793a8ae569"),
+    ("REPORT_COMPLIANCE_SUMMARY", "COMPLIANCE_DOCKER_ROOT", 0, "40ac0b1f0b1e8e6d4de42c45b5fee850b66aaa7d61689a79b836768f43c5991b"),
+])
+
+EXPECTED_SKIPPED = {"binary-extension": 1}
+
+
+def summarize(issues):
+    return sorted((i.file, i.id, i.line, i.fingerprint.hex()) for i in issues)
+
+
+@pytest.fixture
+def fixtures_cwd(monkeypatch):
+    # Os caminhos entram no hash: o scan é sempre feito sobre "repo" relativo a fixtures/
+    monkeypatch.chdir(FIXTURES_DIR)
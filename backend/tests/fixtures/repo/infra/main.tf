@@ -0,0 +1,6 @@
+resource "aws_security_group" "web" {
+  ingress {
+    from_port   = 443
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+}
@@ -0,0 +1,93 @@
+"""Base de dados de advisories OSV: gamas de versões, consultas pelo índice e abertura lazy"""
+import pytest
+
+from core.advisories import AdvisoryDB, build_database, pep440_key, semver_key, normalize_name
+from core.scanner import Scanner
+
+ADVISORIES = [
+    {"id": "GHSA-pypi-range", "summary": "PyPI range", "modified": "2024-01-01",
+     "database_specific": {"severity": "CRITICAL"},
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "Django"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "3.0"}, {"fixed": "3.2.4"}]}]}]},
+    {"id": "GHSA-pypi-last", "summary": "PyPI last_affected", "modified": "2024-01-01",
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "some_pkg"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "0"}, {"last_affected": "1.0rc1"}]}]}]},
+    {"id": "GHSA-npm-semver", "summary": "npm semver", "modified": "2024-01-01",
+     "database_specific": {"severity": "MODERATE"},
+     "affected": [{"package": {"ecosystem": "npm", "name": "Lodash"},
+                   "ranges": [{"type": "SEMVER", "events": [{"introduced": "0"}, {"fixed": "4.17.21"}]}]}]},
+    {"id": "GHSA-npm-versions", "summary": "explicit versions", "modified": "2024-01-01",
+     "affected": [{"package": {"ecosystem": "npm", "name": "axios"}, "versions": ["0.21.1"]}]},
+    {"id": "GHSA-withdrawn", "withdrawn": "2024-02-01",
+     "affected": [{"package": {"ecosystem": "npm", "name": "left-pad"}, "versions": ["1.0.0"]}]},
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "advisories.db")
+    count, version = build_database(ADVISORIES, path)
+    assert count == 4
+    return AdvisoryDB(path)
+
+
+def ids(found):
+    return sorted(a.id for a in found)
+
+
+def test_version_keys():
+    assert pep440_key("3.2") == pep440_key("3.2.0")
+    assert pep440_key("1.0rc1") < pep440_key("1.0")
+    assert pep440_key("not a version") is None
+    assert semver_key("1.0.0-alpha") < semver_key("1.0.0-alpha.1") < semver_key("1.0.0-beta") < semver_key("1.0.0")
+    assert semver_key("1.0.0-2") < semver_key("1.0.0-10")
+    assert semver_key("v4.17") == semver_key("4.17.0")
+    assert semver_key("latest") is None
+
+
+def test_normalize_name():
+    assert normalize_name("PyPI", "Some_Pkg.Name") == "some-pkg-name"
+    assert normalize_name("npm", "Lodash") == "lodash"
+    assert normalize_name("Go", "Github.com/X") == "Github.com/X"
+
+
+@pytest.mark.parametrize("version, affected", [
+    ("2.2", False), ("3.0", True), ("3.2.3", True), ("3.2.4", False), ("4.0", False),
+])
+def test_pep440_range(db, version, affected):
+    assert ids(db.lookup("PyPI", "django", version)) == (["GHSA-pypi-range"] if affected else [])
+
+
+@pytest.mark.parametrize("version, affected", [("0.9", True), ("1.0rc1", True), ("1.0", False)])
+def test_last_affected_is_inclusive(db, version, affected):
+    assert bool(db.lookup("PyPI", "Some-Pkg", version)) is affected
+
+
+@pytest.mark.parametrize("version, affected", [
+    ("4.17.15", True), ("4.17.21-rc.1", True), ("4.17.21", False), ("5.0.0", False),
+])
+def test_semver_range(db, version, affected):
+    assert bool(db.lookup("npm", "lodash", version)) is affected
+
+
+def test_explicit_versions_and_severity(db):
+    assert ids(db.lookup("npm", "axios", "0.21.1")) == ["GHSA-npm-versions"]
+    assert db.lookup("npm", "axios", "0.21.2") == []
+    assert db.lookup("npm", "left-pad", "1.0.0") == []
+    assert db.lookup("npm", "lodash", "4.0.0")[0].severity == "MEDIO"
+    assert db.lookup("PyPI", "django", "3.1")[0].severity == "CRITICO"
+
+
+def test_unknown_packages_are_answered_by_the_index(db):
+    assert db.lookup("npm", "express", "4.0.0") == []
+    assert db.lookup("npm", "express", "4.1.0") == []
+    # Um só acesso ao índice por pacote; as entradas nem chegam a ser lidas
+    assert db._indexed.cache_info().misses == 1
+    assert db._entries.cache_info().currsize == 0
+
+
+def test_scanner_does_not_open_the_database_on_init():
+    scanner = Scanner()
+    assert scanner.sca.advisories._conn is None
+    assert scanner.fingerprint
+    assert scanner.sca.advisories._conn is not None
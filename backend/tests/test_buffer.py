@@ -0,0 +1,94 @@
+"""SourceBuffer e MappedBuffer: mesmas linhas e mesmos findings que splitlines()"""
+import mmap
+import re
+
+import pytest
+
+import core.buffer
+from core.buffer import MappedBuffer, SourceBuffer, to_bytes_regex
+from core.rules import RuleEngine
+from core.security import analyze_secrets, analyze_security
+
+RULES = [
+    {"id": "secret", "pattern": "password\\s*=\\s*\"[^\"]+\"", "severity": "ALTO"},
+    {"id": "token", "pattern": "^token$", "severity": "MEDIO"},
+    {"id": "word", "pattern": "\\bkey_\\w+", "severity": "MEDIO"},
+]
+
+SEPARATORS = ["\n", "\r\n", "\r", "\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029"]
+
+
+def lines_of(content):
+    return [line for _, line in SourceBuffer(content).iter_lines()]
+
+
+def findings(issues):
+    return [(issue.id, issue.line, issue.snippet) for issue in issues]
+
+
+@pytest.fixture
+def mapped(tmp_path):
+    handles = []
+
+    def open_mapped(content):
+        path = tmp_path / "big.txt"
+        path.write_bytes(content.encode("utf-8"))
+        f = open(path, "rb")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        handles.append((f, mm))
+        return MappedBuffer(mm)
+
+    yield open_mapped
+    for f, mm in handles:
+        mm.close()
+        f.close()
+
+
+@pytest.mark.parametrize("separator", SEPARATORS)
+def test_source_buffer_splits_like_splitlines(separator):
+    content = separator.join(["a", "token", "", "b"]) + separator
+    assert lines_of(content) == content.splitlines()
+    buffer = SourceBuffer(content)
+    assert buffer.line_of(buffer.content.index("b")) == 4
+
+
+@pytest.mark.parametrize("separator", SEPARATORS)
+def test_mapped_buffer_matches_source_buffer(mapped, separator):
+    content = separator.join(['x = 1', 'password = "hunter22"', 'token', 'key_abc', 'é' * 3]) + separator
+    buffer = mapped(content)
+    engine = RuleEngine(RULES)
+    assert [line for _, line in buffer.iter_lines()] == content.splitlines()
+    assert findings(analyze_security(buffer, engine)) == findings(analyze_security(content, engine))
+    assert findings(analyze_security(content, engine)) == [
+        ("secret", 2, 'password = "hunter22"'), ("token", 3, "token"), ("word", 4, "key_abc"),
+    ]
+
+
+def test_carriage_return_only_file_is_not_one_long_line(mapped, monkeypatch):
+    monkeypatch.setattr(core.buffer, "COUNT_WINDOW", 64)
+    content = "\r".join(["# " + "x" * 40] * 30 + ['password = "hunter22"']) + "\r"
+    buffer = mapped(content)
+    assert buffer.other_breaks
+    assert len(list(buffer.iter_lines())) == 31
+    assert findings(analyze_security(buffer, RuleEngine(RULES))) == [("secret", 31, 'password = "hunter22"')]
+
+
+def test_block_boundaries_keep_line_numbers(mapped, monkeypatch):
+    monkeypatch.setattr(core.buffer, "COUNT_WINDOW", 16)
+    content = "".join(f"line {i}{SEPARATORS[i % len(SEPARATORS)]}" for i in range(200))
+    assert list(mapped(content).iter_lines()) == list(SourceBuffer(content).iter_lines())
+
+
+def test_unicode_sensitive_regexes_have_no_bytes_version():
+    assert to_bytes_regex(re.compile("AKIA[0-9A-Z]{16}")) is not None
+    for pattern in ("\\w+", "\\bkey", "[à-ú]", "(?i)secret", "token\\s*="):
+        assert to_bytes_regex(re.compile(pattern)) is None
+
+
+def test_mapped_buffer_keeps_unicode_semantics(mapped):
+    content = "x = 1\nkey_ção = 2\npassword = \"hunter22\"\n"
+    engine = RuleEngine(RULES)
+    buffer = mapped(content)
+    assert not buffer.other_breaks
+    assert findings(analyze_security(buffer, engine)) == findings(analyze_security(content, engine))
+    assert findings(analyze_secrets(buffer)) == findings(analyze_secrets(content))
@@ -0,0 +1,83 @@
+"""Cliente Supabase partilhado e retry de falhas transitórias"""
+import httpx
+import pytest
+
+import core.db
+from core.db import get_client, is_transient, with_retry
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class PostgrestError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(core.db.time, "sleep", lambda seconds: None)
+
+
+def test_get_client_is_shared(monkeypatch):
+    created = []
+    monkeypatch.setattr(core.db, "create_client", lambda url, key: created.append((url, key)) or object())
+    monkeypatch.setattr(core.db, "_clients", {})
+    assert get_client("https://db", "key") is get_client("https://db", "key")
+    assert get_client("https://db", "other") is not get_client("https://db", "key")
+    assert created == [("https://db", "key"), ("https://db", "other")]
+
+
+@pytest.mark.parametrize("exc, transient", [
+    (httpx.ConnectError("down"), True),
+    (TimeoutError(), True),
+    (StatusError(429), True),
+    (StatusError(503), True),
+    (StatusError(400), False),
+    (PostgrestError("PGRST001"), True),
+    (PostgrestError("23505"), False),
+    (ValueError("bad row"), False),
+])
+def test_is_transient(exc, transient):
+    assert is_transient(exc) is transient
+
+
+def test_with_retry_recovers_from_transient_errors():
+    calls = []
+
+    def operation():
+        calls.append(1)
+        if len(calls) < 3:
+            raise StatusError(503)
+        return "ok"
+
+    assert with_retry(operation, retries=4) == "ok"
+    assert len(calls) == 3
+
+
+def test_with_retry_gives_up():
+    calls = []
+
+    def operation():
+        calls.append(1)
+        raise StatusError(503)
+
+    with pytest.raises(StatusError):
+        with_retry(operation, retries=2)
+    assert len(calls) == 3
+
+
+def test_with_retry_does_not_repeat_permanent_errors():
+    calls = []
+
+    def operation():
+        calls.append(1)
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        with_retry(operation)
+    assert len(calls) == 1
@@ -0,0 +1,110 @@
+"""Modo Pull Request: parsing do diff -U0 e scan só das linhas alteradas"""
+import asyncio
+import shutil
+import subprocess
+
+import pytest
+
+from core.diff import changed_lines, line_in_hunks, parse_unified_diff
+from core.scanner import Scanner
+
+DIFF = """\
+diff --git a/src/app.py b/src/app.py
+index 1111111..2222222 100644
+--- a/src/app.py
++++ b/src/app.py
+@@ -3 +3 @@ import os
+-old = 1
++new = 1
+@@ -10,2 +10,0 @@ def f():
+-removed()
+-removed()
+@@ -20,0 +19,3 @@ def g():
++a()
++++ not a header
++b()
+diff --git a/new file.txt b/new file.txt
+new file mode 100644
+index 0000000..3333333
+--- /dev/null
++++ b/new file.txt\t
+@@ -0,0 +1,2 @@
++one
++two
+diff --git "a/caf\\303\\251.py" "b/caf\\303\\251.py"
+--- "a/caf\\303\\251.py"
++++ "b/café.py"
+@@ -1 +1,2 @@
+-x
++y
++z
+diff --git a/old.py b/renamed.py
+similarity index 90%
+rename from old.py
+rename to renamed.py
+--- a/old.py
++++ b/renamed.py
+@@ -5,0 +6 @@
++added
+diff --git a/gone.py b/gone.py
+deleted file mode 100644
+--- a/gone.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-bye
+-bye
+"""
+
+
+def test_parse_unified_diff():
+    assert parse_unified_diff(DIFF) == {
+        "src/app.py": [(3, 3), (19, 21)],
+        "new file.txt": [(1, 2)],
+        "café.py": [(1, 2)],
+        "renamed.py": [(6, 6)],
+    }
+
+
+def test_line_in_hunks():
+    hunks = [(3, 3), (19, 21)]
+    assert line_in_hunks(3, hunks)
+    assert line_in_hunks(21, hunks)
+    assert not line_in_hunks(4, hunks)
+    # Findings do ficheiro inteiro (linha 0) ficam sempre
+    assert line_in_hunks(0, hunks)
+    assert line_in_hunks(0, [])
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    if shutil.which("git") is None:
+        pytest.skip("git não está instalado")
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.email", "test@example.com")
+    git(tmp_path, "config", "user.name", "test")
+    (tmp_path / "app.py").write_text('password = "hunter22"\n\n\ndef f():\n    return 1\n')
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "base")
+    (tmp_path / "app.py").write_text('password = "hunter22"\n\n\ndef f():\n    secret = "correcthorse"\n    return 1\n')
+    (tmp_path / "empty.py").write_text("")
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "change")
+    return tmp_path
+
+
+def test_changed_lines(repo):
+    # Um ficheiro novo vazio não tem linhas adicionadas (nem cabeçalho +++)
+    assert changed_lines(str(repo), "HEAD~1..HEAD") == {"app.py": [(5, 5)]}
+
+
+def test_scan_diff_keeps_only_changed_lines(repo):
+    scanner = Scanner()
+    full = asyncio.run(scanner.scan_directory(str(repo)))
+    assert sorted(i.line for i in full if i.id == "generic-secret") == [1, 5]
+
+    issues = asyncio.run(scanner.scan_diff(str(repo), "HEAD~1..HEAD"))
+    assert [(i.id, i.line) for i in issues if i.line] == [("generic-secret", 5)]
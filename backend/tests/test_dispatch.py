@@ -0,0 +1,87 @@
+"""Despacho de analisadores e subconjuntos de regras por nome de ficheiro"""
+import pytest
+
+from core.dispatch import AnalyzerRegistry, PatternIndex, file_key
+from core.rules import RuleEngine
+from core.security import analyze_security
+
+RULES = [
+    {"id": "ANY", "pattern": "TODO_SECRET"},
+    {"id": "PY", "pattern": "eval\\(", "languages": "python"},
+    {"id": "JS", "pattern": "eval\\(", "languages": ["javascript", "typescript"]},
+    {"id": "SETTINGS", "pattern": "DEBUG = True", "files": ["settings.py", "*.cfg"]},
+]
+
+
+@pytest.fixture
+def registry():
+    registry = AnalyzerRegistry(RuleEngine(RULES))
+    registry.register(["package.json"], "sca", "npm")
+    registry.register(["Dockerfile", "Dockerfile.*", "*.dockerfile"], "iac", "docker", policy="dockerScan")
+    registry.register(["*.yaml", "*.yml"], "iac", "k8s")
+    registry.register(["*.d.ts"], "sca", "types")
+    return registry
+
+
+def rule_ids(pipeline):
+    return [rule.id for rule in pipeline.rules.rules]
+
+
+def analyzer_names(pipeline):
+    return [analyzer.fn for analyzer in pipeline.analyzers]
+
+
+def test_file_key_is_lowercase_basename():
+    assert file_key("src/App/Dockerfile") == "dockerfile"
+    assert file_key("Package-Lock.JSON") == "package-lock.json"
+
+
+def test_pattern_index():
+    index = PatternIndex()
+    index.add("Makefile", "name")
+    index.add("*.ts", "ext")
+    index.add("*.d.ts", "compound")
+    index.add("Dockerfile.*", "glob")
+    assert index.match("src/makefile") == ["name"]
+    assert index.match("types.d.ts") == ["compound", "ext"]
+    assert index.match("Dockerfile.prod") == ["glob"]
+    assert index.match("README") == []
+
+
+@pytest.mark.parametrize("filename, analyzers, rules", [
+    ("app.py", [], ["ANY", "PY"]),
+    ("web/index.TSX", [], ["ANY", "JS"]),
+    ("lib.d.ts", ["types"], ["ANY", "JS"]),
+    ("package.json", ["npm"], ["ANY"]),
+    ("Dockerfile", ["docker"], ["ANY"]),
+    ("build/dockerfile.prod", ["docker"], ["ANY"]),
+    ("api.Dockerfile", ["docker"], ["ANY"]),
+    ("deploy.YML", ["k8s"], ["ANY"]),
+    ("settings.py", [], ["ANY", "PY", "SETTINGS"]),
+    ("setup.cfg", [], ["ANY", "SETTINGS"]),
+    ("notes.txt", [], ["ANY"]),
+])
+def test_pipeline(registry, filename, analyzers, rules):
+    pipeline = registry.pipeline(filename)
+    assert analyzer_names(pipeline) == analyzers
+    assert rule_ids(pipeline) == rules
+
+
+def test_pipelines_and_subsets_are_shared(registry):
+    assert registry.pipeline("a.py") is registry.pipeline("b/A.PY")
+    assert registry.pipeline("a.js").rules is registry.pipeline("b.ts").rules
+    # Com todas as regras aplicáveis é usado o motor completo
+    engine = RuleEngine([{"id": "ANY", "pattern": "TODO_SECRET"}])
+    assert AnalyzerRegistry(engine).pipeline("x.py").rules is engine
+
+
+def test_register_resets_pipelines(registry):
+    assert analyzer_names(registry.pipeline("Gemfile.lock")) == []
+    registry.register(["gemfile.lock"], "sca", "ruby")
+    assert analyzer_names(registry.pipeline("Gemfile.lock")) == ["ruby"]
+
+
+def test_subset_only_runs_selected_rules(registry):
+    content = "x = eval(data)\nTODO_SECRET\n"
+    assert [i.id for i in analyze_security(content, registry.pipeline("a.py").rules)] == ["PY", "ANY"]
+    assert [i.id for i in analyze_security(content, registry.pipeline("a.txt").rules)] == ["ANY"]
@@ -0,0 +1,152 @@
+"""Verificações de IaC: Dockerfile, Terraform e manifestos Kubernetes"""
+import pytest
+
+from core.iac import IaCScanner, iac_kind
+
+DOCKERFILE = """\
+# build
+FROM --platform=linux/amd64 node:latest AS build
+RUN apt-get update && \\
+    apt-get install -y openssh-server
+EXPOSE 8080 22/tcp
+USER node
+FROM alpine:3.19
+USER root
+"""
+
+TERRAFORM = """\
+resource "aws_security_group" "web" {
+  ingress {
+    from_port   = 22
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+  egress {
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+}
+
+resource "aws_vpc_security_group_ingress_rule" "v6" {
+  cidr_ipv6 = "::/0"
+}
+
+resource "aws_s3_bucket" "logs" {
+  acl = "public-read"
+  policy = <<POLICY
+{ "cidr_blocks": "0.0.0.0/0" }
+POLICY
+}
+
+resource "aws_db_instance" "db" {
+  publicly_accessible = true
+}
+"""
+
+MANIFESTS = """\
+apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: settings
+---
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: web
+spec:
+  template:
+    spec:
+      hostNetwork: true
+      containers:
+        - name: web
+          image: registry.local:5000/web
+          securityContext:
+            privileged: true
+            runAsUser: 0
+        - name: sidecar
+          image: envoy@sha256:abc
+---
+apiVersion: batch/v1
+kind: CronJob
+metadata:
+  name: backup
+spec:
+  jobTemplate:
+    spec:
+      template:
+        spec:
+          containers:
+            - name: backup
+              image: backup:1.2
+"""
+
+
+def findings(issues):
+    return sorted((issue["id"], issue["line"]) for issue in issues)
+
+
+@pytest.mark.parametrize("filename, kind", [
+    ("Dockerfile", "dockerfile"),
+    ("docker/Dockerfile.prod", "dockerfile"),
+    ("api.DOCKERFILE", "dockerfile"),
+    ("infra/main.tf", "terraform"),
+    ("deploy.YML", "yaml"),
+    ("values.yaml", "yaml"),
+    ("main.tf.json", None),
+    ("README.md", None),
+])
+def test_iac_kind(filename, kind):
+    assert iac_kind(filename) == kind
+
+
+def test_dockerfile():
+    issues = IaCScanner().scan_dockerfile(DOCKERFILE, "Dockerfile")
+    assert findings(issues) == [("DOCKER_LATEST", 2), ("DOCKER_ROOT", 8), ("DOCKER_SSH", 5)]
+    assert {i["id"]: i["snippet"] for i in issues}["DOCKER_LATEST"] == "FROM --platform=linux/amd64 node:latest AS build"
+
+
+def test_dockerfile_without_user_runs_as_root():
+    issues = IaCScanner().scan_dockerfile("FROM python:3.12\nRUN pip install .\n", "Dockerfile")
+    assert [(i["id"], i["line"], i["snippet"]) for i in issues] == [("DOCKER_ROOT", 1, "N/A")]
+
+
+def test_terraform():
+    issues = IaCScanner().scan_terraform(TERRAFORM, "main.tf")
+    assert findings(issues) == [
+        ("AWS_OPEN_SG", 4), ("AWS_OPEN_SG", 12),
+        ("TF_PUBLIC_DB", 23), ("TF_PUBLIC_S3_ACL", 16), ("UNENCRYPTED_S3", 15),
+    ]
+
+
+def test_terraform_separate_encryption_resource():
+    content = """\
+resource "aws_s3_bucket" "b" {
+  bucket = "b"
+}
+resource "aws_s3_bucket_server_side_encryption_configuration" "b" {
+  bucket = aws_s3_bucket.b.id
+}
+"""
+    assert IaCScanner().scan_terraform(content, "main.tf") == []
+
+
+def test_kubernetes():
+    issues = IaCScanner().scan_kubernetes(MANIFESTS, "deploy.yaml")
+    assert findings(issues) == [
+        ("K8S_HOST_NAMESPACE", 13), ("K8S_LATEST", 16), ("K8S_PRIVILEGED", 18), ("K8S_RUN_AS_ROOT", 19),
+    ]
+
+
+@pytest.mark.parametrize("content", [
+    "name: not-kubernetes\nvalues: [1, 2]\n",
+    "apiVersion: v1\nkind: Pod\nspec:\n  containers: {{ .Values.containers }}\n",
+])
+def test_other_yaml_is_ignored(content):
+    assert IaCScanner().scan_kubernetes(content, "values.yaml") == []
+
+
+def test_parsed_files_are_cached_by_content():
+    scanner = IaCScanner()
+    first = scanner.scan_terraform(TERRAFORM, "a/main.tf")
+    second = scanner.scan_terraform(TERRAFORM, "b/main.tf")
+    assert len(scanner.parsed) == 1
+    assert findings(first) == findings(second)
+    assert {i["file"] for i in second} == {"b/main.tf"}
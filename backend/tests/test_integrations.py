@@ -0,0 +1,121 @@
+"""Supressões por org e entrega de integrações (o que é repetido e o que vai para a dead-letter)"""
+import hashlib
+
+import pytest
+import requests
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError, ProtocolError, ReadTimeoutError
+
+import core.integrations
+from core.integrations import (
+    DeliveryError, SuppressionSet, deliver, filter_ignored_issues, generate_issue_hash, never_sent,
+)
+
+
+def issue(file="src/app.py", rule="generic-secret", snippet='password = "x"'):
+    return {"id": rule, "name": rule, "severity": "CRITICAL", "snippet": snippet, "line": 1, "file": file}
+
+
+def test_generate_issue_hash_matches_stored_format():
+    data = issue(snippet='  password = "x"  ')
+    expected = hashlib.sha256(b'src/app.py-generic-secret-password = "x"').hexdigest()
+    assert generate_issue_hash(data) == expected
+
+
+def test_suppression_set_membership():
+    hashes = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(100)]
+    suppressions = SuppressionSet(hashes)
+    assert len(suppressions) == 100
+    assert all(h in suppressions for h in hashes)
+    assert hashlib.sha256(b"other").hexdigest() not in suppressions
+
+
+def test_suppression_set_skips_invalid_hashes():
+    valid = generate_issue_hash(issue())
+    suppressions = SuppressionSet([valid, "not-a-hash", None, "", 42])
+    assert len(suppressions) == 1
+    assert valid in suppressions
+
+
+def test_filter_ignored_issues():
+    ignored, kept = issue(), issue(file="src/other.py")
+    active = filter_ignored_issues([dict(ignored), dict(kept)], [generate_issue_hash(ignored), "zz"])
+    assert [i["file"] for i in active] == ["src/other.py"]
+    # O hash fica no issue para o frontend
+    assert active[0]["hash"] == generate_issue_hash(kept)
+
+
+def test_filter_ignored_issues_keeps_scan_hash():
+    data = dict(issue(), hash="ab" * 32)
+    assert filter_ignored_issues([data], ["ab" * 32]) == []
+    assert filter_ignored_issues([data], []) == [data]
+
+
+def refused():
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.ConnectionError(MaxRetryError(None, "/rest/api/3/issue", reason))
+
+
+CONNECT_TIMEOUT = requests.ConnectTimeout(MaxRetryError(None, "/", ConnectTimeoutError(None, "timed out")))
+READ_TIMEOUT = requests.ReadTimeout(ReadTimeoutError(None, "/", "Read timed out"))
+ABORTED = requests.ConnectionError(ProtocolError("Connection aborted.", ConnectionResetError()))
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = "error"
+
+    def json(self):
+        return {"key": "SEC-1"}
+
+
+@pytest.fixture
+def post(monkeypatch):
+    outcome = {}
+
+    def fake_post(url, timeout=None, **kwargs):
+        if isinstance(outcome["value"], Exception):
+            raise outcome["value"]
+        return FakeResponse(outcome["value"])
+
+    monkeypatch.setattr(core.integrations, "webhook_request", lambda integration, report: ("https://hooks.local", {}))
+    monkeypatch.setattr(core.integrations, "jira_request", lambda integration, report: ("https://jira.local", {}))
+    monkeypatch.setattr(core.integrations._session, "post", fake_post)
+
+    def attempt(kind, value):
+        outcome["value"] = value
+        with pytest.raises(DeliveryError) as error:
+            deliver({"type": kind}, {})
+        return error.value.transient
+    return attempt
+
+
+@pytest.mark.parametrize("exc, sent", [
+    (refused(), False), (CONNECT_TIMEOUT, False), (READ_TIMEOUT, True), (ABORTED, True),
+])
+def test_never_sent(exc, sent):
+    assert never_sent(exc) is not sent
+
+
+@pytest.mark.parametrize("value, transient", [
+    (refused(), True), (CONNECT_TIMEOUT, True), (429, True), (503, True),
+    # O Jira pode já ter criado o ticket: repetir criaria um duplicado
+    (READ_TIMEOUT, False), (ABORTED, False), (500, False), (502, False), (504, False),
+    (401, False), (400, False),
+])
+def test_jira_retries_only_unprocessed_requests(post, value, transient):
+    assert post("jira", value) is transient
+
+
+@pytest.mark.parametrize("value, transient", [
+    (refused(), True), (READ_TIMEOUT, True), (ABORTED, True), (429, True), (500, True), (504, True),
+    (401, False), (404, False),
+])
+def test_webhook_retries_transient_failures(post, value, transient):
+    assert post("webhook", value) is transient
+
+
+def test_real_connection_refused_is_never_sent():
+    with pytest.raises(requests.ConnectionError) as error:
+        requests.post("http://127.0.0.1:9/", timeout=(1, 1))
+    assert never_sent(error.value)
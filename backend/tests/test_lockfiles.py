@@ -0,0 +1,226 @@
+"""Parsers de lockfiles em streaming e SCA sobre lockfiles"""
+import mmap
+
+import pytest
+
+from core.buffer import MappedBuffer
+from core.lockfiles import (
+    lockfile_parser, parse_package_lock, parse_pipfile_lock, parse_pnpm_lock,
+    parse_poetry_lock, parse_yarn_lock,
+)
+from core.sca import SCAScanner
+
+PACKAGE_LOCK_V3 = """\
+{
+  "name": "app",
+  "version": "1.0.0",
+  "lockfileVersion": 3,
+  "packages": {
+    "": {
+      "name": "app",
+      "version": "1.0.0"
+    },
+    "node_modules/lodash": {
+      "version": "4.17.15",
+      "resolved": "https://registry.npmjs.org/lodash/-/lodash-4.17.15.tgz"
+    },
+    "node_modules/a/node_modules/@scope/b": {
+      "version": "2.0.0",
+      "dependencies": {
+        "c": "^1.0.0"
+      }
+    }
+  }
+}
+"""
+
+PACKAGE_LOCK_V1 = """\
+{
+  "name": "app",
+  "version": "1.0.0",
+  "lockfileVersion": 1,
+  "dependencies": {
+    "axios": {
+      "version": "0.21.1",
+      "requires": {
+        "follow-redirects": "^1.10.0"
+      },
+      "dependencies": {
+        "follow-redirects": {
+          "version": "1.10.0"
+        }
+      }
+    }
+  }
+}
+"""
+
+PIPFILE_LOCK = """\
+{
+    "_meta": {
+        "hash": {
+            "sha256": "abc"
+        }
+    },
+    "default": {
+        "django": {
+            "hashes": [
+                "sha256:abc"
+            ],
+            "version": "==3.2.0"
+        }
+    },
+    "develop": {
+        "pytest": {
+            "version": "==7.0.0"
+        }
+    }
+}
+"""
+
+YARN_V1 = """\
+# yarn lockfile v1
+
+
+"@babel/core@^7.0.0", "@babel/core@^7.1.0":
+  version "7.1.2"
+  resolved "https://registry.yarnpkg.com/@babel/core/-/core-7.1.2.tgz"
+
+lodash@^4.17.0:
+  version "4.17.15"
+"""
+
+YARN_BERRY = """\
+__metadata:
+  version: 6
+
+"app@workspace:.":
+  version: 0.0.0-use.local
+
+"react@npm:^16.8.0":
+  version: 16.8.0
+  resolution: "react@npm:16.8.0"
+"""
+
+PNPM_LOCK = """\
+lockfileVersion: '6.0'
+
+dependencies:
+  lodash:
+    specifier: ^4.17.0
+    version: 4.17.15
+
+packages:
+
+  /lodash@4.17.15:
+    resolution: {integrity: sha512-abc}
+    dev: false
+
+  /@types/node/20.1.0:
+    resolution: {integrity: sha512-def}
+
+  /react-dom@18.2.0(react@18.2.0):
+    dependencies:
+      react: 18.2.0
+
+  /local@link:../local:
+    dev: false
+"""
+
+POETRY_LOCK = """\
+[[package]]
+name = "django"
+version = "3.2.0"
+description = "web framework"
+
+[package.dependencies]
+name = "not-a-package"
+version = "0"
+
+[[package]]
+name = "requests"
+version = "2.31.0"
+
+[metadata]
+lock-version = "2.0"
+"""
+
+
+def parse(parser, text):
+    return list(parser(enumerate(text.splitlines(), 1)))
+
+
+def test_package_lock_v3():
+    assert parse(parse_package_lock, PACKAGE_LOCK_V3) == [
+        ("npm", "lodash", "4.17.15", 10, '"lodash": "4.17.15"'),
+        ("npm", "@scope/b", "2.0.0", 14, '"@scope/b": "2.0.0"'),
+    ]
+
+
+def test_package_lock_v1_nested_dependencies():
+    assert [(name, version, line) for _, name, version, line, _ in parse(parse_package_lock, PACKAGE_LOCK_V1)] == [
+        ("axios", "0.21.1", 6),
+        ("follow-redirects", "1.10.0", 12),
+    ]
+
+
+def test_pipfile_lock():
+    assert parse(parse_pipfile_lock, PIPFILE_LOCK) == [
+        ("PyPI", "django", "3.2.0", 8, "django==3.2.0"),
+        ("PyPI", "pytest", "7.0.0", 16, "pytest==7.0.0"),
+    ]
+
+
+def test_yarn_v1():
+    assert parse(parse_yarn_lock, YARN_V1) == [
+        ("npm", "@babel/core", "7.1.2", 4, "@babel/core@7.1.2"),
+        ("npm", "lodash", "4.17.15", 8, "lodash@4.17.15"),
+    ]
+
+
+def test_yarn_berry_skips_metadata_and_workspaces():
+    assert parse(parse_yarn_lock, YARN_BERRY) == [("npm", "react", "16.8.0", 7, "react@16.8.0")]
+
+
+def test_pnpm_lock():
+    assert [(name, version, line) for _, name, version, line, _ in parse(parse_pnpm_lock, PNPM_LOCK)] == [
+        ("lodash", "4.17.15", 10),
+        ("@types/node", "20.1.0", 14),
+        ("react-dom", "18.2.0", 17),
+    ]
+
+
+def test_poetry_lock_ignores_subtables():
+    assert parse(parse_poetry_lock, POETRY_LOCK) == [
+        ("PyPI", "django", "3.2.0", 2, "django==3.2.0"),
+        ("PyPI", "requests", "2.31.0", 11, "requests==2.31.0"),
+    ]
+
+
+@pytest.mark.parametrize("path, parser", [
+    ("web/package-lock.json", parse_package_lock),
+    ("web/Package-Lock.json", parse_package_lock),
+    ("npm-shrinkwrap.json", parse_package_lock),
+    ("YARN.lock", parse_yarn_lock),
+    ("pnpm-lock.yaml", parse_pnpm_lock),
+    ("poetry.lock", parse_poetry_lock),
+    ("pipfile.lock", parse_pipfile_lock),
+    ("package.json", None),
+    ("lock.yarn", None),
+])
+def test_lockfile_parser_by_name(path, parser):
+    assert lockfile_parser(path) is parser
+
+
+def test_scan_lockfile_reports_each_vulnerable_package_once():
+    content = YARN_V1 + '\nlodash@^4.17.1:\n  version "4.17.15"\n'
+    issues = SCAScanner().scan_lockfile(content, "Yarn.lock")
+    assert [(i["id"], i["line"], i["snippet"]) for i in issues] == [("VULNERABLE_DEP", 8, "lodash@4.17.15")]
+
+
+def test_scan_lockfile_from_mapped_buffer(tmp_path):
+    path = tmp_path / "package-lock.json"
+    path.write_text(PACKAGE_LOCK_V3)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        issues = SCAScanner().scan_lockfile(MappedBuffer(mm), str(path))
+    assert [(i["line"], i["snippet"]) for i in issues] == [(10, '"lodash": "4.17.15"')]
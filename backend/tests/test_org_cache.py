@@ -0,0 +1,165 @@
+"""Cache por org: TTL e LRU em memória, etags e invalidação com Redis"""
+import pytest
+
+import core.org_cache
+from core.integrations import SuppressionSet
+from core.org_cache import OrgCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(core.org_cache.time, "monotonic", clock)
+    return clock
+
+
+class Loader:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def set(self, key, value, ex=None):
+        self.ops.append((key, value, ex))
+
+    def execute(self):
+        for key, value, ex in self.ops:
+            self.redis.set(key, value, ex)
+
+
+class FakeRedis:
+    """Só o que a OrgCache usa (get/set/delete/pipeline), sem expiração"""
+    def __init__(self):
+        self.data = {}
+        self.gets = []
+
+    def get(self, key):
+        self.gets.append(key)
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+def redis_cache(**kwargs):
+    cache = OrgCache(redis_url=None, **kwargs)
+    cache.redis = FakeRedis()
+    return cache
+
+
+def test_memory_entries_expire_after_ttl(clock):
+    cache = OrgCache(ttl=30, redis_url=None)
+    loader = Loader(["a"])
+    assert cache.get("ignored", "org", loader) == ["a"]
+    clock.now += 29
+    assert cache.get("ignored", "org", loader) == ["a"]
+    assert loader.calls == 1
+    clock.now += 2
+    loader.value = ["a", "b"]
+    assert cache.get("ignored", "org", loader) == ["a", "b"]
+    assert loader.calls == 2
+
+
+def test_memory_lru_is_bounded(clock):
+    cache = OrgCache(ttl=30, max_entries=2, redis_url=None)
+    for org in ("a", "b", "c"):
+        cache.get("ignored", org, Loader(org))
+    assert list(cache.entries) == [("ignored", "b"), ("ignored", "c")]
+
+
+def test_loader_errors_are_not_cached(clock):
+    cache = OrgCache(ttl=30, redis_url=None)
+
+    def failing():
+        raise RuntimeError("supabase down")
+
+    with pytest.raises(RuntimeError):
+        cache.get("ignored", "org", failing)
+    assert cache.get("ignored", "org", Loader(["a"])) == ["a"]
+
+
+def test_invalidate_only_the_given_kind(clock):
+    cache = OrgCache(ttl=30, redis_url=None)
+    ignored, integrations = Loader(["a"]), Loader([{"type": "webhook"}])
+    cache.get("ignored", "org", ignored)
+    cache.get("integrations", "org", integrations)
+    cache.invalidate("org", "ignored")
+    cache.get("ignored", "org", ignored)
+    cache.get("integrations", "org", integrations)
+    assert (ignored.calls, integrations.calls) == (2, 1)
+
+
+def test_redis_reuses_the_built_value_while_the_etag_matches():
+    cache = redis_cache(ttl=30)
+    loader = Loader(["ab" * 32])
+    built = []
+
+    def build(value):
+        built.append(value)
+        return SuppressionSet(value)
+
+    first = cache.get("ignored", "org", loader, build=build)
+    second = cache.get("ignored", "org", loader, build=build)
+    assert second is first
+    assert loader.calls == 1 and len(built) == 1
+    # Só a etag é lida no segundo get
+    assert cache.redis.gets[-1] == "sentinel:org:org:ignored:etag"
+
+
+def test_redis_values_are_shared_between_processes():
+    worker, other = redis_cache(ttl=30), redis_cache(ttl=30)
+    other.redis = worker.redis
+    worker.get("ignored", "org", Loader(["a"]))
+    loader = Loader(["stale"])
+    assert other.get("ignored", "org", loader) == ["a"]
+    assert loader.calls == 0
+
+
+def test_redis_invalidate_is_seen_by_every_process():
+    api, worker = redis_cache(ttl=30), redis_cache(ttl=30)
+    worker.redis = api.redis
+    worker.get("ignored", "org", Loader(["a"]))
+    api.invalidate("org", "ignored")
+    assert worker.get("ignored", "org", Loader(["a", "b"])) == ["a", "b"]
+
+
+def test_redis_value_with_wrong_etag_is_reloaded():
+    cache = redis_cache(ttl=30)
+    cache.get("ignored", "org", Loader(["a"]))
+    cache.redis.data["sentinel:org:org:ignored"] = b'["tampered"]'
+    cache.built.clear()
+    assert cache.get("ignored", "org", Loader(["a"])) == ["a"]
+
+
+def test_redis_errors_fall_back_to_the_loader():
+    cache = redis_cache(ttl=30)
+
+    def broken(key):
+        raise ConnectionError("redis down")
+
+    cache.redis.get = broken
+    assert cache.get("ignored", "org", Loader(["a"])) == ["a"]
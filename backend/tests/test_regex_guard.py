@@ -0,0 +1,102 @@
+"""Lint das regex das regras e orçamento de tempo por ficheiro"""
+import time
+import threading
+
+import pytest
+
+import core.rules
+import core.watchdog
+from core.dispatch import AnalyzerRegistry
+from core.rules import RuleEngine, lint_pattern
+from core.scanner import Scanner
+from core.watchdog import ScanTimeout, file_budget
+
+NESTED = "quantificador aninhado (backtracking exponencial)"
+AMBIGUOUS = "alternância ambígua dentro de um quantificador (backtracking exponencial)"
+ADJACENT = "quantificadores adjacentes sobrepostos (backtracking polinomial)"
+
+EVIL_RULE = {"id": "EVIL", "name": "Evil", "severity": "ALTO", "pattern": "(a+)+$"}
+
+
+@pytest.mark.parametrize("pattern, problems", [
+    ("(a+)+$", [NESTED]),
+    ("(a|aa)*c", [NESTED]),
+    ("(a|a)*c", [AMBIGUOUS]),
+    ("(ab|a.)*c", [AMBIGUOUS]),
+    (r"\w+\w*=", [ADJACENT]),
+    (".*.*=", [ADJACENT]),
+    ("(x+x+)+y", [NESTED, ADJACENT]),
+])
+def test_lint_flags_backtracking(pattern, problems):
+    assert lint_pattern(pattern) == problems
+
+
+@pytest.mark.parametrize("pattern", [
+    "AKIA[0-9A-Z]{16}",
+    r'password\s*=\s*"[^"]+"',
+    "(a|ab)*c",
+    "(?:foo|bar)+",
+    r"[a-z]+@[a-z]+\.com",
+    r"\d+\.\d+",
+    "(",
+])
+def test_lint_accepts_safe_patterns(pattern):
+    assert lint_pattern(pattern) == []
+
+
+def test_engine_keeps_unsafe_rules_in_warn_mode(monkeypatch):
+    monkeypatch.setattr(core.rules, "REGEX_LINT", "warn")
+    engine = RuleEngine([EVIL_RULE])
+    assert [rule.id for rule in engine.rules] == ["EVIL"]
+    assert engine.rules[0].unsafe == [NESTED]
+
+
+def test_engine_rejects_unsafe_rules_in_strict_mode(monkeypatch):
+    monkeypatch.setattr(core.rules, "REGEX_LINT", "strict")
+    engine = RuleEngine([EVIL_RULE, {"id": "OK", "pattern": "AKIA[0-9A-Z]{16}"}])
+    assert [rule.id for rule in engine.rules] == ["OK"]
+
+
+def spin():
+    while True:
+        pass
+
+
+def test_file_budget_interrupts_the_block():
+    start = time.monotonic()
+    with pytest.raises(ScanTimeout):
+        with file_budget(0.05):
+            spin()
+    assert time.monotonic() - start < 5
+
+
+def test_file_budget_is_disarmed_on_exit():
+    with file_budget(0.05):
+        pass
+    time.sleep(0.1)  # Um alarme ainda armado lançava ScanTimeout aqui
+
+
+def test_file_budget_zero_disables_the_timer():
+    with file_budget(0) as budget:
+        assert not budget.armed
+
+
+def test_file_budget_only_in_main_thread():
+    armed = []
+    thread = threading.Thread(target=lambda: armed.append(file_budget(0.05).__enter__().armed))
+    thread.start()
+    thread.join()
+    assert armed == [False]
+
+
+def test_catastrophic_rule_marks_file_incomplete(monkeypatch):
+    monkeypatch.setattr(core.watchdog, "FILE_TIME_BUDGET", 0.2)
+    scanner = Scanner()
+    scanner.dispatch = AnalyzerRegistry(RuleEngine([EVIL_RULE]))
+
+    start = time.monotonic()
+    issues, complete = scanner._scan_content("a" * 64 + "!\n", "evil.txt", None)
+    assert time.monotonic() - start < 5
+    assert not complete
+    assert issues == []
+    assert scanner.skipped["scan-incomplete"] == 1
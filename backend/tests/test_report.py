@@ -0,0 +1,61 @@
+"""Relatórios gerados a partir do scan de tests/fixtures/repo"""
+import asyncio
+import json
+
+import pytest
+
+from core.report import generate_json_report
+from core.sarif import SARIF_VERSION
+from core.scanner import Scanner
+
+from conftest import EXPECTED
+
+
+@pytest.fixture
+def scan_result(fixtures_cwd):
+    scanner = Scanner()
+    issues = asyncio.run(scanner.scan_directory("repo"))
+    return scanner, issues
+
+
+def test_json_report(scan_result, tmp_path):
+    scanner, issues = scan_result
+    output = str(tmp_path / "report.json")
+    generate_json_report(issues, output, scanner.skipped, fmt="json", rules=scanner.rule_engine.rules)
+
+    with open(output, encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["total_issues"] == len(EXPECTED)
+    assert sorted((i["file"], i["id"], i["line"], i["hash"]) for i in report["issues"]) == EXPECTED
+
+
+def test_ndjson_report(scan_result, tmp_path):
+    scanner, issues = scan_result
+    output = str(tmp_path / "report.ndjson")
+    generate_json_report(issues, output, scanner.skipped, fmt="ndjson", rules=scanner.rule_engine.rules)
+
+    with open(output, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    summary = records.pop()
+    assert summary["type"] == "summary"
+    assert sorted((i["file"], i["id"], i["line"], i["hash"]) for i in records) == EXPECTED
+
+
+def test_sarif_report(scan_result, tmp_path):
+    scanner, issues = scan_result
+    output = str(tmp_path / "report.sarif")
+    generate_json_report(issues, output, scanner.skipped, fmt="sarif",
+                         rules=scanner.rule_engine.rules, base_dir="repo")
+
+    with open(output, encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["version"] == SARIF_VERSION
+    run = report["runs"][0]
+    rule_ids = [rule["id"] for rule in run["tool"]["driver"]["rules"]]
+    assert len(rule_ids) == len(set(rule_ids))
+    assert len(run["results"]) == len(EXPECTED)
+    for result in run["results"]:
+        assert rule_ids[result["ruleIndex"]] == result["ruleId"]
+        assert not result["locations"][0]["physicalLocation"]["artifactLocation"]["uri"].startswith("repo/")
+    assert sorted(r["partialFingerprints"]["sentinelIssueHash/v1"] for r in run["results"]) == \
+        sorted(expected[3] for expected in EXPECTED)